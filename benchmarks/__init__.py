@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .corpus import Corpus, generate
+from .suite import (Benchmark, Regression, Result, benchmarks, compare, load,
+                    measure, run, save)
+
+__all__ = ['Corpus', 'generate', 'Benchmark', 'Regression', 'Result',
+           'benchmarks', 'compare', 'load', 'measure', 'run', 'save']
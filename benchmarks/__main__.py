@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Run benchmarks of coinflow protocol code
+
+    $ python -m benchmarks --output results.json
+    $ python -m benchmarks --baseline results.json
+
+Exit status is 1 when any benchmark is slower than baseline by more than
+tolerance.
+"""
+
+import argparse
+import sys
+
+from typing import List, Optional
+
+from .corpus import SEED, generate
+from .suite import Result, benchmarks, compare, load, run, save
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description=__doc__.split('\n')[1])
+    parser.add_argument('-o', '--output', help='store results as JSON')
+    parser.add_argument('-b', '--baseline',
+                        help='compare results with JSON stored before')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.1,
+                        help='accepted relative slowdown (default: 0.1)')
+    parser.add_argument('-k', '--filter', default='',
+                        help='run only benchmarks with names containing it')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='minimum duration of round in seconds')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of rounds, the best one is reported')
+    parser.add_argument('--size', type=int, default=1000,
+                        help='number of items in corpus')
+    parser.add_argument('--seed', type=int, default=SEED,
+                        help='seed of corpus generator')
+    args = parser.parse_args(argv)
+
+    benches = [b for b in benchmarks(generate(args.size, args.seed))
+               if args.filter in b.name]
+
+    def progress(name: str, result: Result) -> None:
+        print('{0:<32} {1:>14,.0f} ops/s {2:>10.2f} MB/s'.format(
+                    name, result.ops_per_sec, result.bytes_per_sec / 1e6))
+
+    results = run(benches, args.min_time, args.repeat, progress)
+    if args.output:
+        save(results, args.output, size=args.size, seed=args.seed)
+    if not args.baseline:
+        return 0
+
+    regressions = compare(results, load(args.baseline), args.tolerance)
+    for r in regressions:
+        print('SLOWER {0:<25} {1:>14,.0f} -> {2:,.0f} ops/s ({3:.0%})'.format(
+                    r.name, r.baseline, r.current, r.ratio))
+    if not regressions:
+        print('no regressions against {0}'.format(args.baseline))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
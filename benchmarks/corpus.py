@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+import string
+
+from datetime import timedelta
+from typing import List, NamedTuple
+
+from coinflow.protocol.magic import bitcoin
+from coinflow.protocol.messages import (Addr, GetAddr, Message, RawMessage,
+                                        Verack, Version)
+from coinflow.protocol.messages.Addr import AddrEntry, AddrList
+import coinflow.protocol.structs as structs
+
+MAGIC = bitcoin['mainnet']  # type: int
+SEED = 1337  # type: int
+EPOCH = structs.Timestamp(2017, 1, 1)  # type: structs.Timestamp
+
+Corpus = NamedTuple('Corpus', (('small_varints', List[int]),
+                               ('large_varints', List[int]),
+                               ('user_agents', List[str]),
+                               ('netaddrs', List[structs.Netaddr]),
+                               ('timestamps', List[structs.Timestamp]),
+                               ('addr_list', AddrList),
+                               ('messages', List[Message]),
+                               ('stream', bytes)))
+"""Inputs shared by all benchmarks"""
+
+
+def generate(size: int = 1000, seed: int = SEED) -> Corpus:
+    """
+    Generate corpus, the same for the same size and seed
+
+    Parameters
+    ----------
+    size : int
+        number of items of every kind, also number of 'addr' entries
+    seed : int
+        seed of random generator
+
+    Returns
+    -------
+    Corpus
+        benchmark inputs
+    """
+    rnd = random.Random(seed)
+    small = [rnd.randrange(0xfd) for _ in range(size)]  # type: List[int]
+    widths = (0xfd, 0x10000, 0x100000000, 0x10000000000000000)
+    large = [rnd.randrange(0xfd, rnd.choice(widths[1:]))
+             for _ in range(size)]  # type: List[int]
+    agents = ['/Satoshi:0.{0}.{1}/{2}/'.format(
+                    rnd.randrange(20), rnd.randrange(10),
+                    ''.join(rnd.choice(string.ascii_letters)
+                            for _ in range(rnd.randrange(64, 256))))
+              for _ in range(size)]  # type: List[str]
+    netaddrs = [_netaddr(rnd) for _ in range(size)]
+    timestamps = [EPOCH + timedelta(seconds=rnd.randrange(1 << 24))
+                  for _ in range(size)]
+    addr_list = [AddrEntry(ts, addr)
+                 for (ts, addr) in zip(timestamps, netaddrs)]
+    messages = _messages(rnd, agents, addr_list, size)
+    return Corpus(small, large, agents, netaddrs, timestamps, addr_list,
+                  messages, b''.join(bytes(m) for m in messages))
+
+
+def _netaddr(rnd: random.Random) -> structs.Netaddr:
+    ip = '.'.join(str(rnd.randrange(1, 255)) for _ in range(4))  # type: str
+    port = rnd.choice((8333, 18333, rnd.randrange(1024, 65536)))  # type: int
+    return structs.Netaddr(ip, port, rnd.choice((0, 1, 5, 1037)))
+
+
+def _messages(rnd: random.Random, agents: List[str], addr_list: AddrList,
+              size: int) -> List[Message]:
+    """
+    Mixed stream resembling traffic of freshly connected peer
+    """
+    messages = list()  # type: List[Message]
+    for i in range(size // 10):
+        kind = rnd.random()  # type: float
+        if kind < 0.1:
+            addr = addr_list[i % len(addr_list)].addr
+            messages.append(Version(addr, addr, 70015, 1, EPOCH,
+                                    rnd.getrandbits(64), rnd.choice(agents),
+                                    rnd.randrange(500000), True,
+                                    magic=MAGIC))
+        elif kind < 0.2:
+            messages.append(Verack(magic=MAGIC))
+        elif kind < 0.3:
+            messages.append(GetAddr(magic=MAGIC))
+        elif kind < 0.5:
+            start = rnd.randrange(len(addr_list))
+            messages.append(Addr(addr_list=addr_list[start:start + 100],
+                                 magic=MAGIC))
+        else:
+            nonce = rnd.getrandbits(64).to_bytes(8, 'little')  # type: bytes
+            messages.append(RawMessage('ping', nonce, magic=MAGIC))
+    return messages
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import platform
+import time
+
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from coinflow.metrics import Metrics
+from coinflow.protocol.Framer import Framer
+from coinflow.protocol.messages import Addr, Message, Version
+import coinflow.protocol.structs as structs
+
+from .corpus import MAGIC, Corpus
+
+Benchmark = NamedTuple('Benchmark', (('name', str),
+                                     ('run', Callable[[], Any]),
+                                     ('ops', int), ('bytes', int)))
+"""Operation measured as whole: 'run' performs 'ops' operations on 'bytes'"""
+
+Result = NamedTuple('Result', (('ops_per_sec', float),
+                               ('bytes_per_sec', float)))
+
+Regression = NamedTuple('Regression', (('name', str), ('baseline', float),
+                                       ('current', float), ('ratio', float)))
+"""Benchmark slower than baseline, ratio of current to baseline ops/sec"""
+
+
+def benchmarks(corpus: Corpus) -> List[Benchmark]:
+    """
+    Build benchmarks of structs, messages and stream handling
+
+    Parameters
+    ----------
+    corpus : benchmarks.corpus.Corpus
+        inputs of benchmarks
+
+    Returns
+    -------
+    list
+        'Benchmark' objects
+    """
+    benches = list()  # type: List[Benchmark]
+    for (kind, values) in (('small', corpus.small_varints),
+                           ('large', corpus.large_varints)):
+        benches.extend(_codec('varint.' + kind, values, structs.Varint.encode,
+                              structs.Varint.decode_from))
+        benches.extend(_bulk('varint.' + kind, values,
+                             structs.Varint.encode_many,
+                             structs.Varint.decode_many))
+    benches.extend(_codec('varstr', corpus.user_agents, structs.Varstr.encode,
+                          structs.Varstr.decode_from))
+    benches.extend(_bulk('varstr', corpus.user_agents,
+                         structs.Varstr.encode_many,
+                         structs.Varstr.decode_many))
+    benches.extend(_codec('netaddr', corpus.netaddrs, structs.Netaddr.encode,
+                          structs.Netaddr.decode_from))
+    benches.extend(_codec('timestamp', corpus.timestamps,
+                          structs.Timestamp.encode,
+                          structs.Timestamp.decode_from))
+    benches.extend(_bulk('timestamp', corpus.timestamps,
+                         structs.Timestamp.encode_many,
+                         structs.Timestamp.decode_many))
+
+    addr = corpus.netaddrs[0]  # type: structs.Netaddr
+    benches.extend(_message('message.version', Version,
+                            {'addr_recv': addr, 'addr_from': addr,
+                             'version': 70015, 'services': 1,
+                             'timestamp': corpus.timestamps[0], 'nonce': 1,
+                             'user_agent': corpus.user_agents[0],
+                             'start_height': 500000, 'relay': True}))
+    benches.extend(_message('message.addr',
+                            Addr, {'addr_list': corpus.addr_list}))
+    payload = Addr(addr_list=corpus.addr_list,
+                   magic=MAGIC).buffers()[1]  # type: bytes
+    benches.append(Benchmark('message.addr.decode_batch',
+                             lambda: Addr.decode_batch(payload),
+                             len(corpus.addr_list), len(payload)))
+    benches.extend(_stream('stream', corpus.stream, len(corpus.messages)))
+    return benches
+
+
+def measure(bench: Benchmark, min_time: float = 0.2,
+            repeat: int = 3) -> Result:
+    """
+    Time benchmark, best of several rounds
+
+    Parameters
+    ----------
+    bench : Benchmark
+        benchmark to run
+    min_time : float
+        minimum duration of single round, in seconds
+    repeat : int
+        number of rounds
+
+    Returns
+    -------
+    Result
+        throughput of the fastest round
+    """
+    timer = time.perf_counter
+    start = timer()  # type: float
+    bench.run()
+    number = max(1, int(min_time / max(timer() - start, 1e-9)))  # type: int
+    best = float('inf')  # type: float
+    for _ in range(repeat):
+        start = timer()
+        for _ in range(number):
+            bench.run()
+        best = min(best, timer() - start)
+    return Result(bench.ops * number / best, bench.bytes * number / best)
+
+
+def run(benches: List[Benchmark], min_time: float = 0.2, repeat: int = 3,
+        progress: Optional[Callable[[str, Result], None]] = None
+        ) -> Dict[str, Result]:
+    """
+    Measure all benchmarks
+
+    Parameters
+    ----------
+    benches : list
+        benchmarks to run
+    min_time : float
+        minimum duration of single round, in seconds
+    repeat : int
+        number of rounds of every benchmark
+    progress : callable
+        function called with name and result of every finished benchmark
+
+    Returns
+    -------
+    dict
+        results by benchmark name
+    """
+    results = dict()  # type: Dict[str, Result]
+    for bench in benches:
+        results[bench.name] = measure(bench, min_time, repeat)
+        if progress is not None:
+            progress(bench.name, results[bench.name])
+    return results
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, Result],
+            tolerance: float = 0.1) -> List[Regression]:
+    """
+    Find benchmarks which got slower than baseline
+
+    Parameters
+    ----------
+    results : dict
+        current results by benchmark name
+    baseline : dict
+        saved results by benchmark name, missing ones are not compared
+    tolerance : float
+        accepted relative slowdown, e.g. 0.1 for 10%
+
+    Returns
+    -------
+    list
+        'Regression' objects, the worst first
+    """
+    regressions = list()  # type: List[Regression]
+    for (name, result) in results.items():
+        base = baseline.get(name)  # type: Optional[Result]
+        if base is None or base.ops_per_sec <= 0:
+            continue
+        ratio = result.ops_per_sec / base.ops_per_sec  # type: float
+        if ratio < 1 - tolerance:
+            regressions.append(Regression(name, base.ops_per_sec,
+                                          result.ops_per_sec, ratio))
+    return sorted(regressions, key=lambda r: r.ratio)
+
+
+def save(results: Dict[str, Result], path: str, **meta: Any) -> None:
+    """
+    Store results as JSON together with description of environment
+
+    Parameters
+    ----------
+    results : dict
+        results by benchmark name
+    path : str
+        path of JSON file
+    **meta
+        additional fields of description, e.g. corpus size
+    """
+    meta.update(python=platform.python_version(),
+                implementation=platform.python_implementation(),
+                machine=platform.machine(),
+                created=datetime.now(timezone.utc).isoformat())
+    with open(path, 'w') as f:
+        json.dump({'meta': meta,
+                   'results': {name: r._asdict()
+                               for (name, r) in sorted(results.items())}},
+                  f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load(path: str) -> Dict[str, Result]:
+    """
+    Read results stored with 'save'
+
+    Parameters
+    ----------
+    path : str
+        path of JSON file
+
+    Returns
+    -------
+    dict
+        results by benchmark name
+    """
+    with open(path) as f:
+        data = json.load(f)  # type: Dict[str, Any]
+    return {name: Result(**r) for (name, r) in data['results'].items()}
+
+
+def _codec(name: str, values: List[Any], encode: Callable[[Any], bytes],
+           decode_from: Callable[[structs.Buffer, int], Any]
+           ) -> List[Benchmark]:
+    buf = b''.join(encode(v) for v in values)  # type: bytes
+    count = len(values)  # type: int
+
+    def encode_all() -> None:
+        for v in values:
+            encode(v)
+
+    def decode_all() -> None:
+        offset = 0
+        for _ in range(count):
+            offset = decode_from(buf, offset)[1]
+
+    return [Benchmark(name + '.encode', encode_all, count, len(buf)),
+            Benchmark(name + '.decode', decode_all, count, len(buf))]
+
+
+def _bulk(name: str, values: List[Any], encode_many: Callable[..., bytes],
+          decode_many: Callable[..., Any]) -> List[Benchmark]:
+    buf = encode_many(values)  # type: bytes
+    count = len(values)  # type: int
+    return [Benchmark(name + '.encode_many', lambda: encode_many(values),
+                      count, len(buf)),
+            Benchmark(name + '.decode_many',
+                      lambda: decode_many(buf, 0, count), count, len(buf))]
+
+
+def _message(name: str, msg_cls: type,
+             payload: Dict[str, Any]) -> List[Benchmark]:
+    raw = bytes(msg_cls(magic=MAGIC, **payload))  # type: bytes
+    return [Benchmark(name + '.encode',
+                      lambda: msg_cls(magic=MAGIC, **payload).encode(),
+                      1, len(raw)),
+            Benchmark(name + '.parse', lambda: Message.parse(raw),
+                      1, len(raw)),
+            Benchmark(name + '.parse_verify',
+                      lambda: Message.parse(raw, verify=True), 1, len(raw))]
+
+
+def _stream(name: str, stream: bytes, count: int) -> List[Benchmark]:
+    chunks = [stream[i:i + 4096]
+              for i in range(0, len(stream), 4096)]  # type: List[bytes]
+    from_payload = Message.from_payload
+    peek_header = Message.peek_header
+
+    def frame() -> None:
+        framer = Framer(MAGIC)
+        for chunk in chunks:
+            framer.feed(chunk)
+
+    def peek() -> None:
+        pos = 0  # type: int
+        while pos < len(stream):
+            pos = peek_header(stream, pos, MAGIC).end
+
+    def decode() -> None:
+        framer = Framer(MAGIC)
+        for chunk in chunks:
+            for f in framer.feed(chunk):
+                from_payload(f.command, f.payload, f.magic, f.checksum)
+
+    def decode_metrics() -> None:
+        metrics = Metrics()
+        Message.set_metrics(metrics)
+        try:
+            framer = Framer(MAGIC)
+            for chunk in chunks:
+                for f in framer.feed(chunk):
+                    metrics.received(None, f.command, f.length)
+                    from_payload(f.command, f.payload, f.magic, f.checksum)
+        finally:
+            Message.set_metrics(None)
+
+    return [Benchmark(name + '.frame', frame, count, len(stream)),
+            Benchmark(name + '.peek', peek, count, len(stream)),
+            Benchmark(name + '.decode', decode, count, len(stream)),
+            Benchmark(name + '.decode_metrics', decode_metrics, count,
+                      len(stream))]
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+
+from array import array
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from coinflow.tables import Announcements
+
+try:
+    import numpy
+except ImportError:  # optional, installed with 'analysis' extra
+    numpy = None
+
+Estimates = NamedTuple('Estimates', (('ranks', array),
+                                     ('latitudes', array),
+                                     ('longitudes', array),
+                                     ('error', array),
+                                     ('announcers', array)))
+"""
+Columns of origin estimates: arrival rank of transaction, estimated latitude
+and longitude in degrees, error of estimate (weighted spread in kilometres
+for 'earliest', RMS of timing residuals in seconds for 'delay') and number
+of located announcers used
+"""
+
+EARTH_RADIUS = 6371.0  # type: float
+"""Mean radius of Earth, in kilometres"""
+
+
+class OriginEstimator(object):
+    """
+    Estimator of transaction origins from announcement times and peer
+    locations
+
+    Peer locations are converted once to unit vectors kept in flat columns
+    indexed by peer id. Announcements of whole batch of transactions are
+    sorted once by transaction and time. With NumPy installed (the
+    'analysis' extra), estimates of all transactions are then computed at
+    once with array operations over the sorted columns, grouped by
+    transaction with 'bincount'. Without it, the same estimates are computed
+    in pure Python, transaction by transaction, which is much slower for big
+    batches.
+
+    Two methods are supported:
+
+    * 'earliest' - mean of announcer locations on sphere, weighted by
+      exp(-delay / tau), where delay is measured from the first announcement,
+    * 'delay' - location of announcer which best explains announcement times
+      as origin time plus great-circle distance over propagation 'speed';
+      transactions with fewer than 3 located announcers fall back to
+      'earliest'.
+    """
+
+    METHODS = ('earliest', 'delay')  # type: Tuple[str, str]
+    """Supported estimation methods"""
+    TAU = 0.5  # type: float
+    """Default decay of announcer weight with delay, in seconds"""
+    SPEED = 40000.0  # type: float
+    """Default effective propagation speed of announcements, in km/s"""
+
+    def __init__(self, latitudes: Sequence[float],
+                 longitudes: Sequence[float], method: str = 'earliest',
+                 tau: float = TAU, speed: float = SPEED,
+                 vectorized: Optional[bool] = None) -> None:
+        """
+        Constructor for 'OriginEstimator' class.
+
+        Parameters
+        ----------
+        latitudes : sequence
+            latitude of every peer id in degrees, NaN if unknown
+        longitudes : sequence
+            longitude of every peer id in degrees, NaN if unknown
+        method : str
+            'earliest' or 'delay'
+        tau : float
+            decay of announcer weight with delay, in seconds
+        speed : float
+            effective propagation speed of announcements, in km/s
+        vectorized : bool
+            whether NumPy should be used, by default if it is installed
+        """
+        if method not in self.METHODS:
+            raise ValueError('unknown method: {0!r}'.format(method))
+        if vectorized and numpy is None:
+            raise ImportError('vectorized estimation requires numpy')
+        self.vectorized = numpy is not None if vectorized is None else \
+            vectorized  # type: bool
+        self.method = method  # type: str
+        self.tau = tau  # type: float
+        self.speed = speed  # type: float
+        self.located = array('b')  # type: array
+        """Whether location of peer id is known"""
+        self._x = array('d')  # type: array
+        self._y = array('d')  # type: array
+        self._z = array('d')  # type: array
+        for (lat, lon) in zip(latitudes, longitudes):
+            known = not (math.isnan(lat) or math.isnan(lon))  # type: bool
+            (lat, lon) = (math.radians(lat), math.radians(lon)) if known \
+                else (0.0, 0.0)
+            self.located.append(known)
+            self._x.append(math.cos(lat) * math.cos(lon))
+            self._y.append(math.cos(lat) * math.sin(lon))
+            self._z.append(math.sin(lat))
+        if self.vectorized:
+            self._vectors = numpy.array([self._x, self._y, self._z],
+                                        dtype=numpy.float64).T  # type: Any
+
+    @classmethod
+    def from_geo(cls, geo: Any, addresses: Sequence[Tuple[str, int]],
+                 **kwargs: Any) -> Any:
+        """
+        Create estimator locating peers with geolocation database
+
+        Parameters
+        ----------
+        geo : coinflow.geo.GeoDatabase
+            geolocation database
+        addresses : sequence
+            address of every peer id, e.g. 'Node.addresses'
+        **kwargs
+            other 'OriginEstimator' arguments
+
+        Returns
+        -------
+        OriginEstimator
+            estimator of peers at given addresses
+        """
+        (lats, lons) = (array('d'), array('d'))
+        for (host, _) in addresses:
+            loc = geo.lookup(host)  # type: Any
+            lats.append(loc.latitude if loc is not None else math.nan)
+            lons.append(loc.longitude if loc is not None else math.nan)
+        return cls(lats, lons, **kwargs)
+
+    def estimate(self, announcements: Announcements) -> Estimates:
+        """
+        Estimate origins of all transactions in batch of announcements
+
+        Parameters
+        ----------
+        announcements : coinflow.tables.Announcements
+            announcements, e.g. from 'coinflow.tables.FirstSeen.drain'
+
+        Returns
+        -------
+        Estimates
+            one estimate per transaction with located announcer, in order of
+            arrival rank
+        """
+        if self.vectorized:
+            return self._estimate_vectorized(announcements)
+        out = Estimates(array('Q'), array('d'), array('d'), array('d'),
+                        array('I'))  # type: Estimates
+        located = self.located  # type: array
+        n = len(located)  # type: int
+        (ranks, peers, times) = announcements
+        order = sorted((i for i in range(len(ranks))
+                        if peers[i] < n and located[peers[i]]),
+                       key=lambda i: (ranks[i], times[i]))  # type: List[int]
+        estimate = self._earliest if self.method == 'earliest' else \
+            self._delay
+        start = 0  # type: int
+        for end in range(1, len(order) + 1):
+            if end < len(order) and \
+                    ranks[order[end]] == ranks[order[start]]:
+                continue
+            group = order[start:end]  # type: List[int]
+            (lat, lon, error) = estimate([peers[i] for i in group],
+                                         [times[i] for i in group])
+            out.ranks.append(ranks[group[0]])
+            out.latitudes.append(lat)
+            out.longitudes.append(lon)
+            out.error.append(error)
+            out.announcers.append(len(group))
+            start = end
+        return out
+
+    def _estimate_vectorized(self, announcements: Announcements) -> Estimates:
+        np = numpy  # type: Any
+        (ranks, peers, times) = (np.frombuffer(c, dtype=t) if len(c) else
+                                 np.zeros(0, dtype=t) for (c, t) in
+                                 zip(announcements, (np.uint64, np.uint32,
+                                                     np.uint64)))
+        located = np.frombuffer(self.located, dtype=np.int8) \
+            if len(self.located) else np.zeros(0, dtype=np.int8)
+        known = peers < len(located)
+        known[known] = located[peers[known]] != 0
+        (ranks, peers, times) = (ranks[known], peers[known], times[known])
+        order = np.lexsort((times, ranks))
+        (ranks, peers, times) = (ranks[order], peers[order], times[order])
+        if not len(ranks):
+            return Estimates(array('Q'), array('d'), array('d'), array('d'),
+                             array('I'))
+
+        # Announcements of single transaction form contiguous group
+        first = np.empty(len(ranks), dtype=bool)
+        first[0] = True
+        first[1:] = ranks[1:] != ranks[:-1]
+        starts = np.flatnonzero(first)
+        group = np.cumsum(first) - 1
+        counts = np.diff(np.append(starts, len(ranks)))
+        secs = (times - times[starts][group]).astype(np.float64) * 1e-9
+        vectors = self._vectors[peers]
+
+        # 'earliest': weighted mean of announcer vectors
+        weights = np.exp(-secs / self.tau)
+        mean = np.stack([np.bincount(group, weights * vectors[:, k])
+                         for k in range(3)], axis=1)
+        norm = np.sqrt((mean * mean).sum(axis=1))
+        flat = norm < 1e-12
+        mean[flat] = vectors[starts[flat]]
+        norm[flat] = 1.0
+        mean /= norm[:, None]
+        angles = _angles(vectors, mean[group])
+        error = np.bincount(group, weights * angles) / \
+            np.bincount(group, weights) * EARTH_RADIUS
+
+        if self.method == 'delay':
+            (best, cost) = self._delay_vectorized(peers, secs, group,
+                                                  starts, counts)
+            # Transactions with fewer than 3 distinct announcers keep
+            # 'earliest' estimate
+            by_peer = np.lexsort((peers, group))
+            new = np.empty(len(peers), dtype=bool)
+            new[0] = True
+            new[1:] = (group[by_peer][1:] != group[by_peer][:-1]) | \
+                (peers[by_peer][1:] != peers[by_peer][:-1])
+            distinct = np.bincount(group[by_peer], new)
+            timed = distinct >= 3
+            mean[timed] = self._vectors[best[timed]]
+            error[timed] = np.sqrt(cost[timed] / counts[timed])
+
+        lat = np.degrees(np.arcsin(np.clip(mean[:, 2], -1.0, 1.0)))
+        lon = np.degrees(np.arctan2(mean[:, 1], mean[:, 0]))
+        return Estimates(_column('Q', ranks[starts], np.uint64),
+                         _column('d', lat, np.float64),
+                         _column('d', lon, np.float64),
+                         _column('d', error, np.float64),
+                         _column('I', counts, np.uint32))
+
+    def _delay_vectorized(self, peers: Any, secs: Any, group: Any,
+                          starts: Any, counts: Any) -> Tuple[Any, Any]:
+        """
+        Best candidate row and its cost for every transaction, evaluating
+        every announcer of transaction against every other one at once
+        """
+        np = numpy  # type: Any
+        size = counts[group]  # group size of every candidate row
+        candidate = np.repeat(np.arange(len(peers)), size)
+        skip = np.repeat(np.cumsum(size) - size, size)
+        row = starts[group[candidate]] + np.arange(len(candidate)) - skip
+        vectors = self._vectors
+        residuals = secs[row] - _angles(vectors[peers[candidate]],
+                                        vectors[peers[row]]) * \
+            (EARTH_RADIUS / self.speed)
+        mean = np.bincount(candidate, residuals) / size
+        cost = np.bincount(candidate, (residuals - mean[candidate]) ** 2)
+        # The cheapest candidate of every group, lowest peer id on ties
+        order = np.lexsort((peers, cost, group))
+        best = order[starts]
+        return (peers[best], cost[best])
+
+    def _earliest(self, peers: List[int],
+                  times: List[int]) -> Tuple[float, float, float]:
+        (xs, ys, zs) = (self._x, self._y, self._z)
+        (t0, scale) = (times[0], -1e-9 / self.tau)  # type: int, float
+        weights = [math.exp((t - t0) * scale) for t in times]
+        x = sum(w * xs[p] for (w, p) in zip(weights, peers))  # type: float
+        y = sum(w * ys[p] for (w, p) in zip(weights, peers))  # type: float
+        z = sum(w * zs[p] for (w, p) in zip(weights, peers))  # type: float
+        norm = math.sqrt(x * x + y * y + z * z)  # type: float
+        if norm < 1e-12:
+            # Announcers evenly spread around globe, take the first one
+            (x, y, z) = (xs[peers[0]], ys[peers[0]], zs[peers[0]])
+            norm = 1.0
+        (x, y, z) = (x / norm, y / norm, z / norm)
+        spread = sum(w * _angle(x, y, z, xs[p], ys[p], zs[p])
+                     for (w, p) in zip(weights, peers)) / sum(weights)
+        return _degrees(x, y, z) + (spread * EARTH_RADIUS,)
+
+    def _delay(self, peers: List[int],
+               times: List[int]) -> Tuple[float, float, float]:
+        if len(set(peers)) < 3:
+            return self._earliest(peers, times)
+        (xs, ys, zs) = (self._x, self._y, self._z)
+        secs = [(t - times[0]) * 1e-9 for t in times]  # type: List[float]
+        per_rad = EARTH_RADIUS / self.speed  # type: float
+        best = (math.inf, peers[0])  # type: Tuple[float, int]
+        for c in set(peers):
+            (cx, cy, cz) = (xs[c], ys[c], zs[c])
+            residuals = [s - _angle(cx, cy, cz, xs[p], ys[p], zs[p]) *
+                         per_rad for (s, p) in zip(secs, peers)]
+            mean = sum(residuals) / len(residuals)  # type: float
+            cost = sum((r - mean) ** 2 for r in residuals)  # type: float
+            best = min(best, (cost, c))
+        (cost, c) = best
+        return _degrees(xs[c], ys[c], zs[c]) + \
+            (math.sqrt(cost / len(peers)),)
+
+
+def _angle(ax: float, ay: float, az: float,
+           bx: float, by: float, bz: float) -> float:
+    """
+    Angle between unit vectors, in radians
+    """
+    dot = ax * bx + ay * by + az * bz  # type: float
+    return math.acos(max(-1.0, min(1.0, dot)))
+
+
+def _degrees(x: float, y: float, z: float) -> Tuple[float, float]:
+    """
+    Latitude and longitude of unit vector, in degrees
+    """
+    return (math.degrees(math.asin(max(-1.0, min(1.0, z)))),
+            math.degrees(math.atan2(y, x)))
+
+
+def _angles(a: Any, b: Any) -> Any:
+    """
+    Angles between rows of two arrays of unit vectors, in radians
+    """
+    return numpy.arccos(numpy.clip((a * b).sum(axis=1), -1.0, 1.0))
+
+
+def _column(typecode: str, values: Any, dtype: Any) -> array:
+    """
+    Copy NumPy array to 'array' column of given type
+    """
+    return array(typecode, values.astype(dtype).tobytes())
@@ -0,0 +1,6 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .OriginEstimator import OriginEstimator, Estimates
+
+__all__ = ['OriginEstimator', 'Estimates']
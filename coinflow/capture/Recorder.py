@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import threading
+import time
+
+from collections import deque
+from typing import (Any, BinaryIO, Deque, Hashable, List, Optional, Set,
+                    Tuple)
+
+from .Replay import Replay
+from coinflow.protocol.Framer import Frame
+
+logger = logging.getLogger(__name__)
+
+Pending = Tuple[float, Hashable, Frame]
+
+
+class Recorder(object):
+    """
+    Append-only recorder of received frames into rotating segment files
+
+    'record' only stamps frame with receive time and appends it to pending
+    queue, so it is safe to call for every frame from event loop. Background
+    thread drains queue in batches, packs records in 'Replay' record format
+    and writes every batch with single call. Segment is rotated once it
+    grows above 'segment_size'.
+
+    Next to every segment sparse index (segment path with '.idx' suffix) is
+    written, holding offset of the first record of every command seen in
+    every 'index_interval' seconds, which lets 'Replay.seek' jump straight
+    to given time or command.
+
+    Unlike timeouts of 'Node', which use monotonic clock, records are
+    stamped with wall-clock time: captures of many nodes are merged and
+    compared with each other and with timestamps of 'addr' entries, and
+    'Replay.seek' takes absolute time. Stamps are kept from going back, so
+    clock steps cannot reorder records within capture.
+    """
+
+    SEGMENT_SIZE = 64 * 1024 * 1024  # type: int
+    """Default size after which segment is rotated, in bytes"""
+    BATCH_SIZE = 256 * 1024  # type: int
+    """Default amount of pending data which wakes writer up, in bytes"""
+    MAX_PENDING = 64 * 1024 * 1024  # type: int
+    """Default limit of pending data, frames above it are dropped"""
+
+    def __init__(self, directory: str, segment_size: int = SEGMENT_SIZE,
+                 index_interval: float = 1.0, flush_interval: float = 0.5,
+                 batch_size: int = BATCH_SIZE,
+                 max_pending: int = MAX_PENDING) -> None:
+        """
+        Constructor for 'Recorder' class.
+
+        Parameters
+        ----------
+        directory : str
+            directory of segment files, created if missing
+        segment_size : int
+            size after which segment is rotated, in bytes
+        index_interval : float
+            span of time covered by single index slot, in seconds
+        flush_interval : float
+            maximum time frame waits in queue, in seconds
+        batch_size : int
+            amount of pending data which wakes writer before flush interval
+        max_pending : int
+            limit of pending data, frames above it are dropped and counted
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory  # type: str
+        self.segment_size = segment_size  # type: int
+        self.index_interval = index_interval  # type: float
+        self.flush_interval = flush_interval  # type: float
+        self.batch_size = batch_size  # type: int
+        self.max_pending = max_pending  # type: int
+        self.recorded = 0  # type: int
+        """Number of frames written to disk"""
+        self.dropped = 0  # type: int
+        """Number of frames dropped because writer fell behind"""
+        self._pending = deque()  # type: Deque[Pending]
+        self._count = 0  # type: int
+        """Frames queued so far, updated only by 'record'"""
+        self._queued = 0  # type: int
+        """Bytes queued so far, updated only by 'record'"""
+        self._drained = 0  # type: int
+        """Bytes taken from queue so far, updated only by writer thread"""
+        self._last = 0.0  # type: float
+        self._wakeup = threading.Event()  # type: threading.Event
+        self._written = threading.Condition()  # type: threading.Condition
+        """Notified by writer thread after every drain and once it exits"""
+        self._stopped = False  # type: bool
+        self._closed = False  # type: bool
+        self._segment = None  # type: Optional[BinaryIO]
+        self._index = None  # type: Optional[BinaryIO]
+        self._seq = max([int(name[:-4]) for name in os.listdir(directory)
+                         if name.endswith('.cap') and name[:-4].isdigit()],
+                        default=0)  # type: int
+        self._size = 0  # type: int
+        self._slot = None  # type: Optional[int]
+        self._indexed = set()  # type: Set[bytes]
+        self._thread = threading.Thread(target=self._run,
+                                        name='coinflow-recorder',
+                                        daemon=True)  # type: threading.Thread
+        self._thread.start()
+
+    def __enter__(self) -> Any:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def record(self, peer: Hashable, frame: Frame,
+               timestamp: Optional[float] = None) -> bool:
+        """
+        Queue received frame for writing
+
+        Parameters
+        ----------
+        peer : hashable
+            peer id, e.g. (host, port) tuple, written as 'host:port'
+        frame : coinflow.protocol.Framer.Frame
+            frame as received
+        timestamp : float
+            receive time in seconds since epoch, taken from wall clock if not
+            given, never goes back
+
+        Returns
+        -------
+        bool
+            False if frame was dropped
+        """
+        if self._queued - self._drained >= self.max_pending or self._closed:
+            self.dropped += 1
+            return False
+        if timestamp is None:
+            timestamp = time.time()
+        if timestamp < self._last:
+            timestamp = self._last
+        self._last = timestamp
+        self._pending.append((timestamp, peer, frame))
+        self._queued += len(frame.payload)
+        self._count += 1
+        if self._queued - self._drained >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait until all frames queued so far are written
+
+        Parameters
+        ----------
+        timeout : float
+            maximum time to wait, in seconds
+        """
+        count = self._count  # type: int
+        self._wakeup.set()
+        with self._written:
+            self._written.wait_for(
+                    lambda: self.recorded >= count or self._stopped, timeout)
+
+    def close(self) -> None:
+        """
+        Write all queued frames and close current segment
+        """
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        try:
+            while not self._closed:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self._drain()
+            self._drain()
+        except Exception:
+            logger.exception('capture recorder failed')
+            self._closed = True
+        finally:
+            self._close_segment()
+            with self._written:
+                self._stopped = True
+                self._written.notify_all()
+
+    def _drain(self) -> None:
+        pending = self._pending  # type: Deque[Pending]
+        batch = list()  # type: List[bytes]
+        entries = list()  # type: List[bytes]
+        pack_record = Replay.RECORD.pack
+        pack_header = Replay.HEADER.pack
+        pack_index = Replay.INDEX.pack
+        h_len = Replay.HEADER.size  # type: int
+        size = 0  # type: int
+        count = 0  # type: int
+
+        while pending:
+            (timestamp, peer, frame) = pending.popleft()
+            self._drained += len(frame.payload)
+            if self._segment is None or \
+                    self._size + size >= self.segment_size:
+                self._write(batch, entries)
+                batch = list()
+                entries = list()
+                size = 0
+                self._open_segment()
+            slot = int(timestamp // self.index_interval)  # type: int
+            if slot != self._slot:
+                self._slot = slot
+                self._indexed.clear()
+            if frame.command not in self._indexed:
+                self._indexed.add(frame.command)
+                entries.append(pack_index(timestamp, frame.command,
+                                          self._size + size))
+            raw_peer = _peer_id(peer)  # type: bytes
+            batch.append(pack_record(timestamp, len(raw_peer),
+                                     h_len + frame.length))
+            batch.append(raw_peer)
+            batch.append(pack_header(frame.magic, frame.command,
+                                     frame.length, frame.checksum))
+            batch.append(frame.payload)
+            size += Replay.RECORD.size + len(raw_peer) + h_len + \
+                frame.length
+            count += 1
+        self._write(batch, entries)
+        with self._written:
+            self.recorded += count
+            self._written.notify_all()
+
+    def _write(self, batch: List[bytes], entries: List[bytes]) -> None:
+        if not batch:
+            return
+        data = b''.join(batch)  # type: bytes
+        self._segment.write(data)
+        self._segment.flush()
+        self._size += len(data)
+        if entries:
+            self._index.write(b''.join(entries))
+            self._index.flush()
+
+    def _open_segment(self) -> None:
+        self._close_segment()
+        self._seq += 1
+        path = os.path.join(self.directory,
+                            '{0:08d}.cap'.format(self._seq))  # type: str
+        self._segment = open(path, 'xb')
+        self._index = open(path + '.idx', 'xb')
+        self._segment.write(Replay.SIGNATURE)
+        self._size = len(Replay.SIGNATURE)
+        self._slot = None
+
+    def _close_segment(self) -> None:
+        if self._segment is not None:
+            self._segment.close()
+            self._index.close()
+            self._segment = self._index = None
+
+
+def _peer_id(peer: Hashable) -> bytes:
+    """
+    Encode peer id, (host, port) tuples are written as 'host:port'
+    """
+    if isinstance(peer, tuple):
+        return '{0}:{1}'.format(*peer).encode('utf-8')
+    return str(peer).encode('utf-8')
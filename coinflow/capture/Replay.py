@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import mmap
+import os
+import struct
+
+from bisect import bisect_right
+from typing import (Any, Dict, Iterable, Iterator, List, NamedTuple, Optional,
+                    Set, Tuple)
+
+from coinflow.protocol.Framer import Framer
+from coinflow.protocol.magic import bitcoin
+from coinflow.protocol.messages import Message
+import coinflow.protocol.structs as structs
+
+Record = NamedTuple('Record', (('timestamp', Optional[float]),
+                               ('peer', Optional[str]),
+                               ('message', Message)))
+"""Replayed message with capture time and peer, both None in raw streams"""
+
+RawFrame = Tuple[Optional[float], Optional[str], int, bytes, bytes,
+                 memoryview]
+"""Timestamp, peer, magic, raw command, checksum and payload view"""
+
+IndexEntry = NamedTuple('IndexEntry', (('timestamp', float),
+                                       ('command', bytes), ('offset', int)))
+"""Sparse index entry pointing at record in record file"""
+
+
+class Replay(object):
+    """
+    Reader of captured peer traffic stored in memory-mapped files
+
+    Two formats are understood: raw stream, which is plain concatenation of
+    messages as seen on the wire, and record file starting with 'SIGNATURE'
+    and holding 'RECORD' headers, each followed by peer id and single
+    complete message. Headers are read and payloads are sliced straight from
+    mapped file, so payload bytes are copied only by decoders which build
+    values out of them, the same ones the live node uses.
+    """
+
+    SIGNATURE = b'CFCAP\x00\x01\x00'  # type: bytes
+    """First bytes of record file, signature and format version"""
+    RECORD = struct.Struct('<dHI')  # type: struct.Struct
+    """Capture timestamp, length of peer id and length of message"""
+    HEADER = Framer.HEADER  # type: struct.Struct
+    """Precompiled message header"""
+    INDEX = struct.Struct('<d12sQ')  # type: struct.Struct
+    """Index entry: record timestamp, raw command and record offset"""
+
+    def __init__(self, path: str, magic: int = bitcoin['mainnet'],
+                 verify: bool = True,
+                 max_length: int = Framer.MAX_LENGTH) -> None:
+        """
+        Constructor for 'Replay' class.
+
+        Parameters
+        ----------
+        path : str
+            path of capture file
+        magic : int
+            Magic value used in network
+        verify : bool
+            whether payload checksums should be verified, may be disabled
+            for trusted captures
+        max_length : int
+            Maximum accepted payload length
+        """
+        self.path = path  # type: str
+        self.magic = magic  # type: int
+        self.verify = verify  # type: bool
+        self.max_length = max_length  # type: int
+        self.dropped = 0  # type: int
+        """Number of bytes skipped as garbage or failing checksum"""
+        self.malformed = 0  # type: int
+        """Number of messages skipped because payload could not be decoded"""
+        self._marker = struct.pack('<L', magic)  # type: bytes
+        with open(path, 'rb') as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0,
+                                     access=mmap.ACCESS_READ)  # type: Any
+            except ValueError:
+                self._mm = b''  # empty file cannot be mapped
+        self._view = memoryview(self._mm)  # type: memoryview
+        self.records = self._mm[:len(self.SIGNATURE)] == \
+            self.SIGNATURE  # type: bool
+        self._entries = None  # type: Optional[List[IndexEntry]]
+
+    def __enter__(self) -> Any:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[Record]:
+        return self.messages()
+
+    def close(self) -> None:
+        """
+        Unmap capture file
+
+        Payload views returned by 'frames' must be released before.
+        """
+        self._view.release()
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+
+    def index(self) -> List[IndexEntry]:
+        """
+        Read sparse index written by 'Recorder' next to record file
+
+        Returns
+        -------
+        list
+            'IndexEntry' objects in file order, empty if there is no index
+        """
+        if self._entries is None:
+            self._entries = list()
+            if os.path.exists(self.path + '.idx'):
+                with open(self.path + '.idx', 'rb') as f:
+                    data = f.read()  # type: bytes
+                # Drop entry torn by crash of recorder
+                data = data[:len(data) - len(data) % self.INDEX.size]
+                self._entries = [IndexEntry(*e)
+                                 for e in self.INDEX.iter_unpack(data)]
+        return self._entries
+
+    def seek(self, timestamp: float, command: Optional[str] = None) -> int:
+        """
+        Find offset from which replay covers all records since given time
+
+        Index is sparse, so replay started at returned offset may also yield
+        some earlier records.
+
+        Parameters
+        ----------
+        timestamp : float
+            capture time to seek to
+        command : str
+            command of records of interest, all are considered if not given
+
+        Returns
+        -------
+        int
+            offset to pass to 'messages' or 'frames'
+        """
+        if not self.records:
+            raise ValueError('{0} is raw stream without index'.format(
+                                                                    self.path))
+        entries = self.index()  # type: List[IndexEntry]
+        if command is not None:
+            raw = struct.pack('12s', command.encode('ascii'))  # type: bytes
+            entries = [e for e in entries if e.command == raw]
+            if not entries:
+                return len(self._mm)
+        elif not entries:
+            return len(self.SIGNATURE)
+        i = bisect_right([e.timestamp for e in entries], timestamp) - 1
+        return entries[max(i, 0)].offset
+
+    def messages(self, commands: Optional[Iterable[str]] = None,
+                 lazy: bool = False,
+                 offset: Optional[int] = None) -> Iterator[Record]:
+        """
+        Iterate decoded messages in capture order
+
+        Parameters
+        ----------
+        commands : iterable
+            names of commands to replay, other messages are skipped before
+            decoding, all are replayed if not given
+        lazy : bool
+            whether payload decoding should be deferred until first access,
+            payload is then copied out of mapped file
+        offset : int
+            position of the first record or message to replay, e.g. found
+            with 'seek', start of file if not given
+
+        Returns
+        -------
+        iterator
+            'Record' objects
+        """
+        from_payload = Message.from_payload
+        for (timestamp, peer, magic, command, checksum,
+             payload) in self.frames(commands, offset):
+            try:
+                msg = from_payload(command, payload, magic, checksum,
+                                   lazy=lazy)  # type: Message
+            except (struct.error, ValueError, IndexError):
+                self.malformed += 1
+                continue
+            finally:
+                payload.release()
+            yield Record(timestamp, peer, msg)
+
+    def frames(self, commands: Optional[Iterable[str]] = None,
+               offset: Optional[int] = None) -> Iterator[RawFrame]:
+        """
+        Iterate undecoded frames in capture order
+
+        Parameters
+        ----------
+        commands : iterable
+            names of commands to replay, all are replayed if not given
+        offset : int
+            position of the first record or message to replay, start of file
+            if not given
+
+        Returns
+        -------
+        iterator
+            'RawFrame' tuples, payload is view of mapped file
+
+        Messages of other commands are skipped by their header alone, their
+        payloads are neither hashed nor sliced, so filtering capture down to
+        few commands costs little more than reading it.
+        """
+        wanted = None  # type: Optional[Set[bytes]]
+        if commands is not None:
+            wanted = {struct.pack('12s', c.encode('ascii'))
+                      for c in commands}
+        if self.records:
+            return self._record_frames(
+                len(self.SIGNATURE) if offset is None else offset, wanted)
+        return self._stream_frames(offset or 0, wanted)
+
+    def _record_frames(self, pos: int,
+                       wanted: Optional[Set[bytes]]) -> Iterator[RawFrame]:
+        mm = self._mm
+        view = self._view  # type: memoryview
+        unpack_record = self.RECORD.unpack_from
+        unpack_header = self.HEADER.unpack_from
+        r_len = self.RECORD.size  # type: int
+        h_len = self.HEADER.size  # type: int
+        peers = dict()  # type: Dict[bytes, str]
+        size = len(mm)  # type: int
+
+        while pos + r_len <= size:
+            (timestamp, p_len, d_len) = unpack_record(mm, pos)
+            start = pos + r_len + p_len  # type: int
+            end = start + d_len  # type: int
+            if end > size:
+                break
+            raw_peer = pos + r_len  # type: int
+            pos = end
+            if d_len < h_len:
+                self.dropped += d_len
+                continue
+            (magic, command, length, checksum) = unpack_header(mm, start)
+            if magic != self.magic or length != d_len - h_len:
+                self.dropped += d_len
+                continue
+            if wanted is not None and command not in wanted:
+                continue
+            payload = view[start + h_len:end]  # type: memoryview
+            if self.verify and structs.dsha256(payload)[:4] != checksum:
+                payload.release()
+                self.dropped += d_len
+                continue
+            key = mm[raw_peer:start]  # type: bytes
+            peer = peers.get(key)  # type: Optional[str]
+            if peer is None:
+                peer = peers[key] = key.decode('utf-8')
+            yield (timestamp, peer, magic, command, checksum, payload)
+        self.dropped += size - pos
+
+    def _stream_frames(self, pos: int,
+                       wanted: Optional[Set[bytes]]) -> Iterator[RawFrame]:
+        mm = self._mm
+        view = self._view  # type: memoryview
+        unpack_header = self.HEADER.unpack_from
+        h_len = self.HEADER.size  # type: int
+        size = len(mm)  # type: int
+
+        while True:
+            start = mm.find(self._marker, pos)  # type: int
+            if start < 0 or start + h_len > size:
+                break
+            self.dropped += start - pos
+            (magic, command, length, checksum) = unpack_header(mm, start)
+            end = start + h_len + length  # type: int
+            if length > self.max_length or end > size:
+                self.dropped += 1
+                pos = start + 1
+                continue
+            if wanted is not None and command not in wanted and \
+                    (end == size or mm[end:end + 4] == self._marker):
+                # Unverified message is trusted to be what it claims only
+                # when next one starts right after it
+                pos = end
+                continue
+            payload = view[start + h_len:end]  # type: memoryview
+            if self.verify and structs.dsha256(payload)[:4] != checksum:
+                payload.release()
+                self.dropped += 1
+                pos = start + 1
+                continue
+            pos = end
+            if wanted is None or command in wanted:
+                yield (None, None, magic, command, checksum, payload)
+            else:
+                payload.release()
+        self.dropped += size - pos
@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .Replay import IndexEntry, Record, Replay
+from .Recorder import Recorder
+
+__all__ = ['IndexEntry', 'Record', 'Replay', 'Recorder']
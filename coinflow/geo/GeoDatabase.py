@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from socket import AF_INET6, inet_aton, inet_pton
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:  # optional, installed with 'analysis' extra
+    numpy = None
+
+Location = NamedTuple('Location', (('latitude', float), ('longitude', float),
+                                   ('label', str)))
+
+_IPV4_PREFIX = b'\x00' * 10 + b'\xff\xff'  # type: bytes
+_MAPPED = struct.Struct('>12sI')  # type: struct.Struct
+
+
+class GeoDatabase(object):
+    """
+    IP to location lookup over memory-mapped table of address ranges
+
+    Database file is built once from CSV with 'build' and then only mapped
+    into memory, so opening it costs nothing regardless of its size. IPv4
+    ranges are stored as little-endian uint32 columns which are searched
+    with 'bisect' directly on mapped memory. IPv6 ranges are stored as 16-byte
+    big-endian keys. 'lookup' keeps most recently resolved addresses in LRU
+    cache, 'locate_many' resolves whole packed address columns, with single
+    'numpy.searchsorted' over IPv4 ranges if NumPy is installed.
+
+    File layout: header, IPv4 starts, ends and location ids, IPv6 starts,
+    ends and location ids, location records and label blob.
+    """
+
+    MAGIC = b'CFGEO\x00\x01\x00'  # type: bytes
+    """File signature and format version"""
+    HEADER = struct.Struct('<8sIII')  # type: struct.Struct
+    """Signature, number of IPv4 ranges, IPv6 ranges and locations"""
+    LOCATION = struct.Struct('<ffIH2x')  # type: struct.Struct
+    """Latitude, longitude, label offset and label length"""
+    CACHE_SIZE = 1 << 16  # type: int
+    """Default number of addresses kept in lookup cache"""
+
+    def __init__(self, path: str, cache_size: int = CACHE_SIZE) -> None:
+        """
+        Constructor for 'GeoDatabase' class.
+
+        Parameters
+        ----------
+        path : str
+            path of database file created by 'build'
+        cache_size : int
+            number of most recently looked up addresses to cache
+        """
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)  # type: memoryview
+        (magic, n4, n6, nloc) = self.HEADER.unpack_from(self._mm)
+        if magic != self.MAGIC:
+            self.close()
+            raise ValueError('{0} is not coinflow geo database'.format(path))
+
+        offset = self.HEADER.size  # type: int
+        (self._starts4, offset) = self._u32(offset, n4)
+        (self._ends4, offset) = self._u32(offset, n4)
+        (self._locs4, offset) = self._u32(offset, n4)
+        self._starts6 = _Keys(self._mm, offset, n6)  # type: _Keys
+        self._ends6 = _Keys(self._mm, offset + n6 * 16, n6)  # type: _Keys
+        offset += n6 * 32
+        (self._locs6, offset) = self._u32(offset, n6)
+        self._locations = offset  # type: int
+        self._labels = offset + nloc * self.LOCATION.size  # type: int
+        self.lookup = lru_cache(cache_size)(self._lookup)
+
+    def __enter__(self) -> Any:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """
+        Number of address ranges in database
+        """
+        return len(self._starts4) + len(self._starts6)
+
+    def close(self) -> None:
+        """
+        Unmap database file
+        """
+        for name in ('_starts4', '_ends4', '_locs4', '_locs6'):
+            column = getattr(self, name, None)
+            if isinstance(column, memoryview):
+                column.release()
+        self._view.release()
+        self._mm.close()
+
+    def _lookup(self, ip: str) -> Optional[Location]:
+        """
+        Find location of single address, cached as 'lookup'
+
+        Parameters
+        ----------
+        ip : str
+            IPv4 or IPv6 address
+
+        Returns
+        -------
+        Location
+            location of address or None if it is not covered by database
+        """
+        if ':' in ip:
+            return self.location(self.locate(inet_pton(AF_INET6, ip)))
+        return self.location(self._locate4(
+                                    int.from_bytes(inet_aton(ip), 'big')))
+
+    def locate(self, ip: bytes) -> int:
+        """
+        Find location id of packed address
+
+        Parameters
+        ----------
+        ip : bytes
+            16-byte IPv6 or IPv4-mapped address
+
+        Returns
+        -------
+        int
+            location id or -1 if address is not covered by database
+        """
+        if ip[:12] == _IPV4_PREFIX:
+            return self._locate4(int.from_bytes(ip[12:], 'big'))
+        i = bisect_right(self._starts6, ip) - 1  # type: int
+        if i >= 0 and ip <= self._ends6[i]:
+            return self._locs6[i]
+        return -1
+
+    def locate_many(self, ips: bytes,
+                    vectorized: Optional[bool] = None) -> array:
+        """
+        Find location ids of many packed addresses
+
+        Accepts columns such as 'AddrBatch.ips' or 'NetaddrTable.ips'.
+
+        Parameters
+        ----------
+        ips : bytes
+            concatenated 16-byte IPv6 or IPv4-mapped addresses
+        vectorized : bool
+            whether NumPy should be used, by default if it is installed
+
+        Returns
+        -------
+        array
+            int32 location ids, -1 for addresses not covered by database
+        """
+        if vectorized and numpy is None:
+            raise ImportError('vectorized lookup requires numpy')
+        if vectorized or (vectorized is None and numpy is not None):
+            return self._locate_vectorized(ips)
+        out = array('i')  # type: array
+        starts4 = self._starts4
+        ends4 = self._ends4
+        locs4 = self._locs4
+        for (i, (prefix, v4)) in enumerate(_MAPPED.iter_unpack(ips)):
+            if prefix == _IPV4_PREFIX:
+                j = bisect_right(starts4, v4) - 1  # type: int
+                out.append(locs4[j] if j >= 0 and v4 <= ends4[j] else -1)
+            else:
+                out.append(self.locate(bytes(ips[i * 16:i * 16 + 16])))
+        return out
+
+    def _locate_vectorized(self, ips: bytes) -> array:
+        """
+        'locate_many' searching all IPv4 addresses at once; IPv6 ones, rare
+        in practice, are still looked up one by one
+        """
+        np = numpy  # type: Any
+        raw = np.frombuffer(ips, dtype=np.uint8).reshape(-1, 16)  # type: Any
+        mapped = (raw[:, :12] == np.frombuffer(_IPV4_PREFIX,
+                                                dtype=np.uint8)).all(axis=1)
+        v4 = raw[mapped, 12:].copy().view('>u4').ravel().astype(np.uint32)
+        out = np.full(len(raw), -1, dtype=np.int32)  # type: Any
+        if len(self._starts4) and len(v4):
+            starts = np.frombuffer(self._starts4, dtype=np.uint32)
+            j = np.searchsorted(starts, v4, side='right') - 1  # type: Any
+            k = np.maximum(j, 0)
+            found = (j >= 0) & (v4 <= np.frombuffer(self._ends4,
+                                                   dtype=np.uint32)[k])
+            out[mapped] = np.where(found, np.frombuffer(
+                                        self._locs4, dtype=np.uint32)[k], -1)
+        for i in np.flatnonzero(~mapped):
+            out[i] = self.locate(bytes(ips[i * 16:i * 16 + 16]))
+        result = array('i')  # type: array
+        result.frombytes(out.tobytes())
+        return result
+
+    def location(self, loc: int) -> Optional[Location]:
+        """
+        Read location record
+
+        Parameters
+        ----------
+        loc : int
+            location id
+
+        Returns
+        -------
+        Location
+            location or None for id -1
+        """
+        if loc < 0:
+            return None
+        offset = self._locations + loc * self.LOCATION.size  # type: int
+        (lat, lon, label, length) = self.LOCATION.unpack_from(self._mm, offset)
+        start = self._labels + label  # type: int
+        return Location(lat, lon, str(self._view[start:start + length],
+                                      'utf-8'))
+
+    def _locate4(self, ip: int) -> int:
+        i = bisect_right(self._starts4, ip) - 1  # type: int
+        if i >= 0 and ip <= self._ends4[i]:
+            return self._locs4[i]
+        return -1
+
+    def _u32(self, offset: int, count: int) -> Tuple[Sequence[int], int]:
+        end = offset + count * 4  # type: int
+        column = self._view[offset:end].cast('I')  # type: Any
+        if sys.byteorder != 'little':
+            column = array('I', column)
+            column.byteswap()
+        return column, end
+
+    @classmethod
+    def build(cls, source: str, path: str) -> int:
+        """
+        Compile CSV with address ranges into database file
+
+        Every CSV row holds: first address, last address, latitude,
+        longitude and label (e.g. country or city), ranges must not overlap.
+
+        Parameters
+        ----------
+        source : str
+            path of CSV file
+        path : str
+            path of database file to create
+
+        Returns
+        -------
+        int
+            number of ranges written
+        """
+        ranges4 = list()  # type: List[Tuple[int, int, int]]
+        ranges6 = list()  # type: List[Tuple[bytes, bytes, int]]
+        locations = dict()  # type: Dict[Tuple[float, float, str], int]
+        with open(source, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                if not row or row[0].startswith('#'):
+                    continue
+                (first, last, lat, lon, label) = row[:5]
+                loc = locations.setdefault((float(lat), float(lon), label),
+                                           len(locations))
+                (start, end) = (_pack(first), _pack(last))
+                if start > end:
+                    raise ValueError('range {0}-{1} is reversed'.format(
+                                                                first, last))
+                if start[:12] == end[:12] == _IPV4_PREFIX:
+                    ranges4.append((int.from_bytes(start[12:], 'big'),
+                                    int.from_bytes(end[12:], 'big'), loc))
+                else:
+                    ranges6.append((start, end, loc))
+        ranges4.sort()
+        ranges6.sort()
+        for ranges in (ranges4, ranges6):
+            for (a, b) in zip(ranges, ranges[1:]):
+                if b[0] <= a[1]:
+                    raise ValueError('ranges starting at {0!r} and {1!r} '
+                                     'overlap'.format(a[0], b[0]))
+
+        labels = bytearray()  # type: bytearray
+        records = bytearray()  # type: bytearray
+        for (lat, lon, label) in locations:
+            encoded = label.encode('utf-8')  # type: bytes
+            records += cls.LOCATION.pack(lat, lon, len(labels), len(encoded))
+            labels += encoded
+
+        tmp = path + '.tmp'  # type: str
+        with open(tmp, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, len(ranges4), len(ranges6),
+                                    len(locations)))
+            for column in range(3):
+                f.write(struct.pack('<{0}I'.format(len(ranges4)),
+                                    *(r[column] for r in ranges4)))
+            for column in range(2):
+                f.write(b''.join(r[column] for r in ranges6))
+            f.write(struct.pack('<{0}I'.format(len(ranges6)),
+                                *(r[2] for r in ranges6)))
+            f.write(records)
+            f.write(labels)
+        os.replace(tmp, path)
+        return len(ranges4) + len(ranges6)
+
+
+class _Keys(object):
+    """
+    Sequence of 16-byte keys stored in mapped memory, for 'bisect'
+    """
+
+    __slots__ = ('_mm', '_offset', '_count')
+
+    def __init__(self, mm: mmap.mmap, offset: int, count: int) -> None:
+        self._mm = mm  # type: mmap.mmap
+        self._offset = offset  # type: int
+        self._count = count  # type: int
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> bytes:
+        start = self._offset + i * 16  # type: int
+        return self._mm[start:start + 16]
+
+
+def _pack(ip: str) -> bytes:
+    """
+    Pack address to 16-byte IPv6 or IPv4-mapped form
+    """
+    if ':' in ip:
+        return inet_pton(AF_INET6, ip)
+    return _IPV4_PREFIX + inet_aton(ip)
@@ -0,0 +1,6 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .GeoDatabase import GeoDatabase, Location
+
+__all__ = ['GeoDatabase', 'Location']
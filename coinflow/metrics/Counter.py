@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+from typing import Any, Dict, Hashable, Iterator, List, Tuple
+
+
+class Counter(object):
+    """
+    Family of monotonic counters distinguished by value of single label
+
+    Label values are stored as given (e.g. raw command bytes or peer address
+    tuples) and turned into text only while rendering, so counting costs one
+    dict update.
+    """
+
+    TYPE = 'counter'  # type: str
+    """Prometheus metric type"""
+
+    def __init__(self, name: str, help: str, label: str) -> None:
+        """
+        Constructor for 'Counter' class.
+
+        Parameters
+        ----------
+        name : str
+            metric name, e.g. 'coinflow_messages_received_total'
+        help : str
+            description of metric
+        label : str
+            name of label distinguishing series, e.g. 'command'
+        """
+        self.name = name  # type: str
+        self.help = help  # type: str
+        self.label = label  # type: str
+        self.values = defaultdict(int)  # type: Dict[Hashable, float]
+
+    def inc(self, key: Hashable, amount: float = 1) -> None:
+        """
+        Increase counter of given label value
+
+        Parameters
+        ----------
+        key : hashable
+            label value
+        amount : float
+            non-negative increment
+        """
+        self.values[key] += amount
+
+    def discard(self, key: Hashable) -> None:
+        """
+        Drop series of given label value, e.g. of disconnected peer
+        """
+        self.values.pop(key, None)
+
+    def samples(self) -> Iterator[Tuple[str, Hashable, Dict[str, str], Any]]:
+        """
+        Samples to render: name suffix, label value, extra labels and value
+        """
+        for (key, value) in list(self.values.items()):
+            yield ('', key, {}, value)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left
+from typing import Any, Dict, Hashable, Iterator, List, Sequence, Tuple
+
+
+class Histogram(object):
+    """
+    Family of histograms with fixed buckets distinguished by single label
+
+    Every series keeps plain list of per-bucket counts followed by count of
+    observations above the last bound and their sum, so observation costs
+    one bisect and two additions. Counts are accumulated only while
+    rendering.
+    """
+
+    TYPE = 'histogram'  # type: str
+    """Prometheus metric type"""
+    BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+               1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 0.1, 1.0)
+    """Default upper bounds of buckets, in seconds"""
+
+    def __init__(self, name: str, help: str, label: str,
+                 buckets: Sequence[float] = BUCKETS) -> None:
+        """
+        Constructor for 'Histogram' class.
+
+        Parameters
+        ----------
+        name : str
+            metric name, e.g. 'coinflow_decode_seconds'
+        help : str
+            description of metric
+        label : str
+            name of label distinguishing series, e.g. 'command'
+        buckets : sequence
+            sorted upper bounds of buckets
+        """
+        self.name = name  # type: str
+        self.help = help  # type: str
+        self.label = label  # type: str
+        self.buckets = tuple(buckets)  # type: Tuple[float, ...]
+        self.series = dict()  # type: Dict[Hashable, List[float]]
+
+    def observe(self, key: Hashable, value: float) -> None:
+        """
+        Record single observation
+
+        Parameters
+        ----------
+        key : hashable
+            label value
+        value : float
+            observed value, e.g. duration in seconds
+        """
+        series = self.series.get(key)  # type: List[float]
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def discard(self, key: Hashable) -> None:
+        """
+        Drop series of given label value
+        """
+        self.series.pop(key, None)
+
+    def samples(self) -> Iterator[Tuple[str, Hashable, Dict[str, str], Any]]:
+        """
+        Samples to render: name suffix, label value, extra labels and value
+        """
+        bounds = [repr(float(b)) for b in self.buckets] + ['+Inf']
+        for (key, series) in list(self.series.items()):
+            total = 0  # type: int
+            for (le, count) in zip(bounds, series):
+                total += count
+                yield ('_bucket', key, {'le': le}, total)
+            yield ('_sum', key, {}, series[-1])
+            yield ('_count', key, {}, total)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+
+from typing import Any, Hashable, List, Sequence, Union
+
+from .Counter import Counter
+from .Histogram import Histogram
+from coinflow.protocol.messages import Message
+
+logger = logging.getLogger(__name__)
+
+Family = Union[Counter, Histogram]
+
+
+class Metrics(object):
+    """
+    Per-command and per-peer traffic counters and latency histograms
+
+    Hooks are called by 'Message' (decoding and encoding time, enabled with
+    'Message.set_metrics'), 'Peer' and 'SendQueue' (received, sent and
+    dropped messages) and 'Node' (dispatching time), all of them only when
+    metrics object is given, so disabled instrumentation costs single
+    'is None' check. Metrics are rendered in Prometheus text format and may
+    be served over HTTP with 'serve'.
+
+    Commands come from peers, before handshake too, so commands of messages
+    not in 'Message.REGISTRY' are counted together as 'UNKNOWN'; otherwise
+    any peer could create series without bound. Series of peers are dropped
+    with 'forget'.
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'  # type: str
+    """Content type of Prometheus text format"""
+    UNKNOWN = 'unknown'  # type: str
+    """Command label of all messages not in 'Message.REGISTRY'"""
+
+    def __init__(self, buckets: Sequence[float] = Histogram.BUCKETS) -> None:
+        """
+        Constructor for 'Metrics' class.
+
+        Parameters
+        ----------
+        buckets : sequence
+            upper bounds of latency histogram buckets, in seconds
+        """
+        self.messages_received = Counter(
+                'coinflow_messages_received_total',
+                'Messages received from peers', 'command')  # type: Counter
+        self.bytes_received = Counter(
+                'coinflow_received_bytes_total',
+                'Bytes of messages received from peers, with headers',
+                'command')  # type: Counter
+        self.messages_sent = Counter(
+                'coinflow_messages_sent_total', 'Messages sent to peers',
+                'command')  # type: Counter
+        self.bytes_sent = Counter(
+                'coinflow_sent_bytes_total',
+                'Bytes of messages sent to peers, with headers',
+                'command')  # type: Counter
+        self.messages_dropped = Counter(
+                'coinflow_messages_dropped_total',
+                'Gossip messages dropped for slow peers',
+                'command')  # type: Counter
+        self.peer_messages_received = Counter(
+                'coinflow_peer_messages_received_total',
+                'Messages received from peer', 'peer')  # type: Counter
+        self.peer_bytes_received = Counter(
+                'coinflow_peer_received_bytes_total',
+                'Bytes of messages received from peer',
+                'peer')  # type: Counter
+        self.peer_bytes_sent = Counter(
+                'coinflow_peer_sent_bytes_total',
+                'Bytes of messages sent to peer', 'peer')  # type: Counter
+        self.peer_messages_dropped = Counter(
+                'coinflow_peer_messages_dropped_total',
+                'Gossip messages dropped for slow peer',
+                'peer')  # type: Counter
+        self.decode_seconds = Histogram(
+                'coinflow_decode_seconds', 'Time of payload decoding',
+                'command', buckets)  # type: Histogram
+        self.encode_seconds = Histogram(
+                'coinflow_encode_seconds', 'Time of payload encoding',
+                'command', buckets)  # type: Histogram
+        self.dispatch_seconds = Histogram(
+                'coinflow_dispatch_seconds',
+                'Time spent in handlers of message', 'command',
+                buckets)  # type: Histogram
+        self.families = [self.messages_received, self.bytes_received,
+                         self.messages_sent, self.bytes_sent,
+                         self.messages_dropped,
+                         self.peer_messages_received,
+                         self.peer_bytes_received, self.peer_bytes_sent,
+                         self.peer_messages_dropped,
+                         self.decode_seconds, self.encode_seconds,
+                         self.dispatch_seconds]  # type: List[Family]
+
+    def received(self, peer: Hashable, command: Hashable,
+                 size: int) -> None:
+        """
+        Count message received from peer
+
+        Parameters
+        ----------
+        peer : hashable
+            peer address
+        command : str or bytes
+            command, raw one from header is accepted; unregistered ones are
+            counted as 'UNKNOWN'
+        size : int
+            size of message with header
+        """
+        command = _command(command)
+        self.messages_received.values[command] += 1
+        self.bytes_received.values[command] += size
+        self.peer_messages_received.values[peer] += 1
+        self.peer_bytes_received.values[peer] += size
+
+    def sent(self, peer: Hashable, command: Hashable, size: int) -> None:
+        """
+        Count message sent to peer, see 'received'
+        """
+        command = _command(command)
+        self.messages_sent.values[command] += 1
+        self.bytes_sent.values[command] += size
+        self.peer_bytes_sent.values[peer] += size
+
+    def dropped(self, peer: Hashable, command: Hashable) -> None:
+        """
+        Count gossip message dropped instead of sending it to slow peer
+
+        Parameters
+        ----------
+        peer : hashable
+            peer address
+        command : str or bytes
+            command of message
+        """
+        command = _command(command)
+        self.messages_dropped.values[command] += 1
+        self.peer_messages_dropped.values[peer] += 1
+
+    def decoded(self, command: Hashable, size: int, seconds: float) -> None:
+        """
+        Record time of payload decoding
+
+        Parameters
+        ----------
+        command : str or bytes
+            command of message
+        size : int
+            size of payload
+        seconds : float
+            decoding time
+        """
+        self.decode_seconds.observe(_command(command), seconds)
+
+    def encoded(self, command: Hashable, size: int, seconds: float) -> None:
+        """
+        Record time of payload encoding, see 'decoded'
+        """
+        self.encode_seconds.observe(_command(command), seconds)
+
+    def dispatched(self, command: Hashable, seconds: float) -> None:
+        """
+        Record time spent in handlers of single message
+
+        Parameters
+        ----------
+        command : str or bytes
+            command of message
+        seconds : float
+            time spent in handlers
+        """
+        self.dispatch_seconds.observe(_command(command), seconds)
+
+    def forget(self, peer: Hashable) -> None:
+        """
+        Drop series of disconnected peer
+
+        Parameters
+        ----------
+        peer : hashable
+            peer address
+        """
+        for family in self.families:
+            if family.label == 'peer':
+                family.discard(peer)
+
+    def render(self) -> str:
+        """
+        Render all metrics in Prometheus text format
+
+        Returns
+        -------
+        str
+            text exposition
+        """
+        lines = list()  # type: List[str]
+        for family in self.families:
+            lines.append('# HELP {0} {1}'.format(family.name, family.help))
+            lines.append('# TYPE {0} {1}'.format(family.name, family.TYPE))
+            for (suffix, key, extra, value) in family.samples():
+                labels = ['{0}="{1}"'.format(family.label, _label(key))]
+                labels.extend('{0}="{1}"'.format(*item)
+                              for item in sorted(extra.items()))
+                lines.append('{0}{1}{{{2}}} {3}'.format(
+                        family.name, suffix, ','.join(labels), _value(value)))
+        lines.append('')
+        return '\n'.join(lines)
+
+    async def serve(self, host: str = '127.0.0.1',
+                    port: int = 9108) -> asyncio.AbstractServer:
+        """
+        Serve metrics over HTTP at '/metrics'
+
+        Parameters
+        ----------
+        host : str
+            address to bind, local one by default
+        port : int
+            port to bind, 0 picks free one
+
+        Returns
+        -------
+        asyncio.AbstractServer
+            listening server
+        """
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await reader.readline()  # type: bytes
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request.split() + [b'', b'']  # type: List[bytes]
+            if parts[0] in (b'GET', b'HEAD') and \
+                    parts[1].split(b'?')[0] in (b'/', b'/metrics'):
+                (status, body) = ('200 OK', self.render().encode('utf-8'))
+            else:
+                (status, body) = ('404 Not Found', b'not found\n')
+            writer.write(_response(status, self.CONTENT_TYPE, len(body)))
+            if parts[0] != b'HEAD':
+                writer.write(body)
+            await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            # ValueError is raised by 'readline' for too long lines
+            logger.debug('metrics request failed: %s', e)
+        finally:
+            writer.close()
+
+
+def _response(status: str, content_type: str, length: int) -> bytes:
+    return ('HTTP/1.0 {0}\r\nContent-Type: {1}\r\nContent-Length: {2}\r\n'
+            'Connection: close\r\n\r\n').format(status, content_type,
+                                                length).encode('ascii')
+
+
+def _command(command: Hashable) -> Hashable:
+    """
+    Fold commands of messages not in 'Message.REGISTRY' into 'UNKNOWN'
+    """
+    if isinstance(command, str):
+        raw = command.encode('ascii', 'replace')[:13].ljust(
+                                                12, b'\x00')  # type: bytes
+    else:
+        raw = command
+    return command if raw in Message.REGISTRY else Metrics.UNKNOWN
+
+
+def _label(key: Any) -> str:
+    """
+    Render label value: raw commands are stripped of padding, addresses
+    are written as 'host:port'
+    """
+    if isinstance(key, bytes):
+        key = key.rstrip(b'\x00').decode('ascii', 'replace')
+    elif isinstance(key, tuple):
+        key = '{0}:{1}'.format(*key)
+    return str(key).replace('\\', '\\\\').replace('"', '\\"')\
+                   .replace('\n', '\\n')
+
+
+def _value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .Counter import Counter
+from .Histogram import Histogram
+from .Metrics import Metrics
+
+__all__ = ['Counter', 'Histogram', 'Metrics']
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import heapq
+import time
+
+from bisect import bisect_left, insort
+from socket import inet_aton
+from typing import Dict, List, Optional, Set
+
+from coinflow.protocol.messages.Addr import AddrBatch, AddrList
+from coinflow.tables import NetaddrTable, HashIndex
+import coinflow.protocol.structs as structs
+
+_IPV4_PREFIX = b'\x00' * 10 + b'\xff\xff'  # type: bytes
+
+
+class AddrManager(object):
+    """
+    Bounded set of known addresses with recency index
+
+    Addresses are stored in 'NetaddrTable'. Rows are additionally grouped in
+    buckets covering fixed span of last-seen time, kept in time order, so
+    freshest addresses are read from newest buckets and stale ones are
+    dropped from oldest buckets, without sorting whole table.
+    """
+
+    CAPACITY = 1 << 20  # type: int
+    """Default maximum number of addresses"""
+    GRANULARITY = 600  # type: int
+    """Default span of bucket, in seconds"""
+    HORIZON = 30 * 24 * 3600  # type: int
+    """Default age after which address is considered stale, in seconds"""
+
+    def __init__(self, capacity: int = CAPACITY,
+                 granularity: int = GRANULARITY,
+                 horizon: int = HORIZON) -> None:
+        """
+        Constructor for 'AddrManager' class.
+
+        Parameters
+        ----------
+        capacity : int
+            maximum number of addresses, oldest ones are evicted above it
+        granularity : int
+            span of last-seen time covered by single bucket, in seconds
+        horizon : int
+            age after which address is dropped by 'expire', in seconds
+        """
+        self.capacity = capacity  # type: int
+        self.granularity = granularity  # type: int
+        self.horizon = horizon  # type: int
+        self.table = NetaddrTable()  # type: NetaddrTable
+        self._buckets = dict()  # type: Dict[int, Set[int]]
+        self._order = list()  # type: List[int]
+        """Sorted ids of non-empty buckets"""
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __contains__(self, addr: structs.Netaddr) -> bool:
+        return addr in self.table
+
+    def add(self, addr: structs.Netaddr, timestamp: int) -> bool:
+        """
+        Add address or refresh already known one
+
+        Parameters
+        ----------
+        addr : coinflow.protocol.structs.Netaddr
+            address to add
+        timestamp : int
+            last-seen unix timestamp
+
+        Returns
+        -------
+        bool
+            True if address was not known before
+        """
+        return self.add_raw(_IPV4_PREFIX + inet_aton(addr.ip), addr.port,
+                            addr.services, timestamp)
+
+    def add_raw(self, ip: bytes, port: int, services: int,
+                timestamp: int) -> bool:
+        """
+        Add address given as packed fields, see 'add'
+
+        Parameters
+        ----------
+        ip : bytes
+            16-byte IPv6 or IPv4-mapped address
+        port : int
+            port
+        services : int
+            services bitfield
+        timestamp : int
+            last-seen unix timestamp
+
+        Returns
+        -------
+        bool
+            True if address was not known before
+        """
+        table = self.table  # type: NetaddrTable
+        row = table.find_raw(ip, port)  # type: int
+        if row == HashIndex.EMPTY:
+            row = table.add_raw(ip, port, services, timestamp)
+            self._bucket_add(row, timestamp)
+            if len(table) > self.capacity:
+                self._evict()
+            return True
+        old = table.timestamps[row]  # type: int
+        table.add_raw(ip, port, services, timestamp)
+        if timestamp // self.granularity != old // self.granularity and \
+                timestamp > old:
+            self._bucket_discard(row, old)
+            self._bucket_add(row, timestamp)
+        return False
+
+    def extend(self, batch: AddrBatch) -> int:
+        """
+        Add all addresses from decoded 'addr' payload
+
+        Parameters
+        ----------
+        batch : coinflow.protocol.messages.Addr.AddrBatch
+            columnar 'addr' payload
+
+        Returns
+        -------
+        int
+            number of addresses which were not known before
+        """
+        added = 0  # type: int
+        ips = batch.ips  # type: bytes
+        for (i, (port, services, timestamp)) in enumerate(
+                zip(batch.ports, batch.services, batch.timestamps)):
+            added += self.add_raw(ips[i * 16:i * 16 + 16], port, services,
+                                  timestamp)
+        return added
+
+    def remove(self, addr: structs.Netaddr) -> bool:
+        """
+        Forget address
+
+        Parameters
+        ----------
+        addr : coinflow.protocol.structs.Netaddr
+            address to remove
+
+        Returns
+        -------
+        bool
+            True if address was known
+        """
+        row = self.table.find(addr)  # type: int
+        if row == HashIndex.EMPTY:
+            return False
+        self._remove(row)
+        return True
+
+    def freshest(self, k: int) -> AddrList:
+        """
+        Select k most recently seen addresses
+
+        Only newest buckets are visited, so cost depends on k and not on
+        number of known addresses.
+
+        Parameters
+        ----------
+        k : int
+            number of addresses to select
+
+        Returns
+        -------
+        list
+            'AddrEntry' objects, newest first
+        """
+        timestamps = self.table.timestamps
+        rows = list()  # type: List[int]
+        for b in reversed(self._order):
+            need = k - len(rows)  # type: int
+            if need <= 0:
+                break
+            bucket = self._buckets[b]  # type: Set[int]
+            if len(bucket) <= need:
+                rows.extend(sorted(bucket, key=timestamps.__getitem__,
+                                   reverse=True))
+            else:
+                rows.extend(heapq.nlargest(need, bucket,
+                                           key=timestamps.__getitem__))
+        return [self.table[row] for row in rows]
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """
+        Drop addresses not seen within horizon
+
+        Parameters
+        ----------
+        now : float
+            current unix timestamp, taken from clock if not given
+
+        Returns
+        -------
+        int
+            number of dropped addresses
+        """
+        now = time.time() if now is None else now
+        oldest = int(now - self.horizon) // self.granularity  # type: int
+        dropped = 0  # type: int
+        while self._order and self._order[0] < oldest:
+            bucket = self._buckets[self._order[0]]  # type: Set[int]
+            dropped += len(bucket)
+            # Rows are renumbered by removal, so always take max remaining
+            while bucket:
+                self._remove(max(bucket))
+        return dropped
+
+    def _evict(self) -> None:
+        bucket = self._buckets[self._order[0]]  # type: Set[int]
+        self._remove(min(bucket, key=self.table.timestamps.__getitem__))
+
+    def _remove(self, row: int) -> None:
+        table = self.table  # type: NetaddrTable
+        last = len(table) - 1  # type: int
+        self._bucket_discard(row, table.timestamps[row])
+        if row != last:
+            self._bucket_discard(last, table.timestamps[last])
+            self._bucket_add(row, table.timestamps[last])
+        table.remove(row)
+
+    def _bucket_add(self, row: int, timestamp: int) -> None:
+        b = timestamp // self.granularity  # type: int
+        bucket = self._buckets.get(b)  # type: Optional[Set[int]]
+        if bucket is None:
+            bucket = self._buckets[b] = set()
+            insort(self._order, b)
+        bucket.add(row)
+
+    def _bucket_discard(self, row: int, timestamp: int) -> None:
+        b = timestamp // self.granularity  # type: int
+        bucket = self._buckets[b]  # type: Set[int]
+        bucket.discard(row)
+        if not bucket:
+            del self._buckets[b]
+            del self._order[bisect_left(self._order, b)]
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import pickle
+import socket
+import struct
+
+from array import array
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Received = Callable[[Any, Optional[int]], Any]
+Chunk = Tuple[memoryview, Optional[int]]
+"""Data left to write and descriptor sent with its first byte"""
+
+
+class Channel(object):
+    """
+    Non-blocking channel of picklable objects over Unix socket pair, e.g.
+    between 'Cluster' and its workers
+
+    Every object is pickled and prefixed with its length and flag telling
+    whether file descriptor (e.g. of accepted socket) goes with it. Both
+    directions are driven by event loop: 'send' only queues data and writes
+    as much as socket takes, rest is written once socket is writable again.
+    So two processes sending to each other at once never block each other
+    in 'send' while neither reads, as blocking pipes do once both buffers
+    are full. Descriptors are duplicated when queued, so caller may close
+    its own right after 'send'.
+    """
+
+    HEADER = struct.Struct('<L?')  # type: struct.Struct
+    """Precompiled length of pickled object and descriptor flag"""
+    READ_SIZE = 256 * 1024  # type: int
+    """Maximum number of bytes read from socket at once"""
+    MAX_FDS = 64  # type: int
+    """Maximum number of descriptors received with single read"""
+
+    def __init__(self, sock: socket.socket, received: Received,
+                 lost: Callable[[], Any], loop: Any) -> None:
+        """
+        Constructor for 'Channel' class.
+
+        Parameters
+        ----------
+        sock : socket.socket
+            one end of Unix stream socket pair, made non-blocking
+        received : callable
+            function called with every received object and descriptor sent
+            with it, or None
+        lost : callable
+            function called once other end closed channel or it failed
+        loop : asyncio.AbstractEventLoop
+            event loop driving the channel
+        """
+        sock.setblocking(False)
+        self.sock = sock  # type: socket.socket
+        self.received = received  # type: Received
+        self.lost = lost  # type: Callable[[], Any]
+        self.loop = loop  # type: Any
+        self.closed = False  # type: bool
+        self.pending = 0  # type: int
+        """Bytes queued and not written yet"""
+        self._out = deque()  # type: Deque[Chunk]
+        self._writing = False  # type: bool
+        self._buf = bytearray()  # type: bytearray
+        self._fds = deque()  # type: Deque[int]
+        loop.add_reader(sock.fileno(), self._read)
+
+    def send(self, obj: Any, fd: Optional[int] = None) -> None:
+        """
+        Queue object for sending, optionally with file descriptor
+
+        Parameters
+        ----------
+        obj : object
+            picklable object
+        fd : int
+            descriptor to pass to other process along with object
+        """
+        if self.closed:
+            raise ConnectionError('channel is closed')
+        data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)  # type: bytes
+        self._out.append((memoryview(self.HEADER.pack(len(data),
+                                                      fd is not None)),
+                          None if fd is None else os.dup(fd)))
+        self._out.append((memoryview(data), None))
+        self.pending += self.HEADER.size + len(data)
+        if not self._writing:
+            self._write()
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        Write all queued data, blocking up to 'timeout' seconds
+
+        Only for shutdown, when event loop does not run any more.
+
+        Parameters
+        ----------
+        timeout : float
+            maximum time to wait for socket to take data, in seconds
+        """
+        if self.closed or not self._out:
+            return
+        self.sock.settimeout(timeout)
+        try:
+            self._write(True)
+        except OSError:
+            pass
+        finally:
+            self.sock.setblocking(False)
+
+    def close(self) -> None:
+        """
+        Close channel, data not written yet is forgotten
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.remove_reader(self.sock.fileno())
+        if self._writing:
+            self.loop.remove_writer(self.sock.fileno())
+            self._writing = False
+        for (_, fd) in self._out:
+            if fd is not None:
+                os.close(fd)
+        for fd in self._fds:
+            os.close(fd)
+        self._out.clear()
+        self._fds.clear()
+        self.pending = 0
+        self.sock.close()
+
+    def _write(self, blocking: bool = False) -> None:
+        out = self._out  # type: Deque[Chunk]
+        while out:
+            (data, fd) = out[0]
+            try:
+                if fd is None:
+                    sent = self.sock.send(data)  # type: int
+                else:
+                    sent = self.sock.sendmsg([data], [(
+                                socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                                array('i', (fd,)))])
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                if blocking:
+                    raise
+                logger.warning('channel write failed: %s', e)
+                self._lost()
+                return
+            if fd is not None:
+                os.close(fd)
+            self.pending -= sent
+            if sent < len(data):
+                out[0] = (data[sent:], None)
+                if not blocking:
+                    break
+            else:
+                out.popleft()
+        if blocking:
+            return
+        if out and not self._writing:
+            self._writing = True
+            self.loop.add_writer(self.sock.fileno(), self._write)
+        elif not out and self._writing:
+            self._writing = False
+            self.loop.remove_writer(self.sock.fileno())
+
+    def _read(self) -> None:
+        try:
+            (data, ancdata, _, _) = self.sock.recvmsg(
+                    self.READ_SIZE,
+                    socket.CMSG_SPACE(self.MAX_FDS * 4))
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            logger.warning('channel read failed: %s', e)
+            self._lost()
+            return
+        for (level, kind, fds) in ancdata:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                self._fds.extend(array('i', fds[:len(fds) - len(fds) % 4]))
+        if not data:
+            self._lost()
+            return
+        buf = self._buf  # type: bytearray
+        buf += data
+        h_len = self.HEADER.size  # type: int
+        offset = 0  # type: int
+        objects = list()  # type: List[Tuple[Any, Optional[int]]]
+        while len(buf) - offset >= h_len:
+            (length, has_fd) = self.HEADER.unpack_from(buf, offset)
+            end = offset + h_len + length  # type: int
+            if len(buf) < end:
+                break
+            obj = pickle.loads(buf[offset + h_len:end])  # type: Any
+            objects.append((obj, self._fds.popleft() if has_fd else None))
+            offset = end
+        del buf[:offset]
+        for (obj, fd) in objects:
+            if self.closed:
+                if fd is not None:
+                    os.close(fd)
+                continue
+            self.received(obj, fd)
+
+    def _lost(self) -> None:
+        if not self.closed:
+            self.close()
+            self.lost()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+
+from collections import defaultdict
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from .AddrManager import AddrManager
+from .Channel import Channel
+from .Shard import run_shard
+from coinflow.protocol.messages import Message
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[..., None]
+
+
+class Cluster(object):
+    """
+    Coordinator of node sharded across worker processes
+
+    Every worker runs its own 'Shard' with separate event loop and decoders,
+    so decoding traffic of many peers is spread over all cores. Coordinator
+    only assigns connections: outbound ones are handed to worker as address
+    to connect to, inbound ones are accepted here and passed to worker as
+    socket descriptor. Connections go to the least loaded worker.
+
+    Workers report events over channels: 'established', 'lost', 'failed'
+    and 'addr' with merged 'AddrBatch' of learnt addresses, which
+    coordinator adds to its 'AddrManager'. Handlers registered with 'on' are
+    called with worker number and event arguments. Channels never block
+    event loop on either side, so heavy broadcast from coordinator and
+    heavy events from worker at once cannot deadlock them.
+    """
+
+    def __init__(self, workers: Optional[int] = None,
+                 addrman: Optional[AddrManager] = None,
+                 flush_interval: float = 0.1,
+                 loop: Optional[asyncio.AbstractEventLoop] = None,
+                 **options: Any) -> None:
+        """
+        Constructor for 'Cluster' class.
+
+        Parameters
+        ----------
+        workers : int
+            number of worker processes, number of CPUs by default
+        addrman : coinflow.network.AddrManager
+            manager aggregating addresses learnt by all workers
+        flush_interval : float
+            seconds between batches of addresses sent by worker
+        loop : asyncio.AbstractEventLoop
+            event loop of coordinator to use instead of current one
+        **options
+            picklable 'Node' arguments used by every worker
+        """
+        self.workers = workers or os.cpu_count() or 1  # type: int
+        self.addrman = addrman or AddrManager()  # type: AddrManager
+        self.flush_interval = flush_interval  # type: float
+        self.loop = loop or asyncio.get_event_loop()  # type: Any
+        self.options = options  # type: Dict[str, Any]
+        self.load = [0] * self.workers  # type: List[int]
+        """Number of connections assigned to every worker and not lost"""
+        self.established = [0] * self.workers  # type: List[int]
+        """Number of established peers of every worker"""
+        self.handlers = defaultdict(
+                            list)  # type: Dict[str, List[EventHandler]]
+        self._processes = list()  # type: List[Any]
+        self._channels = list()  # type: List[Channel]
+        self._sockets = list()  # type: List[socket.socket]
+
+    def __len__(self) -> int:
+        """
+        Number of established peers in all workers
+        """
+        return sum(self.established)
+
+    def on(self, event: str, handler: EventHandler) -> EventHandler:
+        """
+        Register handler called for every event of given name
+
+        Parameters
+        ----------
+        event : str
+            'established', 'lost', 'failed' or 'addr'
+        handler : callable
+            function called with worker number and event arguments
+
+        Returns
+        -------
+        callable
+            registered handler
+        """
+        self.handlers[event].append(handler)
+        return handler
+
+    def start(self) -> None:
+        """
+        Spawn worker processes
+        """
+        ctx = multiprocessing.get_context('spawn')
+        for index in range(self.workers):
+            (sock, child) = socket.socketpair()
+            process = ctx.Process(target=run_shard,
+                                  args=(child, index, self.flush_interval,
+                                        self.options),
+                                  name='coinflow-shard-{0}'.format(index),
+                                  daemon=True)
+            process.start()
+            child.close()
+            self._processes.append(process)
+            self._channels.append(Channel(sock, partial(self._event, index),
+                                          partial(self._exited, index),
+                                          self.loop))
+
+    def assign(self) -> int:
+        """
+        Pick worker for new connection
+
+        Returns
+        -------
+        int
+            number of the least loaded live worker
+        """
+        live = [i for i in range(self.workers)
+                if not self._channels[i].closed]  # type: List[int]
+        if not live:
+            raise ConnectionError('no live workers in cluster')
+        return min(live, key=self.load.__getitem__)
+
+    def connect(self, host: str, port: int) -> int:
+        """
+        Order connection to remote node
+
+        Parameters
+        ----------
+        host : str
+            address of remote node
+        port : int
+            port of remote node
+
+        Returns
+        -------
+        int
+            number of worker which got connection
+        """
+        index = self.assign()  # type: int
+        self._channels[index].send(('connect', host, port))
+        self.load[index] += 1
+        return index
+
+    def serve(self, host: str, port: int) -> socket.socket:
+        """
+        Start accepting connections and spread them over workers
+
+        Parameters
+        ----------
+        host : str
+            address to listen on
+        port : int
+            port to listen on, 0 to pick free one
+
+        Returns
+        -------
+        socket.socket
+            listening socket
+        """
+        (family, _, _, _, address) = socket.getaddrinfo(
+                                host, port, type=socket.SOCK_STREAM)[0]
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(address)
+        sock.listen(socket.SOMAXCONN)
+        sock.setblocking(False)
+        self.loop.add_reader(sock.fileno(), self._accept, sock)
+        self._sockets.append(sock)
+        return sock
+
+    def broadcast(self, msg: Message) -> None:
+        """
+        Send message to established peers of all workers
+
+        Parameters
+        ----------
+        msg : coinflow.protocol.messages.Message
+            message to send, encoded once here
+        """
+        raw = bytes(msg)  # type: bytes
+        for channel in self._channels:
+            if not channel.closed:
+                channel.send(('broadcast', raw))
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Stop accepting connections and shut all workers down
+
+        Parameters
+        ----------
+        timeout : float
+            seconds given to every worker to exit before it is terminated
+        """
+        for sock in self._sockets:
+            self.loop.remove_reader(sock.fileno())
+            sock.close()
+        self._sockets.clear()
+        for channel in self._channels:
+            if not channel.closed:
+                channel.send(('close',))
+                channel.flush(timeout)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for channel in self._channels:
+            channel.close()
+
+    def _accept(self, sock: socket.socket) -> None:
+        try:
+            (client, _) = sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        with client:
+            try:
+                index = self.assign()  # type: int
+            except ConnectionError:
+                return
+            self._channels[index].send(('accept',), client.fileno())
+            self.load[index] += 1
+
+    def _exited(self, index: int) -> None:
+        logger.warning('worker %d exited', index)
+        self.load[index] = self.established[index] = 0
+
+    def _event(self, index: int, event: Any, fd: Optional[int]) -> None:
+        (name, args) = (event[0], event[1:])
+        if name == 'addr':
+            self.addrman.extend(args[0])
+        elif name == 'established':
+            self.established[index] += 1
+        elif name == 'lost':
+            self.load[index] -= 1
+            if args[1]:
+                self.established[index] -= 1
+        elif name == 'failed':
+            self.load[index] -= 1
+        for handler in self.handlers.get(name, ()):
+            try:
+                handler(index, *args)
+            except Exception:
+                logger.exception('handler of %r event failed', name)
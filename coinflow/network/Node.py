@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import random
+import struct
+import time
+
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Executor
+from datetime import datetime, timezone
+from typing import (Any, Callable, Dict, Iterable, List, Optional, Set,
+                    Tuple)
+
+from .Peer import Peer
+from .AddrManager import AddrManager
+from coinflow.protocol.Verifier import Verifier
+from coinflow.protocol.magic import bitcoin
+from coinflow.protocol.messages import Message, Version, Addr, Inv
+from coinflow.protocol.messages.Addr import AddrBatch, AddrList
+from coinflow.protocol.messages.Inv import InvBatch
+from coinflow.tables import FirstSeen
+import coinflow.protocol.structs as structs
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Peer, Message], None]
+
+
+class Node(object):
+    """
+    asyncio connection manager keeping track of all peers
+
+    All peers share one event loop and one periodic sweep, which closes
+    connections stuck in handshake or idle for too long. No per-peer timers
+    nor tasks are created, so single process can keep thousands of peers.
+    """
+
+    _metered = list()  # type: List[Node]
+    """Open nodes with metrics, the last one times message decoding"""
+
+    def __init__(self, magic: int = bitcoin['mainnet'], services: int = 0,
+                 user_agent: Optional[str] = None, start_height: int = 0,
+                 relay: bool = True, handshake_timeout: float = 10.0,
+                 idle_timeout: float = 900.0, sweep_interval: float = 1.0,
+                 write_limits: Tuple[int, int] = (64 * 1024, 16 * 1024),
+                 max_pending: int = 4 * 1024 * 1024,
+                 addrman: Optional[AddrManager] = None,
+                 recorder: Optional[Any] = None,
+                 metrics: Optional[Any] = None,
+                 first_seen: Optional[FirstSeen] = None,
+                 checksum_pool: Optional[Executor] = None,
+                 checksum_threshold: int = Verifier.THRESHOLD,
+                 max_peer_ids: int = 1 << 16,
+                 loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        Constructor for 'Node' class.
+
+        Parameters
+        ----------
+        magic : int
+            Magic value used in network
+        services : int
+            bitfield describing services announced to peers
+        user_agent : str
+            user agent to use instead of default one
+        start_height : int
+            number of last block announced to peers
+        relay : bool
+            whether peers should announce relayed txs
+        handshake_timeout : float
+            seconds given to peer for completing handshake
+        idle_timeout : float
+            seconds of silence after which peer is disconnected
+        sweep_interval : float
+            seconds between timeout checks
+        write_limits : tuple
+            high and low water marks of transport buffer, in bytes; messages
+            are held in peer queue between them
+        max_pending : int
+            bytes of messages held for single peer, slower peer is closed
+        addrman : coinflow.network.AddrManager
+            address manager learning from 'addr' and answering 'getaddr'
+        recorder : coinflow.capture.Recorder
+            recorder of every frame received from peers
+        metrics : coinflow.metrics.Metrics
+            metrics of traffic and dispatching, also set as metrics of
+            message decoding and encoding with 'Message.set_metrics'; those
+            are process-wide, so they go to the latest open node with
+            metrics and are handed back to previous one on 'close'
+        first_seen : coinflow.tables.FirstSeen
+            index of first announcements of transactions from 'inv'
+            messages, peers are identified in it by 'peer_id'
+        checksum_pool : concurrent.futures.Executor
+            thread pool verifying checksums of large payloads, see
+            'coinflow.protocol.Verifier'; all checksums are verified inline
+            while framing if not given
+        checksum_threshold : int
+            size of payload from which its checksum is verified on pool
+        max_peer_ids : int
+            number of peer ids handed out at most, see 'peer_id'
+        loop : asyncio.AbstractEventLoop
+            event loop to use instead of current one
+        """
+        self.magic = magic  # type: int
+        self.services = services  # type: int
+        # Encoded once, then reused by every 'version' message
+        self.user_agent = structs.Varstr(
+                user_agent) if user_agent else None  # type: Optional[str]
+        self.start_height = start_height  # type: int
+        self.relay = relay  # type: bool
+        self.handshake_timeout = handshake_timeout  # type: float
+        self.idle_timeout = idle_timeout  # type: float
+        self.sweep_interval = sweep_interval  # type: float
+        self.write_limits = write_limits  # type: Tuple[int, int]
+        self.max_pending = max_pending  # type: int
+        self.loop = loop or asyncio.get_event_loop()  # type: Any
+        self.nonce = random.getrandbits(64)  # type: int
+        """Nonce sent in 'version' messages, used to detect self-connection"""
+        self.peers = set()  # type: Set[Peer]
+        self.handlers = defaultdict(list)  # type: Dict[bytes, List[Handler]]
+        self._servers = list()  # type: List[asyncio.AbstractServer]
+        self._sweeper = None  # type: Optional[asyncio.Handle]
+        self.addrman = addrman  # type: Optional[AddrManager]
+        self.recorder = recorder  # type: Optional[Any]
+        self.metrics = metrics  # type: Optional[Any]
+        self.first_seen = first_seen  # type: Optional[FirstSeen]
+        self.checksum_pool = checksum_pool  # type: Optional[Executor]
+        self.checksum_threshold = checksum_threshold  # type: int
+        self.max_peer_ids = max_peer_ids  # type: int
+        self.addresses = list()  # type: List[Tuple[str, int]]
+        """Addresses of peers by id, see 'peer_id'"""
+        self._ids = OrderedDict()  # type: Dict[Tuple[str, int], int]
+        self.on('inv', self._on_inv)
+        if metrics is not None:
+            Node._metered.append(self)
+            Message.set_metrics(metrics)
+        if addrman is not None:
+            self.on('addr', self._on_addr)
+            self.on('getaddr', self._on_getaddr)
+
+    def on(self, command: str, handler: Handler) -> Handler:
+        """
+        Register handler called for every message with given command
+
+        Parameters
+        ----------
+        command : str
+            command of message, e.g. 'addr'
+        handler : callable
+            function called with peer and decoded message
+
+        Returns
+        -------
+        callable
+            registered handler
+        """
+        raw = struct.pack('12s', command.encode('ascii'))  # type: bytes
+        self.handlers[raw].append(handler)
+        return handler
+
+    def dispatch(self, peer: Peer, command: bytes, msg: Message) -> None:
+        """
+        Pass decoded message to all handlers registered for its command
+
+        Payload is decoded lazily by handlers, so malformed one surfaces
+        here; peer which sent it is closed, like on malformed 'version', and
+        later handlers are skipped.
+
+        Parameters
+        ----------
+        peer : coinflow.network.Peer
+            peer which sent message
+        command : bytes
+            raw, NUL-padded command from header
+        msg : coinflow.protocol.messages.Message
+            decoded message
+        """
+        metrics = self.metrics  # type: Optional[Any]
+        start = time.perf_counter() if metrics is not None else 0.0
+        for handler in self.handlers.get(command, ()):
+            try:
+                handler(peer, msg)
+            except (struct.error, ValueError, IndexError) as e:
+                logger.warning('%s sent malformed %s: %s', peer,
+                               msg.command, e)
+                peer.close()
+                break
+            except Exception:
+                logger.exception('handler for %r failed on %s', command, peer)
+        if metrics is not None:
+            metrics.dispatched(command, time.perf_counter() - start)
+
+    def broadcast(self, msg: Message,
+                  peers: Optional[Iterable[Peer]] = None) -> int:
+        """
+        Send message to many peers at once
+
+        Message is encoded only once and the same header and payload buffers
+        are queued for every peer.
+
+        Parameters
+        ----------
+        msg : coinflow.protocol.messages.Message
+            message to send
+        peers : iterable
+            peers to send message to, all established peers by default
+
+        Returns
+        -------
+        int
+            number of peers message was queued for
+        """
+        buffers = msg.buffers()  # type: Tuple[bytes, bytes]
+        sent = 0  # type: int
+        for peer in (self.peers if peers is None else peers):
+            if peer.established and peer.queue.push(msg.command, buffers):
+                sent += 1
+        return sent
+
+    def peer_id(self, peer: Peer) -> int:
+        """
+        Small integer identifying remote node of peer
+
+        Outbound peers are identified by address they listen on, inbound
+        ones by host alone, as their port is ephemeral and changes with
+        every connection; all inbound connections from single host share
+        id. Ids of 'max_peer_ids' nodes seen least recently are recycled, so
+        ids stay below it and 'addresses' does not grow without bound;
+        announcements logged with ids should be analysed before that.
+
+        Parameters
+        ----------
+        peer : coinflow.network.Peer
+            connected peer
+
+        Returns
+        -------
+        int
+            index of address in 'addresses', port of inbound peers is 0
+        """
+        key = peer.address if peer.outbound else \
+            (peer.address[0], 0)  # type: Tuple[str, int]
+        ids = self._ids  # type: Any
+        i = ids.get(key)  # type: Optional[int]
+        if i is not None:
+            ids.move_to_end(key)
+        elif len(self.addresses) < self.max_peer_ids:
+            i = ids[key] = len(self.addresses)
+            self.addresses.append(key)
+        else:
+            i = ids[key] = ids.popitem(last=False)[1]
+            self.addresses[i] = key
+        return i
+
+    def version_for(self, peer: Peer) -> Version:
+        """
+        Create 'version' message greeting given peer
+
+        Parameters
+        ----------
+        peer : coinflow.network.Peer
+            peer to greet
+
+        Returns
+        -------
+        Version
+            'Version' message
+        """
+        (host, port) = peer.address
+        if ':' in host:
+            (host, port) = ('0.0.0.0', 0)
+        return Version(structs.Netaddr(host, port, 0),
+                       structs.Netaddr('0.0.0.0', 0, self.services),
+                       services=self.services,
+                       timestamp=datetime.now(timezone.utc),
+                       nonce=self.nonce, user_agent=self.user_agent,
+                       start_height=self.start_height, relay=self.relay,
+                       magic=self.magic)
+
+    async def connect(self, host: str, port: int) -> Peer:
+        """
+        Connect to remote node and wait for handshake to complete
+
+        Parameters
+        ----------
+        host : str
+            address of remote node
+        port : int
+            port of remote node
+
+        Returns
+        -------
+        Peer
+            established peer
+        """
+        (_, peer) = await asyncio.wait_for(
+                        self.loop.create_connection(lambda: Peer(self, True),
+                                                    host, port),
+                        self.handshake_timeout)
+        return (await peer.handshake)
+
+    async def serve(self, host: str, port: int) -> asyncio.AbstractServer:
+        """
+        Start accepting connections from remote nodes
+
+        Parameters
+        ----------
+        host : str
+            address to listen on
+        port : int
+            port to listen on, 0 to pick free one
+
+        Returns
+        -------
+        asyncio.AbstractServer
+            listening server
+        """
+        server = await self.loop.create_server(lambda: Peer(self, False),
+                                               host, port)
+        self._servers.append(server)
+        return server
+
+    def close(self) -> None:
+        """
+        Stop listening and disconnect all peers
+        """
+        for server in self._servers:
+            server.close()
+        self._servers.clear()
+        for peer in list(self.peers):
+            peer.close()
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        if self in Node._metered:
+            Node._metered.remove(self)
+            Message.set_metrics(Node._metered[-1].metrics
+                                if Node._metered else None)
+
+    def _peer_made(self, peer: Peer) -> None:
+        self.peers.add(peer)
+        if self._sweeper is None:
+            self._sweeper = self.loop.call_later(self.sweep_interval,
+                                                 self._sweep)
+
+    def _peer_established(self, peer: Peer) -> None:
+        logger.debug('%s established', peer)
+
+    def _peer_lost(self, peer: Peer) -> None:
+        self.peers.discard(peer)
+        if self.metrics is not None:
+            self.metrics.forget(peer.address)
+
+    def _on_addr(self, peer: Peer, msg: Addr) -> None:
+        batch = Addr.decode_batch(msg.buffers()[1])  # type: AddrBatch
+        peer.known.add_many(batch.keys())
+        self.addrman.extend(batch)
+
+    def _on_inv(self, peer: Peer, msg: Inv) -> None:
+        batch = Inv.decode_batch(msg.buffers()[1])  # type: InvBatch
+        peer.known.add_many(batch.keys())
+        if self.first_seen is not None:
+            self.first_seen.observe_many(batch.keys(Inv.MSG_TX),
+                                         self.peer_id(peer))
+
+    def _on_getaddr(self, peer: Peer, msg: Message) -> None:
+        # Skip addresses which peer sent us or got from us recently
+        entries = [e for e in self.addrman.freshest(Addr.MAX_ENTRIES)
+                   if peer.known.add(e.addr.encode()[8:])]  # type: AddrList
+        peer.send(Addr(entries, magic=self.magic))
+
+    def _sweep(self) -> None:
+        now = time.monotonic()  # type: float
+        for peer in list(self.peers):
+            if (not peer.established and
+                    now - peer.created > self.handshake_timeout):
+                peer.close(asyncio.TimeoutError(
+                            '{0} handshake timed out'.format(peer)))
+            elif now - peer.last_recv > self.idle_timeout:
+                peer.close(asyncio.TimeoutError(
+                            '{0} idle timed out'.format(peer)))
+        if self.peers:
+            self._sweeper = self.loop.call_later(self.sweep_interval,
+                                                 self._sweep)
+        else:
+            self._sweeper = None
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import struct
+import time
+
+from typing import Any, Optional, Tuple
+
+from .SendQueue import SendQueue
+from coinflow.protocol.Framer import Framer, Frame
+from coinflow.protocol.Verifier import Verifier
+from coinflow.protocol.messages import Message, Version, Verack
+from coinflow.protocol.messages.Message import MsgGenericPayload
+from coinflow.tables import RollingBloom
+
+logger = logging.getLogger(__name__)
+
+
+class Peer(asyncio.Protocol):
+    """
+    Single connection with remote node
+
+    Every peer owns its transport and stream framer. Peer drives
+    'version' -> 'verack' handshake and hands every decoded message over to
+    'Node' for dispatching. Timeouts are enforced by 'Node', so peer does not
+    keep any timers on its own. Outgoing messages go through 'SendQueue',
+    which coalesces writes and follows water marks of transport.
+    """
+
+    def __init__(self, node: Any, outbound: bool) -> None:
+        """
+        Constructor for 'Peer' class.
+
+        Parameters
+        ----------
+        node : coinflow.network.Node
+            node managing this connection
+        outbound : bool
+            whether connection was initiated by local node
+        """
+        self.node = node  # type: Any
+        self.outbound = outbound  # type: bool
+        self.transport = None  # type: Optional[asyncio.Transport]
+        self.address = None  # type: Optional[Tuple[str, int]]
+        self.framer = Framer(node.magic, verify=node.checksum_pool is None
+                             )  # type: Framer
+        self.verifier = None  # type: Optional[Verifier]
+        """Stage verifying checksums on thread pool, if node has one"""
+        if node.checksum_pool is not None:
+            self.verifier = Verifier(self._frame_verified, node.checksum_pool,
+                                     node.checksum_threshold, node.loop,
+                                     framer=self.framer, error=self.close)
+        self.queue = SendQueue(self, node.max_pending)  # type: SendQueue
+        self.known = RollingBloom()  # type: RollingBloom
+        """Addresses and inventory recently sent to or received from peer"""
+        self.version = None  # type: Optional[MsgGenericPayload]
+        """Payload of 'version' message received from remote node"""
+        self.verack = False  # type: bool
+        self.established = False  # type: bool
+        self.created = time.monotonic()  # type: float
+        self.last_recv = self.created  # type: float
+        self.handshake = node.loop.create_future()  # type: asyncio.Future
+        """Future resolved with this peer once handshake is complete"""
+        self.handshake.add_done_callback(self._retrieve)
+
+    def __str__(self) -> str:
+        return 'peer:({addr}, {dir})'.format(
+                                        addr=self.address,
+                                        dir='out' if self.outbound else 'in')
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+        transport.set_write_buffer_limits(*self.node.write_limits)
+        self.address = transport.get_extra_info('peername')[:2]
+        if self.verifier is not None:
+            self.verifier.flow = transport
+        self.node._peer_made(self)
+        if self.outbound:
+            self.send(self.node.version_for(self))
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.established = False
+        self.queue.clear()
+        if self.verifier is not None:
+            self.verifier.clear()
+        if not self.handshake.done():
+            self.handshake.set_exception(
+                    exc or ConnectionError('{0} disconnected'.format(self)))
+        self.node._peer_lost(self)
+
+    def pause_writing(self) -> None:
+        self.queue.pause()
+
+    def resume_writing(self) -> None:
+        self.queue.resume()
+
+    def data_received(self, data: bytes) -> None:
+        self.last_recv = time.monotonic()
+        if self.verifier is not None:
+            self.verifier.feed(self.framer.feed(data))
+            return
+        for frame in self.framer.feed(data):
+            self._frame_verified(frame)
+
+    def _frame_verified(self, frame: Frame) -> None:
+        if self.transport.is_closing():
+            return
+        if self.node.recorder is not None:
+            self.node.recorder.record(self.address, frame)
+        if self.node.metrics is not None:
+            self.node.metrics.received(self.address, frame.command,
+                                       Framer.HEADER.size + frame.length)
+        self.frame_received(frame)
+
+    def frame_received(self, frame: Frame) -> None:
+        """
+        Wrap single frame in message and pass it to handshake or dispatcher
+
+        Payload is decoded lazily, only once handshake or handler reads it.
+
+        Parameters
+        ----------
+        frame : coinflow.protocol.Framer.Frame
+            complete frame cut from stream
+        """
+        msg = Message.from_payload(frame.command, frame.payload,
+                                   frame.magic, frame.checksum,
+                                   lazy=True)  # type: Message
+        if frame.command == Version.COMMAND_RAW:
+            try:
+                self._on_version(msg.payload)
+            except (struct.error, ValueError, IndexError) as e:
+                logger.warning('%s sent malformed version: %s', self, e)
+                self.close()
+                return
+        elif frame.command == Verack.COMMAND_RAW:
+            self._on_verack()
+        elif not self.established:
+            return
+
+        self.node.dispatch(self, frame.command, msg)
+
+    def send(self, msg: Message) -> bool:
+        """
+        Queue cached header and payload of message for writing to transport
+
+        Parameters
+        ----------
+        msg : coinflow.protocol.messages.Message
+            message to send
+
+        Returns
+        -------
+        bool
+            False if message was dropped, see 'SendQueue'
+        """
+        return self.queue.push(msg.command, msg.buffers())
+
+    def close(self, exc: Optional[Exception] = None) -> None:
+        """
+        Close connection with remote node, after writing queued messages
+
+        Parameters
+        ----------
+        exc : Exception
+            reason of closing, raised from 'handshake' if it is still pending
+        """
+        if exc is not None and not self.handshake.done():
+            self.handshake.set_exception(exc)
+        if self.transport is not None:
+            self.queue.flush()
+            self.transport.close()
+
+    def _on_version(self, payload: MsgGenericPayload) -> None:
+        if self.version is not None:
+            return
+        if payload['nonce'] == self.node.nonce:
+            self.close(ConnectionError('{0} is self-connection'.format(self)))
+            return
+        self.version = payload
+        if not self.outbound:
+            self.send(self.node.version_for(self))
+        self.send(Verack(magic=self.node.magic))
+        self._check_handshake()
+
+    def _on_verack(self) -> None:
+        self.verack = True
+        self._check_handshake()
+
+    def _check_handshake(self) -> None:
+        if self.version is not None and self.verack and not self.established:
+            self.established = True
+            if not self.handshake.done():
+                self.handshake.set_result(self)
+            self.node._peer_established(self)
+
+    @staticmethod
+    def _retrieve(future: asyncio.Future) -> None:
+        # Nobody awaits handshake of inbound peers, so mark exception as seen
+        if not future.cancelled():
+            future.exception()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import os
+
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Entry = Tuple[str, int, Tuple[bytes, bytes]]
+"""Command, size and buffers of queued message"""
+
+IOV_MAX = 1024  # type: int
+"""Buffers passed to single 'writev' call at most, POSIX minimum"""
+
+
+class SendQueue(object):
+    """
+    Outbound queue of single peer
+
+    Messages queued during one event loop iteration are written together,
+    so answering many small requests costs one syscall instead of one per
+    message. When transport buffer is empty and its socket is plain one,
+    queued headers and payloads are written straight to socket with
+    scatter write ('os.writev'), so payload broadcast to many peers is not
+    copied for any of them. Only bytes which socket did not take are
+    handed to transport, which copies them into its buffer; TLS
+    transports, platforms without 'os.writev' and transports with data
+    already buffered get all messages with 'writelines', which copies
+    them as well (before Python 3.12).
+
+    Queue follows water marks of transport: once its buffer grows over high
+    mark ('pause_writing' of peer), messages are held in queue until buffer
+    drains below low mark. Low-value gossip ('GOSSIP' commands) is not held
+    for such slow peer, it is dropped instead. If held messages exceed
+    'max_pending' bytes, peer is disconnected, so memory used by single peer
+    stays bounded.
+    """
+
+    GOSSIP = frozenset(('addr', 'inv'))  # type: frozenset
+    """Commands which are dropped rather than queued for slow peers"""
+
+    def __init__(self, peer: Any, max_pending: int = 4 * 1024 * 1024) -> None:
+        """
+        Constructor for 'SendQueue' class.
+
+        Parameters
+        ----------
+        peer : coinflow.network.Peer
+            peer owning transport messages are written to
+        max_pending : int
+            bytes held in queue at most, peer is closed when exceeded
+        """
+        self.peer = peer  # type: Any
+        self.max_pending = max_pending  # type: int
+        self.pending = 0  # type: int
+        """Bytes of messages waiting in queue"""
+        self.paused = False  # type: bool
+        """Whether transport buffer is over high water mark"""
+        self.dropped = 0  # type: int
+        """Number of gossip messages dropped so far"""
+        self._entries = list()  # type: List[Entry]
+        self._flusher = None  # type: Optional[asyncio.Handle]
+
+    def __len__(self) -> int:
+        """
+        Number of messages waiting in queue
+        """
+        return len(self._entries)
+
+    def push(self, command: str, buffers: Tuple[bytes, bytes]) -> bool:
+        """
+        Queue message, to be written at the end of event loop iteration
+
+        Parameters
+        ----------
+        command : str
+            command of message, used to tell gossip apart
+        buffers : tuple
+            encoded header and payload of message
+
+        Returns
+        -------
+        bool
+            False if message was dropped
+        """
+        transport = self.peer.transport  # type: Any
+        if transport is None or transport.is_closing():
+            return False
+        if self.paused and command in self.GOSSIP:
+            self._drop(command)
+            return False
+        size = len(buffers[0]) + len(buffers[1])  # type: int
+        self._entries.append((command, size, buffers))
+        self.pending += size
+        if self.pending > self.max_pending:
+            self.clear()
+            self.peer.close(ConnectionError(
+                    '{0} does not read its messages'.format(self.peer)))
+            return False
+        if self._flusher is None and not self.paused:
+            self._flusher = self.peer.node.loop.call_soon(self.flush)
+        return True
+
+    def flush(self) -> None:
+        """
+        Write all queued messages to transport at once, unless it is paused
+        """
+        self._flusher = None
+        if self.paused or not self._entries:
+            return
+        transport = self.peer.transport  # type: Any
+        if transport.is_closing():
+            self.clear()
+            return
+        (entries, self._entries) = (self._entries, list())
+        self.pending = 0
+        buffers = list()  # type: List[bytes]
+        for (_, _, (header, payload)) in entries:
+            buffers.append(header)
+            buffers.append(payload)
+        _write(transport, buffers)
+        metrics = self.peer.node.metrics  # type: Any
+        if metrics is not None:
+            for (command, size, _) in entries:
+                metrics.sent(self.peer.address, command, size)
+
+    def pause(self) -> None:
+        """
+        Hold messages and drop queued gossip, transport buffer is full
+        """
+        self.paused = True
+        if any(e[0] in self.GOSSIP for e in self._entries):
+            kept = list()  # type: List[Entry]
+            for entry in self._entries:
+                if entry[0] in self.GOSSIP:
+                    self.pending -= entry[1]
+                    self._drop(entry[0])
+                else:
+                    kept.append(entry)
+            self._entries = kept
+
+    def resume(self) -> None:
+        """
+        Write held messages, transport buffer drained
+        """
+        self.paused = False
+        self.flush()
+
+    def clear(self) -> None:
+        """
+        Forget all queued messages, e.g. when connection is lost
+        """
+        self._entries = list()
+        self.pending = 0
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+
+    def _drop(self, command: str) -> None:
+        self.dropped += 1
+        metrics = self.peer.node.metrics  # type: Any
+        if metrics is not None:
+            metrics.dropped(self.peer.address, command)
+
+
+def _fileno(transport: Any) -> Optional[int]:
+    """
+    Descriptor of plain socket of transport, None if it cannot be written
+    directly
+    """
+    if not hasattr(os, 'writev') or \
+            transport.get_extra_info('sslcontext') is not None:
+        return None
+    sock = transport.get_extra_info('socket')  # type: Any
+    return sock.fileno() if sock is not None else None
+
+
+def _write(transport: Any, buffers: List[bytes]) -> None:
+    """
+    Write buffers to transport, with scatter write straight to its socket
+    when nothing is buffered in transport yet
+    """
+    fd = _fileno(transport)  # type: Optional[int]
+    if fd is None or transport.get_write_buffer_size():
+        transport.writelines(buffers)
+        return
+    i = 0  # type: int
+    while i < len(buffers):
+        chunk = buffers[i:i + IOV_MAX]  # type: List[bytes]
+        try:
+            n = os.writev(fd, chunk)  # type: int
+        except (BlockingIOError, InterruptedError):
+            n = 0
+        except OSError:
+            # Let transport hit the same error and close connection
+            break
+        for buf in chunk:
+            if n < len(buf):
+                break
+            n -= len(buf)
+            i += 1
+        else:
+            continue
+        if n:
+            transport.write(memoryview(buffers[i])[n:])
+            i += 1
+        break
+    if i < len(buffers):
+        transport.writelines(buffers[i:])
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import socket
+
+from array import array
+from typing import Any, Dict, List, Optional, Set
+
+from .Channel import Channel
+from .Node import Node
+from .Peer import Peer
+from coinflow.protocol.messages import Addr, Message
+from coinflow.protocol.messages.Addr import AddrBatch
+
+logger = logging.getLogger(__name__)
+
+
+class Shard(Node):
+    """
+    Node running in worker process of 'Cluster'
+
+    Shard takes commands (connect, adopt accepted socket, broadcast, close)
+    from coordinator over channel and reports peer events back. Addresses
+    learnt from 'addr' messages are merged into single 'AddrBatch' and sent
+    at most once per 'flush_interval', so chatty peers do not flood the
+    channel.
+    """
+
+    def __init__(self, sock: socket.socket, index: int,
+                 flush_interval: float = 0.1, **kwargs: Any) -> None:
+        """
+        Constructor for 'Shard' class.
+
+        Parameters
+        ----------
+        sock : socket.socket
+            end of socket pair connected to coordinator
+        index : int
+            number of shard in cluster
+        flush_interval : float
+            seconds between batches of addresses sent to coordinator
+        **kwargs
+            'Node' arguments
+        """
+        super(Shard, self).__init__(**kwargs)
+        self.channel = Channel(sock, self._command, self.stop,
+                               self.loop)  # type: Channel
+        self.index = index  # type: int
+        self.flush_interval = flush_interval  # type: float
+        self._addrs = list()  # type: List[AddrBatch]
+        self._flusher = None  # type: Optional[asyncio.Handle]
+        self._stopped = False  # type: bool
+        self._established = set()  # type: Set[Peer]
+        self.on('addr', self._forward_addr)
+
+    def emit(self, event: str, *args: Any) -> None:
+        """
+        Send event to coordinator
+
+        Parameters
+        ----------
+        event : str
+            name of event
+        *args
+            picklable event arguments
+        """
+        if not self.channel.closed:
+            self.channel.send((event,) + args)
+
+    def stop(self) -> None:
+        """
+        Disconnect all peers and stop event loop of worker
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        self._flush()
+        self.close()
+        self.channel.close()
+        self.loop.stop()
+
+    def _command(self, command: Any, fd: Optional[int]) -> None:
+        (name, args) = (command[0], command[1:])
+        if name == 'connect':
+            self.loop.create_task(self._connect(*args))
+        elif name == 'accept':
+            self.loop.create_task(self._accept(socket.socket(fileno=fd)))
+        elif name == 'broadcast':
+            self.broadcast(Message.parse(args[0], lazy=True))
+        elif name == 'close':
+            self.stop()
+
+    async def _connect(self, host: str, port: int) -> None:
+        # Handshake outcome is reported by 'established' and 'lost' events
+        try:
+            await asyncio.wait_for(
+                    self.loop.create_connection(lambda: Peer(self, True),
+                                                host, port),
+                    self.handshake_timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            self.emit('failed', (host, port), str(e))
+
+    async def _accept(self, sock: socket.socket) -> None:
+        address = None  # type: Any
+        try:
+            address = sock.getpeername()[:2]
+            await self.loop.connect_accepted_socket(lambda: Peer(self, False),
+                                                    sock)
+        except OSError as e:
+            sock.close()
+            self.emit('failed', address, str(e))
+
+    def _peer_established(self, peer: Peer) -> None:
+        super(Shard, self)._peer_established(peer)
+        self._established.add(peer)
+        self.emit('established', peer.address,
+                  peer.version['user_agent'], peer.version['start_height'])
+
+    def _peer_lost(self, peer: Peer) -> None:
+        super(Shard, self)._peer_lost(peer)
+        established = peer in self._established  # type: bool
+        self._established.discard(peer)
+        self.emit('lost', peer.address, established)
+
+    def _forward_addr(self, peer: Peer, msg: Addr) -> None:
+        self._addrs.append(Addr.decode_batch(msg.buffers()[1]))
+        if self._flusher is None:
+            self._flusher = self.loop.call_later(self.flush_interval,
+                                                 self._flush)
+
+    def _flush(self) -> None:
+        self._flusher = None
+        if not self._addrs:
+            return
+        batches = self._addrs  # type: List[AddrBatch]
+        self._addrs = list()
+        merged = AddrBatch(array('I'), array('Q'),
+                           b''.join(b.ips for b in batches),
+                           array('H'))  # type: AddrBatch
+        for b in batches:
+            merged.timestamps.extend(b.timestamps)
+            merged.services.extend(b.services)
+            merged.ports.extend(b.ports)
+        self.emit('addr', merged)
+
+
+def run_shard(sock: socket.socket, index: int, flush_interval: float,
+              options: Dict[str, Any]) -> None:
+    """
+    Entry point of worker process: run shard until coordinator closes it
+
+    Parameters
+    ----------
+    sock : socket.socket
+        end of socket pair connected to coordinator
+    index : int
+        number of shard in cluster
+    flush_interval : float
+        seconds between batches of addresses sent to coordinator
+    options : dict
+        'Node' arguments
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        Shard(sock, index, flush_interval, loop=loop, **options)
+        loop.run_forever()
+        # Let transports closed by 'stop' finish
+        loop.run_until_complete(asyncio.sleep(0))
+    finally:
+        loop.close()
+        sock.close()
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .AddrManager import AddrManager
+from .SendQueue import SendQueue
+from .Channel import Channel
+from .Peer import Peer
+from .Node import Node
+from .Shard import Shard
+from .Cluster import Cluster
+
+__all__ = ['AddrManager', 'SendQueue', 'Channel', 'Peer', 'Node', 'Shard',
+           'Cluster']
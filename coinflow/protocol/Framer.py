@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import struct
+
+from typing import Iterable, List, NamedTuple, Tuple
+
+from .magic import bitcoin
+import coinflow.protocol.structs as structs
+
+Frame = NamedTuple('Frame', (('magic', int), ('command', bytes),
+                             ('length', int), ('checksum', bytes),
+                             ('payload', bytes)))
+
+
+class Framer(object):
+    """
+    Incremental framer cutting raw byte stream into Bitcoin messages
+
+    Chunks of arbitrary size (e.g. as read from socket) are appended to single
+    growable buffer, which is walked with offsets. Consumed bytes are dropped
+    from the front of the buffer only once per 'feed' call.
+
+    .. Message structure in Bitcoin wiki:
+       https://en.bitcoin.it/wiki/Protocol_documentation#Message_structure
+    """
+
+    HEADER = struct.Struct('<L12sL4s')  # type: struct.Struct
+    """Precompiled message header, same layout as Message.HEADER_FMT"""
+    MAX_LENGTH = 32 * 1024 * 1024  # type: int
+    """Upper bound for payload length, bigger ones are treated as garbage"""
+
+    def __init__(self, magic: int = bitcoin['mainnet'],
+                 max_length: int = MAX_LENGTH, verify: bool = True) -> None:
+        """
+        Constructor for 'Framer' class.
+
+        Parameters
+        ----------
+        magic : int
+            Magic value used in network
+        max_length : int
+            Maximum accepted payload length
+        verify : bool
+            whether payload checksum should be verified
+        """
+        self.magic = magic  # type: int
+        self.max_length = max_length  # type: int
+        self.verify = verify  # type: bool
+        self.dropped = 0  # type: int
+        """Number of bytes discarded during resynchronization"""
+        self._marker = struct.pack('<L', magic)  # type: bytes
+        self._buf = bytearray()  # type: bytearray
+        self._pos = 0  # type: int
+
+    def __len__(self) -> int:
+        """
+        Number of buffered bytes which were not framed yet.
+        """
+        return len(self._buf) - self._pos
+
+    def feed(self, data: bytes) -> List[Frame]:
+        """
+        Append chunk of stream and cut all complete frames out of buffer
+
+        Parameters
+        ----------
+        data : bytes
+            Chunk of raw stream, may be any bytes-like object
+
+        Returns
+        -------
+        list
+            Complete frames found in buffer, in stream order
+        """
+        self._buf += data
+        frames = list()  # type: List[Frame]
+        buf = self._buf  # type: bytearray
+        h_len = self.HEADER.size  # type: int
+
+        while True:
+            start = buf.find(self._marker, self._pos)  # type: int
+            if start < 0:
+                # Keep tail which may be beginning of split marker
+                keep = max(self._pos, len(buf) - len(self._marker) + 1)
+                self.dropped += keep - self._pos
+                self._pos = keep
+                break
+            self.dropped += start - self._pos
+            self._pos = start
+
+            if len(buf) - start < h_len:
+                break
+            (magic, command, length,
+             checksum) = self.HEADER.unpack_from(buf, start)
+            if length > self.max_length:
+                self._skip()
+                continue
+            end = start + h_len + length  # type: int
+            if len(buf) < end:
+                break
+
+            with memoryview(buf) as view:
+                payload = view[start + h_len:end].tobytes()  # type: bytes
+            if self.verify and structs.dsha256(payload)[:4] != checksum:
+                self._skip()
+                continue
+
+            frames.append(Frame(magic, command, length, checksum, payload))
+            self._pos = end
+
+        del buf[:self._pos]
+        self._pos = 0
+        return frames
+
+    def reject(self, frames: Iterable[Frame]) -> Tuple[List[Frame], int]:
+        """
+        Frame again frames cut without verification, the first of which
+        failed it, searching for marker right after its first byte
+
+        Used when checksums are verified outside of framer (see
+        'coinflow.protocol.Verifier'), as invalid frame may be garbage whose
+        length swallowed valid frames behind it. Frames are taken from
+        'frames' only until stream cut again realigns with them, so run of
+        garbage frames costs time linear in its size, and frames after that
+        stay as they are. Frames are cut again as with 'verify=True', so
+        wrong checksum of garbage cannot swallow bytes again. If stream does
+        not realign, its rest is put back in front of bytes not framed yet.
+        Bytes skipped between frames while searching for marker are not
+        restored.
+
+        Parameters
+        ----------
+        frames : iterable
+            rejected frame followed by frames cut after it, in stream order;
+            iterated lazily
+
+        Returns
+        -------
+        tuple
+            valid frames cut again and number of frames taken from 'frames'
+        """
+        pack = self.HEADER.pack
+        scratch = Framer(self.magic, self.max_length)
+        it = iter(frames)
+        frame = next(it)  # type: Frame
+        framed = scratch.feed(pack(frame.magic, frame.command, frame.length,
+                                   frame.checksum)[1:] + frame.payload)
+        used = 1  # type: int
+        for frame in it:
+            if not len(scratch):
+                break
+            framed += scratch.feed(pack(frame.magic, frame.command,
+                                        frame.length, frame.checksum) +
+                                   frame.payload)
+            used += 1
+        self._buf[:0] = scratch._buf
+        self.dropped += 1 + scratch.dropped
+        return (framed, used)
+
+    def _skip(self) -> None:
+        """
+        Drop marker at current position, so search resumes right after it
+        """
+        self.dropped += 1
+        self._pos += 1
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+
+from collections import deque
+from itertools import chain
+from concurrent.futures import Executor
+from typing import Any, Callable, Deque, List, Optional, Sequence, Tuple
+
+from .Framer import Frame, Framer
+import coinflow.protocol.structs as structs
+
+logger = logging.getLogger(__name__)
+
+Pending = Tuple[List[Frame], List[Optional[bool]], Optional[asyncio.Future]]
+"""Frames, checksum results known so far and future of the rest"""
+
+
+def verify_many(frames: Sequence[Frame]) -> List[bool]:
+    """
+    Verify checksums of frames
+
+    Parameters
+    ----------
+    frames : sequence
+        frames to verify
+
+    Returns
+    -------
+    list
+        whether checksum of every frame matches its payload
+    """
+    dsha256 = structs.dsha256
+    return [dsha256(f.payload)[:4] == f.checksum for f in frames]
+
+
+class Verifier(object):
+    """
+    Checksum verification stage of single stream, e.g. of one peer
+
+    Frames cut from stream without verification (see 'Framer' with
+    'verify=False') are fed in batches. Checksums of small payloads are
+    verified inline, while payloads of at least 'threshold' bytes (blocks,
+    big 'addr' messages) of single batch are hashed together on thread pool;
+    hashlib releases GIL for them, so streams of many peers are hashed on
+    many cores at once. Valid frames are handed to 'deliver' on event loop
+    in stream order.
+
+    Frame with wrong checksum may be garbage which only looks like header,
+    whose length swallowed valid frames behind it. So, as 'Framer' does
+    inline, stream is framed again by 'framer' from the second byte of that
+    frame, until it realigns with frames cut before, so run of garbage
+    frames costs time linear in its size. Frames cut again are verified
+    inline by 'framer'.
+    Without 'framer' such frames are just dropped.
+
+    Once payloads waiting for verification exceed 'max_pending' bytes,
+    reading from 'flow' (e.g. transport) is paused until they are delivered,
+    so peer sending faster than pool hashes cannot grow memory without
+    bound.
+    """
+
+    THRESHOLD = 16 * 1024  # type: int
+    """Default size of payload above which it is hashed on thread pool"""
+    MAX_PENDING = 2 * Framer.MAX_LENGTH  # type: int
+    """Default bytes of payloads waiting, above which reading is paused"""
+
+    def __init__(self, deliver: Callable[[Frame], Any], executor: Executor,
+                 threshold: int = THRESHOLD,
+                 loop: Optional[asyncio.AbstractEventLoop] = None,
+                 framer: Optional[Framer] = None,
+                 max_pending: int = MAX_PENDING,
+                 error: Optional[Callable[[Exception], Any]] = None) -> None:
+        """
+        Constructor for 'Verifier' class.
+
+        Parameters
+        ----------
+        deliver : callable
+            function called with every valid frame, in stream order
+        executor : concurrent.futures.Executor
+            thread pool hashing large payloads, usually shared by streams
+        threshold : int
+            size of payload from which it is hashed on thread pool
+        loop : asyncio.AbstractEventLoop
+            event loop to use instead of current one
+        framer : coinflow.protocol.Framer
+            framer cutting frames of the stream, resynchronized on wrong
+            checksum
+        max_pending : int
+            bytes of payloads waiting for verification above which reading
+            is paused
+        error : callable
+            function called with exception raised while hashing on thread
+            pool, e.g. closing the stream; waiting frames are forgotten
+        """
+        self.deliver = deliver  # type: Callable[[Frame], Any]
+        self.executor = executor  # type: Executor
+        self.threshold = threshold  # type: int
+        self.loop = loop or asyncio.get_event_loop()  # type: Any
+        self.framer = framer  # type: Optional[Framer]
+        self.max_pending = max_pending  # type: int
+        self.error = error  # type: Optional[Callable[[Exception], Any]]
+        self.flow = None  # type: Optional[Any]
+        """Object with 'pause_reading' and 'resume_reading', e.g. transport"""
+        self.paused = False  # type: bool
+        """Whether reading from 'flow' is paused"""
+        self.pending = 0  # type: int
+        """Bytes of payloads waiting for verification or earlier frames"""
+        self.dropped = 0  # type: int
+        """Number of frames dropped because of wrong checksum"""
+        self._pending = deque()  # type: Deque[Pending]
+
+    def __len__(self) -> int:
+        """
+        Number of frames waiting for verification or for earlier frames
+        """
+        return sum(len(p[0]) for p in self._pending)
+
+    def feed(self, frames: List[Frame]) -> None:
+        """
+        Verify batch of frames and deliver valid ones once all earlier frames
+        are delivered
+
+        Parameters
+        ----------
+        frames : list
+            consecutive frames of stream
+        """
+        while frames:
+            frames = self._feed(frames)
+
+    def _feed(self, frames: List[Frame]) -> List[Frame]:
+        """
+        Verify batch of frames, return frames framed again after
+        resynchronization, which are fed next instead of recursively
+        """
+        threshold = self.threshold  # type: int
+        large = [f for f in frames if f.length >= threshold]
+        if not large and not self._pending:
+            return self._hand(frames, verify_many(frames)) or []
+        results = [None if f.length >= threshold else
+                   structs.dsha256(f.payload)[:4] == f.checksum
+                   for f in frames]  # type: List[Optional[bool]]
+        future = None  # type: Optional[asyncio.Future]
+        if large:
+            future = self.loop.run_in_executor(self.executor, verify_many,
+                                               large)
+            future.add_done_callback(self._hashed)
+        self._pending.append((frames, results, future))
+        self.pending += sum(f.length for f in frames)
+        if self.pending > self.max_pending and not self.paused and \
+                self.flow is not None:
+            self.paused = True
+            self.flow.pause_reading()
+        if future is None:
+            return self._drain()
+        return []
+
+    def _hashed(self, future: asyncio.Future) -> None:
+        self.feed(self._drain())
+
+    def _drain(self) -> List[Frame]:
+        pending = self._pending  # type: Deque[Pending]
+        while pending:
+            (frames, results, future) = pending[0]
+            if future is not None:
+                if not future.done():
+                    break
+                try:
+                    hashed = iter(future.result())
+                except Exception as e:
+                    self._fail(e)
+                    return []
+                results = [next(hashed) if r is None else r for r in results]
+            pending.popleft()
+            self.pending -= sum(f.length for f in frames)
+            framed = self._hand(frames, results)
+            if framed is not None:
+                return framed
+        if self.paused and self.pending <= self.max_pending:
+            self.paused = False
+            self.flow.resume_reading()
+        return []
+
+    def _hand(self, frames: List[Frame],
+              results: Sequence[bool]) -> Optional[List[Frame]]:
+        """
+        Deliver valid frames and frame again from invalid ones
+
+        Frames cut again are verified by framer, unless framing again takes the
+        rest of this batch; batches pending after it are forgotten then and
+        frames to feed again are returned, None otherwise.
+        """
+        queue = deque(zip(frames, results))  # type: Deque[Tuple[Frame, bool]]
+        while queue:
+            (frame, valid) = queue.popleft()
+            if valid:
+                self.deliver(frame)
+                continue
+            self.dropped += 1
+            if self.framer is None:
+                continue
+            (framed, used) = self.framer.reject(chain(
+                        [frame], (f for (f, _) in queue),
+                        (f for (rest, _, _) in self._pending for f in rest)))
+            used -= 1
+            if used >= len(queue):
+                # Rest of stream may be back in framer, so feed all again
+                later = [f for (rest, _, _) in self._pending for f in rest]
+                self.clear()
+                return framed + later[used - len(queue):] + \
+                    self.framer.feed(b'')
+            for _ in range(used):
+                queue.popleft()
+            queue.extendleft((f, True) for f in reversed(framed))
+        return None
+
+    def _fail(self, exc: Exception) -> None:
+        self.clear()
+        if self.error is None:
+            logger.error('checksum verification failed: %r', exc)
+        else:
+            self.error(exc)
+
+    def clear(self) -> None:
+        """
+        Forget frames waiting for verification, e.g. when stream is closed
+        """
+        for (_, _, future) in self._pending:
+            if future is not None:
+                future.remove_done_callback(self._hashed)
+        self._pending.clear()
+        self.pending = 0
+        if self.paused:
+            self.paused = False
+            self.flow.resume_reading()
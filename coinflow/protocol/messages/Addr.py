@@ -3,16 +3,221 @@
 
 import struct
 import hashlib
+import heapq
 import random
 
+from array import array
 from datetime import datetime
+from socket import inet_ntoa
 from operator import attrgetter
-from typing import Sequence, Tuple, List, Dict, NewType, Union, overload
+from typing import (Any, Sequence, Tuple, List, Dict, NamedTuple, NewType,
+                    Optional, Union, overload)
 
 from .Message import Message, MessageMeta
+from .Schema import Schema, Array
 import coinflow.protocol.structs as structs
 
-AddrList = NewType('AddrList', List[structs.netaddr])
+try:
+    import numpy
+except ImportError:  # optional, installed with 'analysis' extra
+    numpy = None
+
+AddrEntry = NamedTuple('AddrEntry', (('timestamp', structs.Timestamp),
+                                     ('addr', structs.Netaddr)))
+AddrList = NewType('AddrList', List[AddrEntry])
+
+_PORT = struct.Struct('>H')  # type: struct.Struct
+
+
+class AddrBatch(object):
+    """
+    Columnar form of 'addr' payload
+
+    Every field of address entries is kept in its own contiguous column
+    instead of per-entry objects. IPs are packed as 16-byte (IPv6 or IPv4
+    mapped) addresses in single bytes object.
+
+    With NumPy installed, payload is also available as structured array of
+    'DTYPE' (see 'decode_numpy' and 'to_numpy'), and 'decode_from' cuts
+    columns out of it instead of unpacking entries one by one.
+    """
+
+    __slots__ = ('timestamps', 'services', 'ips', 'ports')
+
+    RECORD = struct.Struct('<LQ16sH')  # type: struct.Struct
+    """Single address entry; port is big-endian on wire, so it is swapped"""
+    DTYPE = None if numpy is None else numpy.dtype([
+                ('timestamp', '<u4'), ('services', '<u8'), ('ip', 'S16'),
+                ('port', '>u2')])  # type: Any
+    """NumPy structured type of single entry as on wire, None without NumPy"""
+
+    def __init__(self, timestamps: array, services: array, ips: bytes,
+                 ports: array) -> None:
+        """
+        Constructor for 'AddrBatch' class.
+
+        Parameters
+        ----------
+        timestamps : array
+            uint32 last-seen timestamps
+        services : array
+            uint64 services bitfields
+        ips : bytes
+            packed 16-byte addresses
+        ports : array
+            uint16 ports
+        """
+        self.timestamps = timestamps  # type: array
+        self.services = services  # type: array
+        self.ips = ips  # type: bytes
+        self.ports = ports  # type: array
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __getitem__(self, i: int) -> AddrEntry:
+        """
+        Convert single row to 'AddrEntry'
+        """
+        ip = inet_ntoa(self.ips[i * 16 + 12:i * 16 + 16])  # type: str
+        return AddrEntry(structs.Timestamp(self.timestamps[i]),
+                         structs.Netaddr(ip, self.ports[i], self.services[i]))
+
+    def keys(self) -> List[bytes]:
+        """
+        Packed addresses of all rows, as in wire format: 16-byte IP followed
+        by big-endian port
+
+        Returns
+        -------
+        list
+            18-byte keys, e.g. for 'coinflow.tables.RollingBloom'
+        """
+        ips = self.ips  # type: bytes
+        pack = _PORT.pack
+        return [ips[i * 16:i * 16 + 16] + pack(port)
+                for (i, port) in enumerate(self.ports)]
+
+    def entries(self) -> AddrList:
+        """
+        Convert all rows to 'AddrEntry' objects
+
+        Returns
+        -------
+        list
+            address entries
+        """
+        return [self[i] for i in range(len(self))]
+
+    def to_numpy(self) -> Any:
+        """
+        Copy columns to NumPy structured array
+
+        Returns
+        -------
+        numpy.ndarray
+            one row of 'DTYPE' per entry
+        """
+        if numpy is None:
+            raise ImportError('structured addr batch requires numpy')
+        records = numpy.zeros(len(self), dtype=self.DTYPE)  # type: Any
+        if len(self):
+            records['timestamp'] = numpy.frombuffer(self.timestamps,
+                                                    dtype=numpy.uint32)
+            records['services'] = numpy.frombuffer(self.services,
+                                                   dtype=numpy.uint64)
+            records['ip'] = numpy.frombuffer(self.ips, dtype='S16')
+            records['port'] = numpy.frombuffer(self.ports, dtype=numpy.uint16)
+        return records
+
+    @classmethod
+    def decode_numpy(cls, buf: structs.Buffer,
+                     offset: int = 0) -> Tuple[Any, int]:
+        """
+        Decode 'addr' payload into NumPy structured array without copying
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding payload, must not be resized while array is used
+        offset : int
+            position of payload in buffer
+
+        Returns
+        -------
+        tuple
+            read-only array of 'DTYPE' viewing 'buf' and offset of first
+            byte after payload
+        """
+        if numpy is None:
+            raise ImportError('structured addr batch requires numpy')
+        (count, offset) = cls._count(buf, offset)
+        records = numpy.frombuffer(buf, dtype=cls.DTYPE, count=count,
+                                   offset=offset)  # type: Any
+        records.flags.writeable = False
+        return (records, offset + count * cls.RECORD.size)
+
+    @classmethod
+    def decode_from(cls, buf: structs.Buffer, offset: int = 0,
+                    vectorized: Optional[bool] = None) -> Tuple[object, int]:
+        """
+        Decode 'addr' payload into columns in single pass
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding payload
+        offset : int
+            position of payload in buffer
+        vectorized : bool
+            whether NumPy should be used, by default if it is installed
+
+        Returns
+        -------
+        tuple
+            'AddrBatch' object and offset of first byte after payload
+        """
+        if vectorized and numpy is None:
+            raise ImportError('vectorized decoding requires numpy')
+        if vectorized is None:
+            vectorized = numpy is not None
+        timestamps = array('I')  # type: array
+        services = array('Q')  # type: array
+        ports = array('H')  # type: array
+        ips = b''  # type: bytes
+        if vectorized:
+            (records, end) = cls.decode_numpy(buf, offset)
+            timestamps.frombytes(records['timestamp'].astype(
+                                                    numpy.uint32).tobytes())
+            services.frombytes(records['services'].astype(
+                                                    numpy.uint64).tobytes())
+            ips = records['ip'].tobytes()
+            ports.frombytes(records['port'].astype(numpy.uint16).tobytes())
+            return cls(timestamps, services, ips, ports), end
+        (count, offset) = cls._count(buf, offset)
+        end = offset + count * cls.RECORD.size  # type: int
+        if count:
+            with memoryview(buf) as view:
+                (ts, srv, ip, port) = zip(*cls.RECORD.iter_unpack(
+                                                        view[offset:end]))
+            timestamps.extend(ts)
+            services.extend(srv)
+            ips = b''.join(ip)
+            ports.extend(port)
+            ports.byteswap()
+        return cls(timestamps, services, ips, ports), end
+
+    @classmethod
+    def _count(cls, buf: structs.Buffer, offset: int) -> Tuple[int, int]:
+        """
+        Decode number of entries, check that all of them are in buffer
+        """
+        (count, offset) = structs.Varint.decode_from(buf, offset)
+        end = offset + int(count) * cls.RECORD.size  # type: int
+        if end > len(buf):
+            raise ValueError('addr payload truncated by {0} bytes'.format(
+                                                            end - len(buf)))
+        return (int(count), offset)
 
 
 class Addr(Message):
@@ -23,6 +228,16 @@ class Addr(Message):
        https://en.bitcoin.it/wiki/Protocol_documentation#addr
     """
 
+    COMMAND = 'addr'  # type: str
+    """Command of message"""
+    SCHEMA = Schema(('addr_list',
+                     Array(Schema(('timestamp', structs.Timestamp),
+                                  ('addr', structs.Netaddr),
+                                  record=AddrEntry))))  # type: Schema
+    """Layout of payload used by default encoder and decoder"""
+    MAX_ENTRIES = 2500  # type: int
+    """Maximum number of entries encoded in single message"""
+
     def __init__(self, addr_list: AddrList, *args, **kwargs) -> None:
         """
         Constructor for 'Addr' class.
@@ -32,37 +247,34 @@ class Addr(Message):
         Addr
             'Addr' object
         """
-        super(Addr, self).__init__('addr', {'addr_list': addr_list},
+        super(Addr, self).__init__(self.COMMAND, {'addr_list': addr_list},
                                    *args, **kwargs)
 
     @classmethod
-    def decode_payload(cls, payload: bytes) -> Dict[str, AddrList]:
+    def decode_batch(cls, payload: structs.Buffer) -> AddrBatch:
         """
-        Decode message content from 'payload' field
+        Decode message content into columns, without per-entry objects
 
         Parameters
         ----------
-        payload : bytes
+        payload : bytes, bytearray, memoryview or mmap
             Raw payload to decode
 
         Returns
         -------
-        dict
+        AddrBatch
             Decoded payload
         """
-        (a_len, prefix) = structs.varint2int(payload)  # type: Tuple[int, int]
-        addr_list = list()  # type: AddrList
-        for addr in (payload[i:i+30] for i in range(prefix,
-                                                    a_len*30,
-                                                    30)):
-            addr_list.append(structs.netaddr.from_raw(addr))
-
-        return {'addr_list': addr_list}
+        return AddrBatch.decode_from(payload)[0]
 
     def encode_payload(self, payload: Dict[str, AddrList] = None) -> bytes:
         """
         Encode payload field of message.
 
+        Entries are encoded in given order. Lists longer than 'MAX_ENTRIES'
+        are cut down to freshest entries, use
+        'coinflow.network.AddrManager.freshest' to avoid it.
+
         Parameters
         ----------
         payload : dict
@@ -74,13 +286,8 @@ class Addr(Message):
             encoded payload
         """
         p = payload or self.payload  # type: Dict[str, AddrList]
-        p['addr_list'] = sorted(p['addr_list'],
-                                key=attrgetter('timestamp'),
-                                reverse=True)[:2500]
-
-        addr_list = bytearray()  # type: bytearray
-        addr_list.extend(structs.int2varint(len(p['addr_list'])))
-        for a in p['addr_list']:
-            addr_list.extend(a.encode())
+        if len(p['addr_list']) > self.MAX_ENTRIES:
+            p = {'addr_list': heapq.nlargest(self.MAX_ENTRIES, p['addr_list'],
+                                             key=attrgetter('timestamp'))}
 
-        return bytes(addr_list)
+        return self.SCHEMA.encode(p)
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .Message import Message
+
+
+class GetAddr(Message):
+    """
+    GetAddr message based on Bitcoin network-discovery 'getaddr' message
+
+    .. Message structure in Bitcoin wiki:
+       https://en.bitcoin.it/wiki/Protocol_documentation#getaddr
+    """
+
+    COMMAND = 'getaddr'  # type: str
+    """Command of message"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        """
+        Constructor for 'GetAddr' class.
+
+        Returns
+        -------
+        GetAddr
+            'GetAddr' object
+        """
+        super(GetAddr, self).__init__(self.COMMAND, None, *args, **kwargs)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import struct
+
+from array import array
+from typing import Dict, List, NamedTuple, NewType, Optional, Tuple
+
+from .Message import Message
+from .Schema import Schema, Array
+import coinflow.protocol.structs as structs
+
+InvVector = NamedTuple('InvVector', (('type', int), ('hash', bytes)))
+InvList = NewType('InvList', List[InvVector])
+
+
+class InvBatch(object):
+    """
+    Columnar form of 'inv' or 'getdata' payload
+
+    Types are kept in uint32 array and 32-byte hashes packed in single bytes
+    object, in order of inventory vectors.
+    """
+
+    __slots__ = ('types', 'hashes')
+
+    RECORD = struct.Struct('<L32s')  # type: struct.Struct
+    """Single inventory vector"""
+
+    def __init__(self, types: array, hashes: bytes) -> None:
+        """
+        Constructor for 'InvBatch' class.
+
+        Parameters
+        ----------
+        types : array
+            uint32 object types
+        hashes : bytes
+            packed 32-byte hashes
+        """
+        self.types = types  # type: array
+        self.hashes = hashes  # type: bytes
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __getitem__(self, i: int) -> InvVector:
+        """
+        Convert single row to 'InvVector'
+        """
+        return InvVector(self.types[i], self.hashes[i * 32:i * 32 + 32])
+
+    def vectors(self) -> InvList:
+        """
+        Convert all rows to 'InvVector' objects
+
+        Returns
+        -------
+        list
+            inventory vectors
+        """
+        return [self[i] for i in range(len(self))]
+
+    def keys(self, type: Optional[int] = None) -> List[bytes]:
+        """
+        Hashes of all rows of given type
+
+        Parameters
+        ----------
+        type : int
+            object type, e.g. 'Inv.MSG_TX', rows of all types if None
+
+        Returns
+        -------
+        list
+            32-byte hashes
+        """
+        hashes = self.hashes  # type: bytes
+        if type is None:
+            return [hashes[i:i + 32] for i in range(0, len(hashes), 32)]
+        return [hashes[i * 32:i * 32 + 32]
+                for (i, t) in enumerate(self.types) if t == type]
+
+    @classmethod
+    def decode_from(cls, buf: structs.Buffer,
+                    offset: int = 0) -> Tuple[object, int]:
+        """
+        Decode inventory vectors into columns in single pass
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding payload
+        offset : int
+            position of payload in buffer
+
+        Returns
+        -------
+        tuple
+            'InvBatch' object and offset of first byte after payload
+        """
+        (count, offset) = structs.Varint.decode_from(buf, offset)
+        if count > Inv.MAX_ENTRIES:
+            raise ValueError('inv of {0} entries exceeds limit {1}'.format(
+                                                int(count), Inv.MAX_ENTRIES))
+        end = offset + int(count) * cls.RECORD.size  # type: int
+        if end > len(buf):
+            raise ValueError('inv payload truncated by {0} bytes'.format(
+                                                            end - len(buf)))
+        types = array('I')  # type: array
+        hashes = b''  # type: bytes
+        if count:
+            with memoryview(buf) as view:
+                (t, h) = zip(*cls.RECORD.iter_unpack(view[offset:end]))
+            types.extend(t)
+            hashes = b''.join(h)
+        return cls(types, hashes), end
+
+
+class Inv(Message):
+    """
+    Inv message based on Bitcoin 'inv' message announcing known objects
+
+    .. Message structure in Bitcoin wiki:
+       https://en.bitcoin.it/wiki/Protocol_documentation#inv
+    """
+
+    COMMAND = 'inv'  # type: str
+    """Command of message"""
+    MAX_ENTRIES = 50000  # type: int
+    """Maximum number of inventory vectors in single message"""
+    SCHEMA = Schema(('inventory',
+                     Array(Schema(('type', 'L'), ('hash', '32s'),
+                                  record=InvVector),
+                           MAX_ENTRIES)))  # type: Schema
+    """Layout of payload used by default encoder and decoder"""
+    ERROR = 0  # type: int
+    """Type of vector which can be ignored"""
+    MSG_TX = 1  # type: int
+    """Type of vector with transaction hash"""
+    MSG_BLOCK = 2  # type: int
+    """Type of vector with block hash"""
+    MSG_FILTERED_BLOCK = 3  # type: int
+    """Type of vector with block hash, 'merkleblock' is expected in reply"""
+    MSG_CMPCT_BLOCK = 4  # type: int
+    """Type of vector with block hash, 'cmpctblock' is expected in reply"""
+
+    def __init__(self, inventory: InvList, *args, **kwargs) -> None:
+        """
+        Constructor for 'Inv' class.
+
+        Parameters
+        ----------
+        inventory : list
+            inventory vectors, at most 'MAX_ENTRIES'
+
+        Returns
+        -------
+        Inv
+            'Inv' object
+        """
+        super(Inv, self).__init__(self.COMMAND, {'inventory': inventory},
+                                  *args, **kwargs)
+
+    @classmethod
+    def decode_batch(cls, payload: structs.Buffer) -> InvBatch:
+        """
+        Decode message content into columns, without per-vector objects
+
+        Parameters
+        ----------
+        payload : bytes, bytearray, memoryview or mmap
+            Raw payload to decode
+
+        Returns
+        -------
+        InvBatch
+            Decoded payload
+        """
+        return InvBatch.decode_from(payload)[0]
+
+    def encode_payload(self, payload: Dict[str, InvList] = None) -> bytes:
+        """
+        Encode payload field of message.
+
+        Parameters
+        ----------
+        payload : dict
+            Payload do encode to bytes
+
+        Returns
+        -------
+        bytes
+            encoded payload
+        """
+        p = payload or self.payload  # type: Dict[str, InvList]
+        if len(p['inventory']) > self.MAX_ENTRIES:
+            raise ValueError('inv of {0} entries exceeds limit {1}'.format(
+                                        len(p['inventory']), self.MAX_ENTRIES))
+        return self.SCHEMA.encode(p)
+
+
+class GetData(Inv):
+    """
+    GetData message based on Bitcoin 'getdata' message, requesting objects
+    announced with 'inv'
+
+    .. Message structure in Bitcoin wiki:
+       https://en.bitcoin.it/wiki/Protocol_documentation#getdata
+    """
+
+    COMMAND = 'getdata'  # type: str
+    """Command of message"""
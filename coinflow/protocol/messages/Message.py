@@ -4,15 +4,106 @@
 import struct
 import coinflow.protocol.structs as structs
 
+from time import perf_counter
+from types import MappingProxyType
+
 from abc import ABCMeta, abstractmethod
-from typing import Dict, Any, Optional, NewType, cast
+from typing import Dict, Any, Optional, NewType, Tuple, Union, cast
+
+from .Schema import Schema
+from coinflow.protocol.Framer import Framer
 
 
 MsgGenericPayload = NewType('MsgGenericPayload', Dict[str, Any])
 
 
-class MessageMeta(metaclass=ABCMeta):
-    pass
+def _freeze(payload: Dict[str, Any]) -> MsgGenericPayload:
+    """
+    Read-only copy of payload
+    """
+    return cast(MsgGenericPayload, MappingProxyType(dict(payload)))
+
+
+class Header(object):
+    """
+    Unpacked message header, see 'Message.peek_header'
+
+    Command and checksum are kept raw, as they appear in header, so they
+    can be compared with e.g. 'Inv.COMMAND_RAW' without decoding, and
+    payload is located by 'start' and 'end' offsets in the peeked buffer.
+    """
+
+    __slots__ = ('magic', 'command', 'length', 'checksum', 'offset')
+
+    def __init__(self, magic: int, command: bytes, length: int,
+                 checksum: bytes, offset: int = 0) -> None:
+        """
+        Constructor for 'Header' class.
+
+        Parameters
+        ----------
+        magic : int
+            Magic value from header
+        command : bytes
+            Raw, NUL-padded command
+        length : int
+            Length of payload
+        checksum : bytes
+            Checksum of payload
+        offset : int
+            position of header in buffer
+        """
+        self.magic = magic  # type: int
+        self.command = command  # type: bytes
+        self.length = length  # type: int
+        self.checksum = checksum  # type: bytes
+        self.offset = offset  # type: int
+
+    def __repr__(self) -> str:
+        return 'Header({0!r}, length={1}, offset={2})'.format(
+                                        self.name, self.length, self.offset)
+
+    @property
+    def name(self) -> str:
+        """
+        Command without NUL padding
+        """
+        return self.command.rstrip(b'\x00').decode('ascii', 'replace')
+
+    @property
+    def start(self) -> int:
+        """
+        Position of payload in buffer
+        """
+        return self.offset + Message.HEADER.size
+
+    @property
+    def end(self) -> int:
+        """
+        Position right after payload in buffer, i.e. of next message
+        """
+        return self.offset + Message.HEADER.size + self.length
+
+
+class MessageRegistry(ABCMeta):
+    """
+    Metaclass registering every message class which defines 'COMMAND'
+
+    Classes are registered under raw, NUL-padded 12-byte command, exactly as
+    it appears in message header, so dispatching needs no decoding.
+    """
+
+    def __init__(cls, name, bases, namespace) -> None:
+        super(MessageRegistry, cls).__init__(name, bases, namespace)
+        command = namespace.get('COMMAND')  # type: Optional[str]
+        if command is not None:
+            cls.COMMAND_RAW = struct.pack('12s', command.encode('ascii'))
+            cls.REGISTRY[cls.COMMAND_RAW] = cls
+
+
+class MessageMeta(metaclass=MessageRegistry):
+    REGISTRY = dict()  # type: Dict[bytes, type]
+    """Message classes by raw command"""
 
 
 class Message(MessageMeta):
@@ -29,10 +120,20 @@ class Message(MessageMeta):
     """Magic value used in network"""
     HEADER_FMT = '<L12sL4s'  # type: str
     """Format string used in pack and unpack during message creation"""
+    HEADER = struct.Struct(HEADER_FMT)  # type: struct.Struct
+    """Precompiled HEADER_FMT"""
+    COMMAND = None  # type: Optional[str]
+    """Command of message, setting it registers class in REGISTRY"""
+    COMMAND_RAW = None  # type: Optional[bytes]
+    """Command padded with NUL bytes to 12 bytes"""
+    SCHEMA = Schema()  # type: Schema
+    """Layout of payload used by default encoder and decoder"""
+    METRICS = None  # type: Optional[Any]
+    """Metrics recording decoding and encoding time, disabled if None"""
 
     def __init__(self, command: str, payload: Optional[MsgGenericPayload],
                  magic: Optional[int] = None, checksum: Optional[bytes] = None,
-                 *args, **kwargs) -> None:
+                 *args, raw: Optional[bytes] = None, **kwargs) -> None:
         """
         Constructor for 'Message' class.
 
@@ -48,6 +149,9 @@ class Message(MessageMeta):
             precalculated payload checksum to use instead of calculated one
             should be used only in specific cases (e.g.: Message from bytes
             recreation)
+        raw : bytes
+            undecoded payload, decoded on first access to 'payload' and sent
+            as-is instead of encoding 'payload' again
 
         Returns
         -------
@@ -56,20 +160,50 @@ class Message(MessageMeta):
         """
         self.MAGIC = int(magic or self.MAGIC)  # type: int
         self.command = command.lower()  # type: str
-        self.payload = cast(MsgGenericPayload,
-                            payload or {})  # type: MsgGenericPayload
-        enc = self.encode_payload(payload)  # type: bytes
-        self.checksum = (checksum or
-                         structs.dsha256(enc)[0:4])  # type: bytes
+        self.raw = raw  # type: Optional[bytes]
+        self._payload = (None if raw is not None and payload is None else
+                         _freeze(payload or {})
+                         )  # type: Optional[MsgGenericPayload]
+        self._checksum = checksum  # type: Optional[bytes]
+        self._header = None  # type: Optional[bytes]
+
+    @property
+    def payload(self) -> MsgGenericPayload:
+        """
+        Decoded payload, lazily decoded from 'raw' if message was created
+        from bytes
+
+        Message is encoded only once, so payload is read-only mapping (copy
+        of dict given to constructor), which cannot go out of sync with
+        cached encoding. Values in it, e.g. lists of entries, must not be
+        modified either.
+        """
+        if self._payload is None:
+            metrics = Message.METRICS  # type: Optional[Any]
+            if metrics is None:
+                self._payload = _freeze(self.decode_payload(self.raw))
+            else:
+                start = perf_counter()  # type: float
+                self._payload = _freeze(self.decode_payload(self.raw))
+                metrics.decoded(self.command, len(self.raw),
+                                perf_counter() - start)
+        return self._payload
+
+    @property
+    def checksum(self) -> bytes:
+        """
+        Payload checksum, calculated on first access unless it was given
+        """
+        if self._checksum is None:
+            self._checksum = structs.dsha256(self._encoded())[0:4]
+        return self._checksum
 
     def __eq__(self, other) -> bool:
-        return self.__dict__ == other.__dict__
+        return ((self.MAGIC, self.command, self.checksum, self.payload) ==
+                (other.MAGIC, other.command, other.checksum, other.payload))
 
     def __bytes__(self) -> bytes:
-        payload = self.encode_payload(self.payload)  # type: bytes
-        return struct.pack(self.HEADER_FMT, self.MAGIC,
-                           self.command.encode('utf-8'),
-                           len(payload), self.checksum) + payload
+        return b''.join(self.buffers())
 
     def __str__(self) -> str:
         """
@@ -103,7 +237,7 @@ class Message(MessageMeta):
         int
             Message (payload) length
         """
-        return len(self.encode_payload())
+        return len(self._encoded())
 
     @classmethod
     def from_raw(cls, buf: bytes) -> MessageMeta:
@@ -123,7 +257,154 @@ class Message(MessageMeta):
             'Message' object
         """
         parsed = cls.decode(buf)  # type: Dict[str, Any]
-        return cls(**parsed)
+        return cls(magic=parsed['magic'], checksum=parsed['checksum'],
+                   **parsed['payload'])
+
+    @classmethod
+    def parse(cls, buf: structs.Buffer, lazy: bool = False,
+              verify: bool = False) -> MessageMeta:
+        """
+        Create message object of class matching command in header
+
+        Commands which are not registered end up as 'RawMessage'.
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            Raw bytes to interpret as Message
+        lazy : bool
+            whether payload decoding should be deferred until first access
+        verify : bool
+            whether checksum from header should be verified
+
+        Returns
+        -------
+        Message
+            'Message' subclass object
+        """
+        (magic, command, length,
+         checksum) = Message.HEADER.unpack_from(buf)
+        h_len = Message.HEADER.size  # type: int
+        with memoryview(buf) as view:
+            return Message.from_payload(command, view[h_len:h_len + length],
+                                        magic, checksum, lazy, verify)
+
+    @staticmethod
+    def peek_header(buf: structs.Buffer, offset: int = 0,
+                    magic: Optional[int] = None,
+                    max_length: int = Framer.MAX_LENGTH) -> Header:
+        """
+        Unpack and validate message header without touching payload
+
+        Only 24 header bytes are read, so callers deciding by command alone
+        (filters, routers) can skip to 'end' of message or forward
+        'buf[start:end]' untouched, without decoding or hashing payload.
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding message
+        offset : int
+            position of message in buffer
+        magic : int
+            expected magic value, not checked if None (default), so headers
+            of any network can be peeked
+        max_length : int
+            maximum accepted payload length
+
+        Returns
+        -------
+        Header
+            unpacked header
+
+        Raises
+        ------
+        ValueError
+            if header or payload does not fit in buffer, magic does not
+            match or payload is longer than 'max_length'
+        """
+        h_len = Message.HEADER.size  # type: int
+        if offset < 0 or len(buf) - offset < h_len:
+            raise ValueError('truncated header at {0}'.format(offset))
+        (found, command, length,
+         checksum) = Message.HEADER.unpack_from(buf, offset)
+        if magic is not None and found != magic:
+            raise ValueError('wrong magic {0:#010x} at {1}'.format(found,
+                                                                  offset))
+        if length > max_length:
+            raise ValueError('payload of {0!r} too long: {1}'.format(command,
+                                                                    length))
+        if len(buf) - offset - h_len < length:
+            raise ValueError('truncated payload of {0!r} at {1}'.format(
+                                                            command, offset))
+        return Header(found, command, length, checksum, offset)
+
+    @staticmethod
+    def from_payload(command: bytes, payload: structs.Buffer,
+                     magic: Optional[int] = None,
+                     checksum: Optional[bytes] = None, lazy: bool = False,
+                     verify: bool = False) -> MessageMeta:
+        """
+        Create message object from already unpacked header and raw payload
+
+        Lazy messages keep raw payload and decode it on first access to
+        'payload'. Payload is copied into bytes unless it already is bytes,
+        as views passed in (e.g. by 'from_bytes' or 'Framer') are released
+        or reused once this returns.
+
+        Parameters
+        ----------
+        command : bytes
+            Raw, NUL-padded command from header
+        payload : bytes, bytearray, memoryview or mmap
+            Raw payload
+        magic : int
+            Magic value from header
+        checksum : bytes
+            Checksum from header
+        lazy : bool
+            whether payload decoding should be deferred until first access
+        verify : bool
+            whether checksum should be verified, ValueError is raised on
+            mismatch
+
+        Returns
+        -------
+        Message
+            'Message' subclass object
+        """
+        if verify and structs.dsha256(payload)[0:4] != checksum:
+            raise ValueError('checksum mismatch in {0!r} message'.format(
+                                                                    command))
+        msg_cls = Message.REGISTRY.get(command)  # type: Optional[type]
+        if msg_cls is None:
+            return RawMessage(command, bytes(payload), magic=magic,
+                              checksum=checksum)
+        if lazy:
+            msg = msg_cls.__new__(msg_cls)  # type: Message
+            Message.__init__(msg, msg_cls.COMMAND, None, magic, checksum,
+                             raw=bytes(payload))
+            return msg
+        metrics = Message.METRICS  # type: Optional[Any]
+        if metrics is None:
+            return msg_cls(magic=magic, checksum=checksum,
+                           **msg_cls.decode_payload(payload))
+        start = perf_counter()  # type: float
+        msg = msg_cls(magic=magic, checksum=checksum,
+                      **msg_cls.decode_payload(payload))
+        metrics.decoded(msg_cls.COMMAND, len(payload), perf_counter() - start)
+        return msg
+
+    def verify(self) -> bool:
+        """
+        Check whether checksum matches payload
+
+        Returns
+        -------
+        bool
+            True if checksum is valid
+        """
+        return structs.dsha256(self._encoded())[0:4] == self.checksum
 
     @classmethod
     def set_magic(cls, magic: int) -> int:
@@ -146,6 +427,24 @@ class Message(MessageMeta):
         cls.MAGIC = magic
         return cls.MAGIC
 
+    @classmethod
+    def set_metrics(cls, metrics: Optional[Any]) -> Optional[Any]:
+        """
+        Enable or disable recording of decoding and encoding time globally
+
+        Parameters
+        ----------
+        metrics : coinflow.metrics.Metrics
+            metrics to record time in, None disables recording
+
+        Returns
+        -------
+        coinflow.metrics.Metrics
+            Metrics which were set by this method
+        """
+        Message.METRICS = metrics
+        return Message.METRICS
+
     @classmethod
     def set_version(cls, version: int) -> int:
         """
@@ -168,13 +467,15 @@ class Message(MessageMeta):
         return cls.VERSION
 
     @classmethod
-    def decode(cls, buf: bytes) -> Dict[str, Any]:
+    def decode(cls, buf: structs.Buffer) -> Dict[str, Any]:
         """
         Interpret bytes as 'Message' and create dict from it's fields
 
+        Payload is handed to 'decode_payload' as memoryview, without copying.
+
         Parameters
         ----------
-        buf : bytes
+        buf : bytes, bytearray, memoryview or mmap
             Raw bytes to interpret as Message
 
         Returns
@@ -182,25 +483,27 @@ class Message(MessageMeta):
         dict
             dict with fields from interpreted Message
         """
-        h_len = struct.calcsize(cls.HEADER_FMT)  # type: int
+        h_len = cls.HEADER.size  # type: int
         parsed = dict(zip(('magic', 'command', 'length', 'checksum'),
-                      struct.unpack(cls.HEADER_FMT, buf[:h_len])))
-        parsed['payload'] = cls.decode_payload(buf[h_len:])
+                      cls.HEADER.unpack_from(buf)))
+        with memoryview(buf) as view:
+            parsed['payload'] = cls.decode_payload(
+                                    view[h_len:h_len + parsed['length']])
         parsed['command'] = parsed['command'].replace(b'\x00', b'')\
                                              .decode('utf-8')
         return parsed
 
     @classmethod
-    @abstractmethod
-    def decode_payload(cls, payload: bytes) -> MsgGenericPayload:
+    def decode_payload(cls, payload: structs.Buffer) -> MsgGenericPayload:
         """
         Decode payload field of message.
 
-        Overwrite this method in every 'Message' subclass for proper decoding
+        Payload is decoded with 'SCHEMA' of message. Overwrite this method in
+        'Message' subclass if its payload cannot be described by schema.
 
         Parameters
         ----------
-        payload : bytes
+        payload : bytes, bytearray, memoryview or mmap
             Raw payload to decode
 
         Returns
@@ -208,7 +511,7 @@ class Message(MessageMeta):
         dict
             Decoded payload
         """
-        pass
+        return cls.SCHEMA.decode(payload)
 
     def encode(self) -> bytes:
         """
@@ -221,13 +524,48 @@ class Message(MessageMeta):
         """
         return bytes(self)
 
-    @abstractmethod
+    def buffers(self) -> Tuple[bytes, bytes]:
+        """
+        Encoded header and payload
+
+        Both are encoded once and cached, so the same message can be queued
+        for many peers without encoding it again. Whether buffers are copied
+        on write depends on transport, see 'coinflow.network.SendQueue'.
+
+        Returns
+        -------
+        tuple
+            header and payload bytes
+        """
+        payload = self._encoded()  # type: bytes
+        if self._header is None:
+            self._header = self.HEADER.pack(self.MAGIC,
+                                            self.command.encode('utf-8'),
+                                            len(payload), self.checksum)
+        return (self._header, payload)
+
+    def _encoded(self) -> bytes:
+        """
+        Raw payload, encoded from 'payload' on first call and cached
+        """
+        if self.raw is None:
+            metrics = Message.METRICS  # type: Optional[Any]
+            if metrics is None:
+                self.raw = self.encode_payload(self.payload)
+            else:
+                start = perf_counter()  # type: float
+                self.raw = self.encode_payload(self.payload)
+                metrics.encoded(self.command, len(self.raw),
+                                perf_counter() - start)
+        return self.raw
+
     def encode_payload(self,
                        payload: Optional[MsgGenericPayload] = None) -> bytes:
         """
         Encode payload field of message.
 
-        Overwrite this method in every 'Message' subclass for proper encoding
+        Payload is encoded with 'SCHEMA' of message. Overwrite this method in
+        'Message' subclass if its payload cannot be described by schema.
 
         Parameters
         ----------
@@ -239,4 +577,49 @@ class Message(MessageMeta):
         bytes
             encoded payload
         """
-        return b''
+        return self.SCHEMA.encode(payload or self.payload)
+
+
+class RawMessage(Message):
+    """
+    Opaque message with command unknown to coinflow
+
+    Payload is kept as-is under 'raw' key, so message can be forwarded or
+    stored without decoding.
+    """
+
+    def __init__(self, command: Union[str, bytes], raw: bytes = b'',
+                 *args, **kwargs) -> None:
+        """
+        Constructor for 'RawMessage' class.
+
+        Parameters
+        ----------
+        command : str or bytes
+            Name of command, raw NUL-padded bytes are accepted as well
+        raw : bytes
+            Undecoded payload
+
+        Returns
+        -------
+        RawMessage
+            'RawMessage' object
+        """
+        if isinstance(command, bytes):
+            command = command.rstrip(b'\x00').decode('ascii', 'replace')
+        super(RawMessage, self).__init__(command, None, *args, raw=raw,
+                                         **kwargs)
+
+    @classmethod
+    def decode_payload(cls, payload: structs.Buffer) -> MsgGenericPayload:
+        """
+        Keep payload undecoded, as bytes under 'raw' key
+        """
+        return {'raw': bytes(payload)}
+
+    def encode_payload(self,
+                       payload: Optional[MsgGenericPayload] = None) -> bytes:
+        """
+        Return undecoded payload
+        """
+        return (payload or self.payload)['raw']
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import struct
+
+from operator import attrgetter, itemgetter
+from typing import (Any, Callable, Dict, List, NamedTuple, Optional, Sequence,
+                    Tuple)
+
+import coinflow.protocol.structs as structs
+
+Field = NamedTuple('Field', (('name', str), ('kind', Any),
+                             ('decode', Optional[Callable[[Any], Any]]),
+                             ('encode', Optional[Callable[[Any], Any]])))
+Field.__new__.__defaults__ = (None, None)
+"""
+Single payload field
+
+Kind is either struct format of fixed-size field (e.g. 'L', '?', '32s'),
+'Struct' subclass, nested 'Schema' or 'Array'. Optional 'decode' and 'encode'
+functions convert value after decoding and before encoding.
+"""
+
+Decoder = Callable[[structs.Buffer, int, List[Any]], int]
+Encoder = Callable[[Any, List[bytes]], None]
+
+
+class Array(object):
+    """
+    Array of items of single kind prefixed with varint count
+    """
+
+    def __init__(self, kind: Any, limit: Optional[int] = None) -> None:
+        """
+        Constructor for 'Array' class.
+
+        Parameters
+        ----------
+        kind : str, Struct, Schema
+            kind of array items, same as in 'Field'
+        limit : int
+            maximum number of items accepted while decoding
+        """
+        self.kind = kind  # type: Any
+        self.limit = limit  # type: Optional[int]
+
+
+class Schema(object):
+    """
+    Declarative layout of message payload compiled to encoder and decoder
+
+    Consecutive fixed-size fields are merged into single precompiled
+    'struct.Struct', every other field gets its own step. Steps are built once
+    per schema, so decoding and encoding never parse format strings again.
+    """
+
+    def __init__(self, *fields: Sequence[Any],
+                 record: Optional[Callable[..., Any]] = None) -> None:
+        """
+        Constructor for 'Schema' class.
+
+        Parameters
+        ----------
+        *fields
+            'Field' objects or tuples with 'Field' arguments, in wire order
+        record : callable
+            type of decoded value (e.g. NamedTuple) called with field values
+            in order, dict is used if not given
+        """
+        self.fields = tuple(Field(*f)
+                            for f in fields)  # type: Tuple[Field, ...]
+        self.names = tuple(f.name
+                           for f in self.fields)  # type: Tuple[str, ...]
+        self.record = record  # type: Optional[Callable[..., Any]]
+        self._decoders = list()  # type: List[Decoder]
+        self._encoders = list()  # type: List[Encoder]
+        self._compile()
+
+    def decode_from(self, buf: structs.Buffer,
+                    offset: int = 0) -> Tuple[Any, int]:
+        """
+        Decode payload from buffer starting at given offset
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding payload
+        offset : int
+            position of payload in buffer
+
+        Returns
+        -------
+        tuple
+            decoded payload (dict or record) and offset of first byte after it
+        """
+        values = list()  # type: List[Any]
+        for decoder in self._decoders:
+            offset = decoder(buf, offset, values)
+        if self.record is None:
+            return dict(zip(self.names, values)), offset
+        return self.record(*values), offset
+
+    def decode(self, buf: structs.Buffer) -> Any:
+        """
+        Decode payload from buffer
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding payload
+
+        Returns
+        -------
+        dict or record
+            decoded payload
+        """
+        return self.decode_from(buf)[0]
+
+    def encode(self, payload: Any) -> bytes:
+        """
+        Encode payload to bytes
+
+        Parameters
+        ----------
+        payload : dict or record
+            payload to encode
+
+        Returns
+        -------
+        bytes
+            encoded payload
+        """
+        out = list()  # type: List[bytes]
+        for encoder in self._encoders:
+            encoder(payload, out)
+        return b''.join(out)
+
+    def _compile(self) -> None:
+        getter = attrgetter if self.record is not None else itemgetter
+        group = list()  # type: List[Field]
+        for f in self.fields:
+            if isinstance(f.kind, str):
+                group.append(f)
+                continue
+            if group:
+                self._compile_fixed(group, getter)
+                group = list()
+            (decode, encode) = _codec(f.kind)
+            self._decoders.append(_decoder(decode, f.decode))
+            self._encoders.append(_encoder(encode, f.encode, getter(f.name)))
+        if group:
+            self._compile_fixed(group, getter)
+
+    def _compile_fixed(self, group: List[Field], getter: Callable) -> None:
+        s = struct.Struct('<' + ''.join(f.kind for f in group))
+        size = s.size  # type: int
+        convert = [(i, f.decode) for (i, f) in enumerate(group)
+                   if f.decode is not None]
+        prepare = [(getter(f.name), f.encode) for f in group]
+
+        def decode(buf: structs.Buffer, offset: int, values: List[Any]) -> int:
+            unpacked = s.unpack_from(buf, offset)
+            if convert:
+                unpacked = list(unpacked)
+                for (i, fn) in convert:
+                    unpacked[i] = fn(unpacked[i])
+            values.extend(unpacked)
+            return offset + size
+
+        def encode(payload: Any, out: List[bytes]) -> None:
+            out.append(s.pack(*[get(payload) if fn is None
+                                else fn(get(payload))
+                                for (get, fn) in prepare]))
+
+        self._decoders.append(decode)
+        self._encoders.append(encode)
+
+
+def _codec(kind: Any) -> Tuple[Callable[[structs.Buffer, int],
+                                        Tuple[Any, int]],
+                               Callable[[Any], bytes]]:
+    """
+    Find 'decode_from' and 'encode' functions of single value of given kind
+    """
+    if isinstance(kind, str):
+        s = struct.Struct('<' + kind)
+
+        def decode_fixed(buf: structs.Buffer,
+                         offset: int) -> Tuple[Any, int]:
+            return s.unpack_from(buf, offset)[0], offset + s.size
+
+        return decode_fixed, s.pack
+    if isinstance(kind, Array):
+        return _array_codec(kind)
+    if isinstance(kind, Schema):
+        return kind.decode_from, kind.encode
+    if isinstance(kind, type) and issubclass(kind, structs.Struct):
+        # Struct.encode only reads fields of value, so plain int, str,
+        # datetime or NamedTuple can be encoded without wrapping it first
+        return kind.decode_from, kind.encode
+    raise TypeError('unsupported field kind: {0!r}'.format(kind))
+
+
+def _array_codec(array: Array) -> Tuple[Callable[[structs.Buffer, int],
+                                                 Tuple[Any, int]],
+                                        Callable[[Any], bytes]]:
+    (decode_item, encode_item) = _codec(array.kind)
+    decode_items = _bulk_decoder(array.kind, decode_item)
+    encode_items = getattr(array.kind, 'encode_many', None)
+    limit = array.limit  # type: Optional[int]
+    decode_count = structs.Varint.decode_from
+
+    def decode(buf: structs.Buffer, offset: int) -> Tuple[List[Any], int]:
+        (count, offset) = decode_count(buf, offset)
+        if limit is not None and count > limit:
+            raise ValueError('array of {0} items exceeds limit {1}'.format(
+                                                            int(count), limit))
+        return decode_items(buf, offset, int(count))
+
+    def encode(items: Sequence[Any]) -> bytes:
+        out = [structs.Varint.encode(len(items))]  # type: List[bytes]
+        if encode_items is not None:
+            out.append(encode_items(items))
+        else:
+            out.extend(encode_item(item) for item in items)
+        return b''.join(out)
+
+    return decode, encode
+
+
+def _bulk_decoder(kind: Any,
+                  decode_item: Callable[[structs.Buffer, int],
+                                        Tuple[Any, int]]
+                  ) -> Callable[[structs.Buffer, int, int],
+                                Tuple[List[Any], int]]:
+    """
+    Find function decoding given number of consecutive items of given kind
+
+    Fixed-size items are unpacked in single pass and varints or varstrs are
+    decoded with their 'decode_many', so no per-item wrappers are created.
+    """
+    if isinstance(kind, str):
+        s = struct.Struct('<' + kind)
+
+        def decode_fixed(buf: structs.Buffer, offset: int,
+                         count: int) -> Tuple[List[Any], int]:
+            end = offset + count * s.size  # type: int
+            if end > len(buf):
+                raise ValueError('array exceeds buffer by {0} bytes'.format(
+                                                            end - len(buf)))
+            with memoryview(buf) as view:
+                items = [v for (v,) in s.iter_unpack(view[offset:end])]
+            return items, end
+
+        return decode_fixed
+    decode_many = getattr(kind, 'decode_many', None)
+    if decode_many is not None:
+        return decode_many
+
+    def decode_each(buf: structs.Buffer, offset: int,
+                    count: int) -> Tuple[List[Any], int]:
+        items = list()  # type: List[Any]
+        for _ in range(count):
+            (item, offset) = decode_item(buf, offset)
+            items.append(item)
+        return items, offset
+
+    return decode_each
+
+
+def _decoder(decode: Callable[[structs.Buffer, int], Tuple[Any, int]],
+             convert: Optional[Callable[[Any], Any]]) -> Decoder:
+    def decoder(buf: structs.Buffer, offset: int, values: List[Any]) -> int:
+        (value, offset) = decode(buf, offset)
+        values.append(value if convert is None else convert(value))
+        return offset
+
+    return decoder
+
+
+def _encoder(encode: Callable[[Any], bytes],
+             convert: Optional[Callable[[Any], Any]],
+             get: Callable[[Any], Any]) -> Encoder:
+    def encoder(payload: Any, out: List[bytes]) -> None:
+        value = get(payload)
+        out.append(encode(value if convert is None else convert(value)))
+
+    return encoder
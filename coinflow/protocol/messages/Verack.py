@@ -13,6 +13,9 @@ class Verack(Message):
        https://en.bitcoin.it/wiki/Protocol_documentation#verack
     """
 
+    COMMAND = 'verack'  # type: str
+    """Command of message"""
+
     def __init__(self, *args, **kwargs) -> None:
         """
         Constructor for 'Verack' class.
@@ -22,7 +25,7 @@ class Verack(Message):
         Verack
             'Verack' object
         """
-        super(Verack, self).__init__('verack', None, *args, **kwargs)
+        super(Verack, self).__init__(self.COMMAND, None, *args, **kwargs)
 
     @classmethod
     def decode_payload(cls, payload: bytes) -> MsgGenericPayload:
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+from .Message import Header, Message, RawMessage
 from .Version import Version
 from .Verack import Verack
 from .Addr import Addr
+from .GetAddr import GetAddr
+from .Inv import Inv, GetData
 
-__all__ = ['Version', 'Verack', 'Addr']
+__all__ = ['Header', 'Message', 'RawMessage', 'Version', 'Verack', 'Addr',
+           'GetAddr', 'Inv', 'GetData']
@@ -4,11 +4,14 @@
 import struct
 from socket import inet_aton, inet_ntoa
 
-from typing import NamedTuple
-from .Struct import Struct
+from typing import NamedTuple, Tuple
+from .Struct import Struct, Buffer
 
 Payload = NamedTuple('Payload', (('ip', str), ('port', int), ('services', int)))
 
+_SERVICES = struct.Struct('<Q12x')  # type: struct.Struct
+_ADDRESS = struct.Struct('>4sH')  # type: struct.Struct
+
 
 class Netaddr(Payload, Struct):
     """
@@ -61,3 +64,24 @@ class Netaddr(Payload, Struct):
         ip = inet_ntoa(addr)  # type: interpret
         
         return Payload(ip=ip, port=port, services=services)
+
+    @classmethod
+    def decode_from(cls, buf: Buffer, offset: int = 0) -> Tuple[object, int]:
+        """
+        Decode netaddr from buffer starting at given offset
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding netaddr structure
+        offset : int
+            position of netaddr in buffer
+
+        Returns
+        -------
+        tuple
+            'Netaddr' object and offset of first byte after it
+        """
+        services = _SERVICES.unpack_from(buf, offset)[0]  # type: int
+        (ip, port) = _ADDRESS.unpack_from(buf, offset + 20)  # type: bytes, int
+        return cls(inet_ntoa(ip), port, services), offset + 26
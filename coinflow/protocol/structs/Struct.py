@@ -2,20 +2,23 @@
 # -*- coding: utf-8 -*-
 
 from abc import ABCMeta, abstractmethod
-from typing import NamedTuple, List, Callable, Any
+from mmap import mmap
+from typing import NamedTuple, List, Callable, Any, Tuple, Union
+
+Buffer = Union[bytes, bytearray, memoryview, mmap]
+"""Any object supporting buffer protocol"""
 
 class Struct(metaclass=ABCMeta):
     __slots__ = []
 
     def __eq__(self, other) -> bool:
-        assert type(self) == type(other)
-
-        res = True
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(getattr(self, item) == getattr(other, item)
+                   for item in self.__slots__)
 
-        for item in self.__slots__:
-            res &= (self.item == other.item)
-            
-        return res
+    def __hash__(self) -> int:
+        return hash(tuple(getattr(self, item) for item in self.__slots__))
 
     def __bytes__(self) -> bytes:
         return self.encode()
@@ -62,6 +65,28 @@ class Struct(metaclass=ABCMeta):
         """
         pass
 
+    @classmethod
+    @abstractmethod
+    def decode_from(cls, buf: Buffer, offset: int = 0) -> Tuple[Any, int]:
+        """
+        Decode object from buffer starting at given offset
+
+        Buffer is not copied, so it may be a view of bigger message.
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding structure to decode
+        offset : int
+            position of structure in buffer
+
+        Returns
+        -------
+        tuple
+            decoded object and offset of first byte after it
+        """
+        pass
+
     @classmethod
     def from_raw(cls, buf: bytes) -> object:
         """
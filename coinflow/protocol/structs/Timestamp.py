@@ -1,48 +1,104 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import struct
+import sys
+
+from array import array
 from datetime import datetime, timezone, timedelta
-from typing import Optional, NamedTuple
-from .Struct import Struct
+from typing import Any, Iterable, List, Optional, NamedTuple, Tuple
+from .Struct import Struct, Buffer
+
+try:
+    import numpy
+except ImportError:  # optional, installed with 'analysis' extra
+    numpy = None
 
 Payload = NamedTuple('Payload', (('year', int), ('month', int), ('day', int),
-                                 ('hour', int), ('minute', int), 
+                                 ('hour', int), ('minute', int),
                                  ('second', int)))
 
-class Timestamp(datetime, Struct):
+_UINT32 = struct.Struct('<L')  # type: struct.Struct
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)  # type: datetime
+
+
+class Timestamp(int, Struct):
     """
     Timestamp structure for use in Bitcoin protocol messages
 
-    TODO: fix reference
+    Timestamp is plain integer number of seconds since Unix epoch, which is
+    what protocol carries, so decoding costs as much as decoding any other
+    integer. Timezone-aware 'datetime' is built only when asked for with
+    'todatetime'. Timestamp compares and hashes as the integer it is, so
+    it is never equal to 'datetime' (which cannot be equal to the integer
+    as well); compare result of 'todatetime' instead. Arithmetic with
+    'datetime' and 'timedelta' objects is supported for convenience.
+
     .. Network address structure in Bitcoin wiki:
        https://en.bitcoin.it/wiki/Protocol_documentation#Network_address
     """
-    def __new__(cls, *args, **kwargs): 
+
+    __slots__ = ()
+
+    def __new__(cls, *args, **kwargs):
         """
         Constructor for 'Timestamp' class
 
-        All dates are considered UTC and are stripped of microseconds. 
+        Accepts number of seconds since epoch, 'datetime' object, or the
+        same arguments as 'datetime'. All dates are considered UTC and are
+        stripped of microseconds.
         """
-        self = datetime.__new__(cls, *args, **kwargs)
-        if self.tzinfo is None or self.tzinfo.utcoffset(self) is None:
-            self = self.replace(tzinfo=timezone.utc)
-        self = self.replace(microsecond=0).astimezone(timezone.utc)
-        return self
+        if len(args) == 1 and not kwargs:
+            value = args[0]  # type: Any
+            if isinstance(value, datetime):
+                return cls.fromdatetime(value)
+            return super(Timestamp, cls).__new__(cls, int(value))
+        return cls.fromdatetime(datetime(*args, **kwargs))
 
-    def __len__(self):
+    def __len__(self) -> int:
         return 4
 
-    def __add__(self, other: timedelta) -> object:
-        dt = super().__add__(other)  # type: datetime
-        return self.fromdatetime(dt)
+    def __str__(self) -> str:
+        return str(self.todatetime())
+
+    def __repr__(self) -> str:
+        return 'Timestamp({0})'.format(int(self))
+
+    def __add__(self, other: Any) -> Any:
+        if isinstance(other, timedelta):
+            return Timestamp(int(self) + int(other.total_seconds()))
+        return int(self) + other
+
+    __radd__ = __add__
 
-    def __radd__(self, other: timedelta) -> object:
-        dt = super().__radd__(other)  # type: datetime
-        return self.fromdatetime(dt)
+    def __sub__(self, other: Any) -> Any:
+        if isinstance(other, timedelta):
+            return Timestamp(int(self) - int(other.total_seconds()))
+        if isinstance(other, Timestamp):
+            return timedelta(seconds=int(self) - int(other))
+        if isinstance(other, datetime):
+            return self.todatetime() - other
+        return int(self) - other
 
-    def __sub__(self, other: timedelta) -> object:
-        dt = super().__sub__(other)  # type: datetime
-        return self.fromdatetime(dt)
+    def __reduce__(self) -> Tuple[type, Tuple[int]]:
+        return (Timestamp, (int(self),))
+
+    def timestamp(self) -> int:
+        """
+        Number of seconds since Unix epoch, same as in 'datetime'
+        """
+        return int(self)
+
+    def todatetime(self) -> datetime:
+        """
+        Convert to timezone-aware 'datetime'
+
+        Returns
+        -------
+        datetime
+            the same moment in UTC
+        """
+        return _EPOCH + timedelta(seconds=int(self))
 
     @classmethod
     def fromdatetime(cls, dt: datetime) -> object:
@@ -52,14 +108,36 @@ class Timestamp(datetime, Struct):
         Parameters
         ----------
         dt : datetime
-            reference datetime
+            reference datetime, naive one is considered UTC
 
         Returns
         -------
         Timestamp
             datetime converted to Timestamp
         """
-        return cls(dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
+        if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return int.__new__(cls, (dt - _EPOCH) // timedelta(seconds=1))
+
+    @classmethod
+    def fromtimestamp(cls, ts: float,
+                      tz: Optional[timezone] = None) -> object:
+        """
+        Create Timestamp from number of seconds since epoch, as 'datetime'
+
+        Parameters
+        ----------
+        ts : float
+            seconds since Unix epoch
+        tz : timezone
+            ignored, kept for compatibility with 'datetime'
+
+        Returns
+        -------
+        Timestamp
+            'Timestamp' object
+        """
+        return cls(ts)
 
     def encode(self) -> bytes:
         """
@@ -70,23 +148,141 @@ class Timestamp(datetime, Struct):
         bytes
             encoded message
         """
-        return int(self.timestamp())
+        return _UINT32.pack(self)
 
     @classmethod
     def decode(cls, s: bytes) -> Payload:
         """
-        Decode varstr from bytes
+        Decode timestamp from bytes
 
         Parameters
         ----------
-        n : bytes
-            netaddr structure to decode
+        s : bytes
+            timestamp structure to decode
 
         Returns
         -------
         NamedTuple (Payload)
             NamedTuple with all parsed fields
         """
-        dt = datetime.fromtimestamp(int(s))
+        dt = cls(_UINT32.unpack(s)[0]).todatetime()  # type: datetime
         return Payload(dt.year, dt.month, dt.day,
                        dt.hour, dt.minute, dt.second)
+
+    @classmethod
+    def decode_from(cls, buf: Buffer, offset: int = 0) -> Tuple[object, int]:
+        """
+        Decode timestamp from buffer starting at given offset
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding timestamp structure
+        offset : int
+            position of timestamp in buffer
+
+        Returns
+        -------
+        tuple
+            'Timestamp' object and offset of first byte after it
+        """
+        return cls(_UINT32.unpack_from(buf, offset)[0]), offset + 4
+
+    @staticmethod
+    def encode_many(values: Iterable[int]) -> bytes:
+        """
+        Encode many timestamps at once
+
+        Parameters
+        ----------
+        values : iterable
+            seconds since epoch, e.g. 'Timestamp' objects or array
+
+        Returns
+        -------
+        bytes
+            concatenated 4-byte timestamps
+        """
+        epochs = array('I', values)  # type: array
+        if sys.byteorder != 'little':
+            epochs.byteswap()
+        return epochs.tobytes()
+
+    @staticmethod
+    def decode_many(buf: Buffer, offset: int = 0,
+                    count: Optional[int] = None) -> Tuple[array, int]:
+        """
+        Decode many consecutive timestamps at once
+
+        Timestamps are returned as uint32 array of seconds since epoch,
+        without creating any per-item objects; see 'todatetimes' and
+        'todatetime64' for conversion.
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding timestamps
+        offset : int
+            position of the first timestamp in buffer
+        count : int
+            number of timestamps to decode, all remaining if not given
+
+        Returns
+        -------
+        tuple
+            array of timestamps and offset of first byte after them
+        """
+        if count is None:
+            count = (len(buf) - offset) // 4
+        end = offset + count * 4  # type: int
+        if end > len(buf):
+            raise ValueError('timestamps exceed buffer by {0} bytes'.format(
+                                                            end - len(buf)))
+        epochs = array('I')  # type: array
+        with memoryview(buf) as view:
+            epochs.frombytes(view[offset:end])
+        if sys.byteorder != 'little':
+            epochs.byteswap()
+        return epochs, end
+
+    @staticmethod
+    def todatetimes(epochs: Iterable[int]) -> List[datetime]:
+        """
+        Convert many timestamps to timezone-aware 'datetime' objects
+
+        Parameters
+        ----------
+        epochs : iterable
+            seconds since epoch, e.g. array from 'decode_many'
+
+        Returns
+        -------
+        list
+            'datetime' objects in UTC
+        """
+        return [_EPOCH + timedelta(seconds=s) for s in epochs]
+
+    @staticmethod
+    def todatetime64(epochs: Iterable[int]) -> Any:
+        """
+        Convert many timestamps to NumPy 'datetime64[s]' array at once
+
+        Parameters
+        ----------
+        epochs : iterable
+            seconds since epoch, e.g. array from 'decode_many', which is
+            read without copying
+
+        Returns
+        -------
+        numpy.ndarray
+            'datetime64[s]' values in UTC
+        """
+        if numpy is None:
+            raise ImportError('datetime64 conversion requires numpy')
+        if isinstance(epochs, array) and epochs.typecode == 'I':
+            seconds = numpy.frombuffer(epochs, dtype=numpy.uint32) \
+                if len(epochs) else numpy.zeros(0, dtype=numpy.uint32)
+        else:
+            seconds = numpy.fromiter(epochs, dtype=numpy.int64)
+        return seconds.astype('datetime64[s]')
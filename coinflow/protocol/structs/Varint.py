@@ -3,11 +3,15 @@
 
 import struct
 
-from typing import NamedTuple
-from .Struct import Struct
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from .Struct import Struct, Buffer
 
 Payload = NamedTuple('Payload', (('value', int), ('length', int)))
 
+_UINT16 = struct.Struct('<H')  # type: struct.Struct
+_UINT32 = struct.Struct('<L')  # type: struct.Struct
+_UINT64 = struct.Struct('<Q')  # type: struct.Struct
+
 
 class Varint(int, Struct):
     """
@@ -17,6 +21,14 @@ class Varint(int, Struct):
     .. Network address structure in Bitcoin wiki:
        https://en.bitcoin.it/wiki/Protocol_documentation#Network_address
     """
+
+    UINT16 = _UINT16  # type: struct.Struct
+    """Precompiled value following 0xfd prefix"""
+    UINT32 = _UINT32  # type: struct.Struct
+    """Precompiled value following 0xfe prefix"""
+    UINT64 = _UINT64  # type: struct.Struct
+    """Precompiled value following 0xff prefix"""
+
     def __new__(cls, value: int, *args, **kwargs):
         return super(Varint, cls).__new__(cls, int(value))
 
@@ -182,3 +194,102 @@ class Varint(int, Struct):
             return Payload(struct.unpack('<L', n[1:5])[0], 5)
         else:
             return Payload(struct.unpack('<Q', n[1:9])[0], 7)
+
+    @classmethod
+    def decode_from(cls, buf: Buffer, offset: int = 0) -> Tuple[object, int]:
+        """
+        Decode varint from buffer starting at given offset
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding varint structure
+        offset : int
+            position of varint in buffer
+
+        Returns
+        -------
+        tuple
+            'Varint' object and offset of first byte after it
+        """
+        n0 = buf[offset]  # type: int
+        if n0 < 0xfd:
+            return cls(n0), offset + 1
+        elif n0 == 0xfd:
+            return cls(_UINT16.unpack_from(buf, offset + 1)[0]), offset + 3
+        elif n0 == 0xfe:
+            return cls(_UINT32.unpack_from(buf, offset + 1)[0]), offset + 5
+        else:
+            return cls(_UINT64.unpack_from(buf, offset + 1)[0]), offset + 9
+
+    @staticmethod
+    def encode_many(values: Iterable[int]) -> bytes:
+        """
+        Encode many integers as consecutive varints
+
+        Parameters
+        ----------
+        values : iterable
+            integers to encode
+
+        Returns
+        -------
+        bytes
+            encoded varints
+        """
+        out = bytearray()  # type: bytearray
+        for n in values:
+            if n < 0xfd:
+                out.append(n)
+            elif n < 0xffff:
+                out.append(0xfd)
+                out += _UINT16.pack(n)
+            elif n < 0xffffffff:
+                out.append(0xfe)
+                out += _UINT32.pack(n)
+            else:
+                out.append(0xff)
+                out += _UINT64.pack(n)
+        return bytes(out)
+
+    @staticmethod
+    def decode_many(buf: Buffer, offset: int = 0,
+                    count: Optional[int] = None) -> Tuple[List[int], int]:
+        """
+        Decode consecutive varints from buffer as plain integers
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding varints
+        offset : int
+            position of first varint in buffer
+        count : int
+            number of varints to decode, all till the end of buffer if not
+            given
+
+        Returns
+        -------
+        tuple
+            list of integers and offset of first byte after last varint
+        """
+        values = list()  # type: List[int]
+        append = values.append
+        end = len(buf)  # type: int
+        left = -1 if count is None else count  # type: int
+        while left and (count is not None or offset < end):
+            n0 = buf[offset]  # type: int
+            if n0 < 0xfd:
+                append(n0)
+                offset += 1
+            elif n0 == 0xfd:
+                append(_UINT16.unpack_from(buf, offset + 1)[0])
+                offset += 3
+            elif n0 == 0xfe:
+                append(_UINT32.unpack_from(buf, offset + 1)[0])
+                offset += 5
+            else:
+                append(_UINT64.unpack_from(buf, offset + 1)[0])
+                offset += 9
+            left -= 1
+        return values, offset
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import codecs
 import struct
 
-from typing import NamedTuple
-from .Struct import Struct
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from .Struct import Struct, Buffer
 from .Varint import Varint
 
 Payload = NamedTuple('Payload', (('content', str), ('length', Varint)))
@@ -14,11 +16,26 @@ class Varstr(str, Struct):
     """
     Variable length string structure for use in Bitcoin protocol messages
 
+    Encoded form is kept in the object, set once on creation. Short
+    strings decoded with default encoding are interned: decoding the same
+    bytes again (e.g. user agent of another peer) returns the same object,
+    found with single cache lookup instead of decoding and allocating new
+    string. Size of interning cache is changed with 'set_intern_size'.
+
     TODO: fix reference
     .. Network address structure in Bitcoin wiki:
        https://en.bitcoin.it/wiki/Protocol_documentation#Network_address
     """
-    def __new__(cls, content: str, **kwargs) -> None:
+
+    __slots__ = ('_encoded',)
+
+    INTERN_SIZE = 1024  # type: int
+    """Number of distinct decoded strings kept in interning cache"""
+    INTERN_LENGTH = 256  # type: int
+    """Longest string, in bytes, which is interned"""
+
+    def __new__(cls, content: str, encoded: Optional[bytes] = None,
+                **kwargs) -> None:
         """
         Constructor for 'Varstr' class
 
@@ -26,11 +43,21 @@ class Varstr(str, Struct):
         ----------
         s: str
             String to encode
+        encoded : bytes
+            complete encoding of string, with length prefix, if it is known
         """
-        return super(Varstr, cls).__new__(cls, content)
-    
+        self = super(Varstr, cls).__new__(cls, content)
+        if encoded is None:
+            s = str.encode(self)  # type: bytes
+            encoded = Varint.encode(len(s)) + s
+        Varstr._encoded.__set__(self, encoded)
+        return self
+
     def __len__(self) -> int:
-        return len(self.encode())
+        return len(self._encoded)
+
+    def __reduce__(self) -> Tuple[type, Tuple[str]]:
+        return (self.__class__, (str(self),))
 
     def encode(self, *args, **kwargs) -> bytes:
         """
@@ -49,8 +76,11 @@ class Varstr(str, Struct):
         bytes
             encoded message
         """
-        s = str(self)  # type: str
-        return Varint(len(s)).encode() + s.encode(*args, **kwargs)
+        if args or kwargs or not isinstance(self, Varstr):
+            # Struct.encode may be called with plain string too
+            s = str.encode(self, *args, **kwargs)  # type: bytes
+            return Varint.encode(len(s)) + s
+        return self._encoded
 
     @classmethod
     def decode(cls, s: bytes, *args, **kwargs) -> Payload:
@@ -73,5 +103,148 @@ class Varstr(str, Struct):
         NamedTuple (Payload)
             NamedTuple with all parsed fields (s, len)
         """
-        l = Varint(len(s))  # type: Varint
-        return Payload(s[len(l):len(l)+int(l)].decode(*args, **kwargs), l)
+        (content, end) = cls.decode_from(s, 0, *args, **kwargs)
+        return Payload(str(content), Varint(end))
+
+    @classmethod
+    def decode_from(cls, buf: Buffer, offset: int = 0,
+                    *args, **kwargs) -> Tuple[object, int]:
+        """
+        Decode varstr from buffer starting at given offset
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding varstr structure
+        offset : int
+            position of varstr in buffer
+        *args
+            arguments to pass to codecs.decode() function when decoding string
+        **kwargs
+            keyword arguments to pass to codecs.decode() function when
+            decoding string
+
+        Returns
+        -------
+        tuple
+            'Varstr' object and offset of first byte after it
+        """
+        (length, start) = Varint.decode_from(buf, offset)  # type: Varint, int
+        end = start + int(length)  # type: int
+        if end > len(buf):
+            raise ValueError('varstr exceeds buffer by {0} bytes'.format(
+                                                            end - len(buf)))
+        with memoryview(buf) as view:
+            if cls is Varstr and not (args or kwargs) and \
+                    end - start <= cls.INTERN_LENGTH:
+                return _intern(bytes(view[offset:end]), start - offset), end
+            content = codecs.decode(view[start:end],
+                                    *args, **kwargs)  # type: str
+        return cls(content), end
+
+    @classmethod
+    def set_intern_size(cls, size: int) -> int:
+        """
+        Change number of decoded strings kept in interning cache globally
+
+        Cache is emptied.
+
+        Parameters
+        ----------
+        size : int
+            number of distinct strings to keep, 0 disables interning
+
+        Returns
+        -------
+        int
+            size which was set by this method
+        """
+        global _intern
+        Varstr.INTERN_SIZE = size
+        _intern = lru_cache(maxsize=size)(_intern.__wrapped__)
+        return Varstr.INTERN_SIZE
+
+    @staticmethod
+    def encode_many(values: Iterable[str], encoding: str = 'utf-8') -> bytes:
+        """
+        Encode many strings as consecutive varstrs
+
+        Parameters
+        ----------
+        values : iterable
+            strings to encode
+        encoding : str
+            encoding of strings
+
+        Returns
+        -------
+        bytes
+            encoded varstrs
+        """
+        out = bytearray()  # type: bytearray
+        for v in values:
+            b = v.encode(encoding)  # type: bytes
+            out += Varint.encode(len(b))
+            out += b
+        return bytes(out)
+
+    @staticmethod
+    def decode_many(buf: Buffer, offset: int = 0,
+                    count: Optional[int] = None,
+                    encoding: str = 'utf-8') -> Tuple[List[str], int]:
+        """
+        Decode consecutive varstrs from buffer as plain strings
+
+        Parameters
+        ----------
+        buf : bytes, bytearray, memoryview or mmap
+            buffer holding varstrs
+        offset : int
+            position of first varstr in buffer
+        count : int
+            number of varstrs to decode, all till the end of buffer if not
+            given
+        encoding : str
+            encoding of strings
+
+        Returns
+        -------
+        tuple
+            list of strings and offset of first byte after last varstr
+        """
+        values = list()  # type: List[str]
+        append = values.append
+        end = len(buf)  # type: int
+        left = -1 if count is None else count  # type: int
+        (uint16, uint32, uint64) = (Varint.UINT16, Varint.UINT32,
+                                    Varint.UINT64)
+        with memoryview(buf) as view:
+            while left and (count is not None or offset < end):
+                n = view[offset]  # type: int
+                if n < 0xfd:
+                    offset += 1
+                elif n == 0xfd:
+                    n = uint16.unpack_from(view, offset + 1)[0]
+                    offset += 3
+                elif n == 0xfe:
+                    n = uint32.unpack_from(view, offset + 1)[0]
+                    offset += 5
+                else:
+                    n = uint64.unpack_from(view, offset + 1)[0]
+                    offset += 9
+                if offset + n > end:
+                    raise ValueError('varstr exceeds buffer by {0} bytes'
+                                     .format(offset + n - end))
+                append(str(view[offset:offset + n], encoding))
+                offset += n
+                left -= 1
+        return values, offset
+
+
+@lru_cache(maxsize=Varstr.INTERN_SIZE)
+def _intern(encoded: bytes, start: int) -> Varstr:
+    """
+    Create varstr from its complete encoding, with length prefix of 'start'
+    bytes, keeping the encoding for later use
+    """
+    return Varstr(str(encoded[start:], 'utf-8'), encoded)
@@ -3,6 +3,7 @@
 
 from hashlib import sha256
 
+from .Struct import Struct, Buffer
 from .Varint import Varint
 from .Varstr import Varstr
 from .Netaddr import Netaddr
@@ -24,4 +25,5 @@ def dsha256(p: bytes) -> bytes:
     """
     return sha256(sha256(p).digest()).digest()
 
-__all__ = ['dsha256', 'Varint', 'Varstr', 'Netaddr', 'Timestamp']
+__all__ = ['dsha256', 'Struct', 'Buffer', 'Varint', 'Varstr', 'Netaddr',
+           'Timestamp']
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+from array import array
+from hashlib import sha256
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+Sighting = NamedTuple('Sighting', (('peer', int), ('time', int),
+                                   ('rank', int), ('count', int)))
+"""
+First announcement of hash: peer id, monotonic time in nanoseconds, arrival
+rank among all indexed hashes and number of announcements so far
+"""
+Announcements = NamedTuple('Announcements', (('ranks', array),
+                                             ('peers', array),
+                                             ('times', array)))
+"""
+Columns of logged announcements: arrival rank of hash, peer id and time in
+nanoseconds
+"""
+
+
+def monotonic_ns() -> int:
+    """
+    Monotonic time in nanoseconds
+    """
+    return int(time.monotonic() * 1e9)
+
+
+class _Table(object):
+    """
+    Open-addressing table of sightings stored in flat arrays
+
+    Keys come from remote peers, which can pick them freely, so slot is
+    taken from SHA-256 of key prefixed with secret of 'FirstSeen' instance
+    instead of from key itself; otherwise keys crafted to share low bits
+    would turn every lookup into linear scan of the table. Slot is empty
+    when its peer is 'EMPTY'. Table only grows, whole table is dropped at
+    once by 'FirstSeen'.
+    """
+
+    EMPTY = 0xffffffff  # type: int
+    """Peer id marking empty slot"""
+
+    def __init__(self, size: int, started: int, secret: bytes) -> None:
+        self.started = started  # type: int
+        self.secret = secret  # type: bytes
+        self.used = 0  # type: int
+        self.resize(size)
+
+    def hash(self, key: bytes) -> int:
+        return int.from_bytes(sha256(self.secret + key).digest()[:8],
+                              'little')
+
+    def find(self, key: bytes, h: Optional[int] = None) -> int:
+        keys = self.keys  # type: bytearray
+        peers = self.peers  # type: array
+        mask = self.mask  # type: int
+        i = (self.hash(key) if h is None else h) & mask  # type: int
+        while peers[i] != self.EMPTY and keys[i * 32:i * 32 + 32] != key:
+            i = (i + 1) & mask
+        return i
+
+    def insert(self, slot: int, key: bytes, sighting: Sighting) -> None:
+        self.keys[slot * 32:slot * 32 + 32] = key
+        (self.peers[slot], self.times[slot], self.ranks[slot],
+         self.counts[slot]) = sighting
+        self.used += 1
+
+    def resize(self, size: int) -> None:
+        old = getattr(self, 'peers', array('I'))  # type: array
+        (old_keys, old_times, old_ranks, old_counts) = (
+                getattr(self, 'keys', b''), getattr(self, 'times', ()),
+                getattr(self, 'ranks', ()), getattr(self, 'counts', ()))
+        self.keys = bytearray(size * 32)  # type: bytearray
+        self.peers = array('I', [self.EMPTY]) * size  # type: array
+        self.times = array('Q', [0]) * size  # type: array
+        self.ranks = array('Q', [0]) * size  # type: array
+        self.counts = array('I', [0]) * size  # type: array
+        self.mask = size - 1  # type: int
+        for (j, peer) in enumerate(old):
+            if peer == self.EMPTY:
+                continue
+            key = bytes(old_keys[j * 32:j * 32 + 32])  # type: bytes
+            i = self.find(key)  # type: int
+            self.keys[i * 32:i * 32 + 32] = key
+            (self.peers[i], self.times[i], self.ranks[i],
+             self.counts[i]) = (peer, old_times[j], old_ranks[j],
+                                old_counts[j])
+
+
+class FirstSeen(object):
+    """
+    Index of first announcements of recently seen hashes, e.g. of
+    transactions announced with 'inv'
+
+    Every hash maps to compact 'Sighting': peer which announced it first,
+    when, and in which order it arrived. Sightings are kept in flat arrays
+    of open-addressing tables, 56 bytes per slot, instead of per-hash
+    Python objects. Index keeps two tables: new hashes go to the current
+    one, which becomes previous after 'window' seconds, when the former
+    previous one is dropped. So every hash is remembered for at least
+    'window' and at most twice as long, and eviction costs nothing per hash.
+    Tables are rotated early once the current one holds 'limit' hashes, so
+    flood of announcements cannot grow the index without bound; such
+    hashes are remembered for less than 'window' then.
+
+    With 'depth' given, first 'depth' announcements of every hash are also
+    appended to columnar log, taken with 'drain', e.g. for
+    'coinflow.analysis.OriginEstimator'.
+    """
+
+    LOAD = 0.6  # type: float
+    """Maximum ratio of used slots, table grows twice when exceeded"""
+    LIMIT = 1 << 19  # type: int
+    """Default maximum number of hashes in single table"""
+
+    def __init__(self, window: float = 3600.0, capacity: int = 1 << 16,
+                 depth: int = 0, limit: int = LIMIT,
+                 clock: Callable[[], int] = monotonic_ns) -> None:
+        """
+        Constructor for 'FirstSeen' class.
+
+        Parameters
+        ----------
+        window : float
+            seconds for which hash is remembered at least
+        capacity : int
+            expected number of hashes announced in single window
+        depth : int
+            number of announcements of every hash appended to log
+        limit : int
+            maximum number of hashes in single table, tables are rotated
+            early when reached
+        clock : callable
+            source of monotonic time, in nanoseconds
+        """
+        size = 8  # type: int
+        while size * self.LOAD < min(capacity, limit):
+            size *= 2
+        self.window = int(window * 1e9)  # type: int
+        self.depth = depth  # type: int
+        self.limit = limit  # type: int
+        self.clock = clock  # type: Callable[[], int]
+        self.rank = 0  # type: int
+        """Number of hashes indexed so far"""
+        now = clock()  # type: int
+        self._secret = os.urandom(16)  # type: bytes
+        self._current = _Table(size, now, self._secret)  # type: _Table
+        self._previous = _Table(8, now, self._secret)  # type: _Table
+        self._log = Announcements(array('Q'), array('I'),
+                                  array('Q'))  # type: Announcements
+
+    def __len__(self) -> int:
+        return self._current.used + self._previous.used
+
+    def __contains__(self, key: bytes) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: bytes) -> Optional[Sighting]:
+        """
+        Find first announcement of hash
+
+        Parameters
+        ----------
+        key : bytes
+            32-byte hash
+
+        Returns
+        -------
+        Sighting
+            first announcement or None if hash is not indexed
+        """
+        h = self._current.hash(key)  # type: int
+        for table in (self._current, self._previous):
+            i = table.find(key, h)  # type: int
+            if table.peers[i] != _Table.EMPTY:
+                return Sighting(table.peers[i], table.times[i],
+                                table.ranks[i], table.counts[i])
+        return None
+
+    def observe(self, key: bytes, peer: int,
+                now: Optional[int] = None) -> int:
+        """
+        Record announcement of hash by peer
+
+        Parameters
+        ----------
+        key : bytes
+            32-byte hash
+        peer : int
+            id of announcing peer
+        now : int
+            time of announcement in nanoseconds, current time by default
+
+        Returns
+        -------
+        int
+            number of earlier announcements of hash, 0 for the first one
+        """
+        if now is None:
+            now = self.clock()
+        if now - self._current.started >= self.window or \
+                self._current.used >= self.limit:
+            self._rotate(now)
+        current = self._current  # type: _Table
+        h = current.hash(key)  # type: int
+        slot = current.find(key, h)  # type: int
+        for (table, i) in ((current, slot), (self._previous, None)):
+            if i is None:
+                i = table.find(key, h)
+            if table.peers[i] != _Table.EMPTY:
+                count = table.counts[i]  # type: int
+                table.counts[i] = count + 1
+                if count < self.depth:
+                    self._append(table.ranks[i], peer, now)
+                return count
+        if current.used + 1 > len(current.peers) * self.LOAD:
+            current.resize(len(current.peers) * 2)
+            slot = current.find(key, h)
+        current.insert(slot, key, Sighting(peer, now, self.rank, 1))
+        if self.depth:
+            self._append(self.rank, peer, now)
+        self.rank += 1
+        return 0
+
+    def observe_many(self, keys: Iterable[bytes], peer: int,
+                     now: Optional[int] = None) -> List[int]:
+        """
+        Record announcement of many hashes by peer at once, see 'observe'
+
+        Returns
+        -------
+        list
+            numbers of earlier announcements of every hash
+        """
+        if now is None:
+            now = self.clock()
+        observe = self.observe
+        return [observe(key, peer, now) for key in keys]
+
+    def drain(self) -> Announcements:
+        """
+        Take announcements logged so far and start new log
+
+        Returns
+        -------
+        Announcements
+            columns of announcements in order of arrival
+        """
+        (log, self._log) = (self._log, Announcements(array('Q'), array('I'),
+                                                     array('Q')))
+        return log
+
+    def _append(self, rank: int, peer: int, now: int) -> None:
+        log = self._log  # type: Announcements
+        log.ranks.append(rank)
+        log.peers.append(peer)
+        log.times.append(now)
+
+    def _rotate(self, now: int) -> None:
+        # Start new table as big as the current one, which is a good guess
+        # of number of hashes in next window
+        size = len(self._current.peers)  # type: int
+        if now - self._current.started >= 2 * self.window:
+            self._previous = _Table(8, now, self._secret)
+        else:
+            self._previous = self._current
+        self._current = _Table(size, now, self._secret)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from array import array
+from typing import Callable, Hashable
+
+
+class HashIndex(object):
+    """
+    Open-addressing hash index mapping keys to row numbers of a table
+
+    Keys are not stored, only row numbers and key hashes in two flat arrays,
+    so index costs 16 bytes per slot regardless of key type. Table provides
+    key of any row through 'key_of', used to resolve hash collisions.
+    Linear probing with backward-shift deletion keeps probe chains short
+    without tombstones.
+    """
+
+    EMPTY = -1  # type: int
+    """Row number marking empty slot"""
+    LOAD = 0.6  # type: float
+    """Maximum ratio of used slots, index grows twice when exceeded"""
+
+    def __init__(self, key_of: Callable[[int], Hashable],
+                 capacity: int = 8) -> None:
+        """
+        Constructor for 'HashIndex' class.
+
+        Parameters
+        ----------
+        key_of : callable
+            function returning key of given row
+        capacity : int
+            expected number of keys
+        """
+        size = 8  # type: int
+        while size * self.LOAD < capacity:
+            size *= 2
+        self.key_of = key_of  # type: Callable[[int], Hashable]
+        self._used = 0  # type: int
+        self._alloc(size)
+
+    def __len__(self) -> int:
+        return self._used
+
+    def get(self, key: Hashable) -> int:
+        """
+        Find row of given key
+
+        Parameters
+        ----------
+        key : hashable
+            key to look for
+
+        Returns
+        -------
+        int
+            row number or 'EMPTY' if key is not indexed
+        """
+        return self._rows[self._find(key, hash(key))]
+
+    def add(self, key: Hashable, row: int) -> None:
+        """
+        Index row under given key, replacing row already indexed under it
+
+        Parameters
+        ----------
+        key : hashable
+            key of row
+        row : int
+            row number
+        """
+        h = hash(key)  # type: int
+        slot = self._find(key, h)  # type: int
+        if self._rows[slot] == self.EMPTY:
+            if (self._used + 1) > len(self._rows) * self.LOAD:
+                self._alloc(len(self._rows) * 2)
+                slot = self._find(key, h)
+            self._used += 1
+        self._rows[slot] = row
+        self._hashes[slot] = h
+
+    def remove(self, key: Hashable) -> int:
+        """
+        Remove key from index
+
+        Parameters
+        ----------
+        key : hashable
+            key to remove
+
+        Returns
+        -------
+        int
+            row number which was indexed under key or 'EMPTY'
+        """
+        rows = self._rows  # type: array
+        hashes = self._hashes  # type: array
+        mask = self._mask  # type: int
+        i = self._find(key, hash(key))  # type: int
+        row = rows[i]  # type: int
+        if row == self.EMPTY:
+            return row
+        self._used -= 1
+
+        # Shift following entries of probe chain back into the hole
+        j = i  # type: int
+        while True:
+            j = (j + 1) & mask
+            if rows[j] == self.EMPTY:
+                break
+            home = hashes[j] & mask  # type: int
+            if (i < home <= j) if i <= j else (i < home or home <= j):
+                continue
+            rows[i] = rows[j]
+            hashes[i] = hashes[j]
+            i = j
+        rows[i] = self.EMPTY
+        return row
+
+    def _find(self, key: Hashable, h: int) -> int:
+        rows = self._rows  # type: array
+        hashes = self._hashes  # type: array
+        mask = self._mask  # type: int
+        i = h & mask  # type: int
+        while rows[i] != self.EMPTY:
+            if hashes[i] == h and self.key_of(rows[i]) == key:
+                return i
+            i = (i + 1) & mask
+        return i
+
+    def _alloc(self, size: int) -> None:
+        old = getattr(self, '_rows', array('q'))  # type: array
+        old_hashes = getattr(self, '_hashes', array('q'))  # type: array
+        self._rows = array('q', [self.EMPTY]) * size  # type: array
+        self._hashes = array('q', [0]) * size  # type: array
+        self._mask = size - 1  # type: int
+        for (row, h) in zip(old, old_hashes):
+            if row == self.EMPTY:
+                continue
+            i = h & self._mask  # type: int
+            while self._rows[i] != self.EMPTY:
+                i = (i + 1) & self._mask
+            self._rows[i] = row
+            self._hashes[i] = h
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import struct
+
+from array import array
+from socket import inet_aton, inet_ntoa
+from typing import Iterator
+
+from .HashIndex import HashIndex
+from coinflow.protocol.messages.Addr import AddrBatch, AddrEntry
+import coinflow.protocol.structs as structs
+
+_PORT = struct.Struct('>H')  # type: struct.Struct
+_IPV4_PREFIX = b'\x00' * 10 + b'\xff\xff'  # type: bytes
+
+
+class NetaddrTable(object):
+    """
+    Compact table of network addresses deduplicated on (ip, port)
+
+    Every field lives in its own contiguous column: packed 16-byte IPs,
+    uint16 ports, uint64 services and uint32 last-seen timestamps, which
+    takes 30 bytes per address plus index. Rows are turned into 'AddrEntry'
+    objects only when accessed.
+    """
+
+    def __init__(self, capacity: int = 0) -> None:
+        """
+        Constructor for 'NetaddrTable' class.
+
+        Parameters
+        ----------
+        capacity : int
+            expected number of addresses, used to size index up front
+        """
+        self.ips = bytearray()  # type: bytearray
+        self.ports = array('H')  # type: array
+        self.services = array('Q')  # type: array
+        self.timestamps = array('I')  # type: array
+        self._index = HashIndex(self.key, capacity)  # type: HashIndex
+
+    def __len__(self) -> int:
+        return len(self.ports)
+
+    def __getitem__(self, row: int) -> AddrEntry:
+        """
+        Convert single row to 'AddrEntry'
+        """
+        if not 0 <= row < len(self):
+            raise IndexError('row {0} out of range'.format(row))
+        ip = inet_ntoa(self.ips[row * 16 + 12:row * 16 + 16])  # type: str
+        return AddrEntry(structs.Timestamp(self.timestamps[row]),
+                         structs.Netaddr(ip, self.ports[row],
+                                         self.services[row]))
+
+    def __iter__(self) -> Iterator[AddrEntry]:
+        return (self[row] for row in range(len(self)))
+
+    def __contains__(self, addr: structs.Netaddr) -> bool:
+        return self.find(addr) != HashIndex.EMPTY
+
+    def key(self, row: int) -> bytes:
+        """
+        Deduplication key of row: packed IP followed by big-endian port
+
+        Parameters
+        ----------
+        row : int
+            row number
+
+        Returns
+        -------
+        bytes
+            18-byte key
+        """
+        return bytes(self.ips[row * 16:row * 16 + 16]) + \
+            _PORT.pack(self.ports[row])
+
+    def find(self, addr: structs.Netaddr) -> int:
+        """
+        Find row of given address
+
+        Parameters
+        ----------
+        addr : coinflow.protocol.structs.Netaddr
+            address to look for
+
+        Returns
+        -------
+        int
+            row number or -1 if address is not known
+        """
+        return self.find_raw(_IPV4_PREFIX + inet_aton(addr.ip), addr.port)
+
+    def find_raw(self, ip: bytes, port: int) -> int:
+        """
+        Find row of address given as packed fields, see 'find'
+
+        Parameters
+        ----------
+        ip : bytes
+            16-byte IPv6 or IPv4-mapped address
+        port : int
+            port
+
+        Returns
+        -------
+        int
+            row number or -1 if address is not known
+        """
+        return self._index.get(ip + _PORT.pack(port))
+
+    def add(self, addr: structs.Netaddr, timestamp: int = 0) -> int:
+        """
+        Add address or refresh already known one
+
+        Known address keeps the most recent timestamp and gets services
+        of the freshest announcement.
+
+        Parameters
+        ----------
+        addr : coinflow.protocol.structs.Netaddr
+            address to add
+        timestamp : int
+            last-seen unix timestamp
+
+        Returns
+        -------
+        int
+            row number of address
+        """
+        return self.add_raw(_IPV4_PREFIX + inet_aton(addr.ip), addr.port,
+                            addr.services, timestamp)
+
+    def add_raw(self, ip: bytes, port: int, services: int,
+                timestamp: int) -> int:
+        """
+        Add address given as packed fields, see 'add'
+
+        Parameters
+        ----------
+        ip : bytes
+            16-byte IPv6 or IPv4-mapped address
+        port : int
+            port
+        services : int
+            services bitfield
+        timestamp : int
+            last-seen unix timestamp
+
+        Returns
+        -------
+        int
+            row number of address
+        """
+        key = ip + _PORT.pack(port)  # type: bytes
+        row = self._index.get(key)  # type: int
+        if row != HashIndex.EMPTY:
+            if timestamp >= self.timestamps[row]:
+                self.timestamps[row] = timestamp
+                self.services[row] = services
+            return row
+        row = len(self.ports)
+        self.ips += ip
+        self.ports.append(port)
+        self.services.append(services)
+        self.timestamps.append(timestamp)
+        self._index.add(key, row)
+        return row
+
+    def extend(self, batch: AddrBatch) -> int:
+        """
+        Add all addresses from decoded 'addr' payload
+
+        Parameters
+        ----------
+        batch : coinflow.protocol.messages.Addr.AddrBatch
+            columnar 'addr' payload
+
+        Returns
+        -------
+        int
+            number of addresses which were not known before
+        """
+        before = len(self)  # type: int
+        ips = batch.ips  # type: bytes
+        for (i, (port, services, timestamp)) in enumerate(
+                zip(batch.ports, batch.services, batch.timestamps)):
+            self.add_raw(ips[i * 16:i * 16 + 16], port, services, timestamp)
+        return len(self) - before
+
+    def remove(self, row: int) -> None:
+        """
+        Remove row, last row is moved into its place
+
+        Parameters
+        ----------
+        row : int
+            row number to remove
+        """
+        last = len(self) - 1  # type: int
+        if not 0 <= row <= last:
+            raise IndexError('row {0} out of range'.format(row))
+        self._index.remove(self.key(row))
+        if row != last:
+            self.ips[row * 16:row * 16 + 16] = self.ips[last * 16:]
+            self.ports[row] = self.ports[last]
+            self.services[row] = self.services[last]
+            self.timestamps[row] = self.timestamps[last]
+            self._index.add(self.key(row), row)
+        del self.ips[last * 16:]
+        self.ports.pop()
+        self.services.pop()
+        self.timestamps.pop()
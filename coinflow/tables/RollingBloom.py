@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+import os
+import struct
+import time
+
+from hashlib import sha256
+from typing import Callable, Iterable, List
+
+_HASHES = struct.Struct('<QQ')  # type: struct.Struct
+
+
+class RollingBloom(object):
+    """
+    Bloom filter of recently seen keys, forgetting old ones in generations
+
+    Filter is split into 'generations' equal bit arrays. Keys are added to
+    the newest one and looked up in all of them. Once the newest generation
+    holds 'capacity' keys or is older than 'interval' seconds, the oldest
+    generation is dropped and empty one is started, so memory stays fixed
+    and at least (generations - 1) * capacity latest keys are remembered.
+
+    Keys are bytes, e.g. packed address or inventory hash as they appear on
+    wire. They are hashed with SHA-256 prefixed with random secret of filter,
+    so remote nodes cannot craft keys colliding in all filters.
+    """
+
+    CAPACITY = 5000  # type: int
+    """Default number of keys in single generation"""
+    FP_RATE = 0.001  # type: float
+    """Default false positive rate of whole filter at full capacity"""
+    INTERVAL = 600.0  # type: float
+    """Default lifetime of single generation, in seconds"""
+
+    def __init__(self, capacity: int = CAPACITY, fp_rate: float = FP_RATE,
+                 interval: float = INTERVAL, generations: int = 3,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Constructor for 'RollingBloom' class.
+
+        Parameters
+        ----------
+        capacity : int
+            number of keys after which new generation is started
+        fp_rate : float
+            false positive rate with every generation full
+        interval : float
+            seconds after which new generation is started
+        generations : int
+            number of generations, at least 2
+        clock : callable
+            source of time, in seconds
+        """
+        if capacity < 1 or not 0 < fp_rate < 1 or generations < 2:
+            raise ValueError('invalid parameters of bloom filter')
+        rate = fp_rate / generations  # type: float
+        bits = -capacity * math.log(rate) / (math.log(2) ** 2)  # type: float
+        self.capacity = capacity  # type: int
+        self.interval = interval  # type: float
+        self.clock = clock  # type: Callable[[], float]
+        self.size = _prime(max(64, int(math.ceil(bits))))  # type: int
+        """Number of bits in single generation, prime so that every key
+        sets distinct bits"""
+        self.hashes = max(1, int(round(self.size / capacity *
+                                       math.log(2))))  # type: int
+        """Number of bits set for every key"""
+        self._key = os.urandom(16)  # type: bytes
+        self._generations = [bytearray((self.size + 7) // 8)
+                             for _ in range(generations)
+                             ]  # type: List[bytearray]
+        self._count = 0  # type: int
+        self._started = clock()  # type: float
+
+    def __contains__(self, key: bytes) -> bool:
+        self._roll()
+        return self._contains(self._positions(key))
+
+    def _contains(self, positions: List[int]) -> bool:
+        for bits in self._generations:
+            for p in positions:
+                if not bits[p >> 3] & (1 << (p & 7)):
+                    break
+            else:
+                return True
+        return False
+
+    def add(self, key: bytes) -> bool:
+        """
+        Add key to filter
+
+        Parameters
+        ----------
+        key : bytes
+            key to add
+
+        Returns
+        -------
+        bool
+            False if key was (probably) in filter already
+        """
+        self._roll()
+        positions = self._positions(key)  # type: List[int]
+        if self._contains(positions):
+            return False
+        if self._count >= self.capacity:
+            self._rotate(1)
+        bits = self._generations[0]  # type: bytearray
+        for p in positions:
+            bits[p >> 3] |= 1 << (p & 7)
+        self._count += 1
+        return True
+
+    def add_many(self, keys: Iterable[bytes]) -> int:
+        """
+        Add many keys to filter
+
+        Parameters
+        ----------
+        keys : iterable
+            keys to add
+
+        Returns
+        -------
+        int
+            number of keys which were not in filter
+        """
+        add = self.add
+        return sum(1 for key in keys if add(key))
+
+    def clear(self) -> None:
+        """
+        Forget all keys
+        """
+        self._rotate(len(self._generations))
+
+    def _positions(self, key: bytes) -> List[int]:
+        # Double hashing: k positions from two independent 64-bit hashes
+        (h1, h2) = _HASHES.unpack_from(sha256(self._key + key).digest())
+        size = self.size  # type: int
+        h2 = h2 % (size - 1) + 1
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def _roll(self) -> None:
+        elapsed = self.clock() - self._started  # type: float
+        if elapsed >= self.interval:
+            self._rotate(min(int(elapsed // self.interval),
+                             len(self._generations)))
+
+    def _rotate(self, n: int) -> None:
+        for _ in range(n):
+            self._generations.pop()
+            self._generations.insert(0, bytearray((self.size + 7) // 8))
+        self._count = 0
+        self._started = self.clock()
+
+
+def _prime(n: int) -> int:
+    """
+    Smallest prime not less than n
+    """
+    n |= 1
+    while any(n % d == 0 for d in range(3, int(math.sqrt(n)) + 1, 2)):
+        n += 2
+    return n
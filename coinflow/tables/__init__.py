@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .FirstSeen import Announcements, FirstSeen, Sighting
+from .HashIndex import HashIndex
+from .NetaddrTable import NetaddrTable
+from .RollingBloom import RollingBloom
+
+__all__ = ['Announcements', 'FirstSeen', 'Sighting', 'HashIndex',
+           'NetaddrTable', 'RollingBloom']
@@ -44,7 +44,8 @@ setup(
     ],
 
     install_requires=REQUIRES,
+    extras_require={'analysis': ['numpy']},
     tests_require=['coverage', 'pytest'],
 
-    packages=find_packages(),
+    packages=find_packages(exclude=('benchmarks',)),
 )
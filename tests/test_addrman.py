@@ -0,0 +1,89 @@
+import pytest
+import asyncio
+from datetime import timedelta
+
+from coinflow.network import AddrManager, Node
+from coinflow.protocol.messages import Addr, GetAddr
+from coinflow.protocol.messages.Addr import AddrEntry
+from coinflow.protocol.structs import Netaddr, Timestamp
+
+T0 = int(Timestamp(2017, 1, 1).timestamp())
+
+def test_freshest():
+    manager = AddrManager(granularity=60)
+    for i in range(1000):
+        manager.add(Netaddr('10.0.{}.{}'.format(i // 256, i % 256), 8333, 0),
+                    T0 + (i * 7919) % 1000)
+
+    freshest = manager.freshest(100)
+
+    assert len(freshest) == 100
+    assert [int(e.timestamp.timestamp()) for e in freshest] == \
+           list(range(T0 + 999, T0 + 899, -1))
+    assert len(manager.freshest(2000)) == 1000
+
+def test_refresh_and_remove():
+    manager = AddrManager(granularity=60)
+    a = Netaddr('10.0.0.1', 8333, 0)
+    b = Netaddr('10.0.0.2', 8333, 0)
+
+    assert manager.add(a, T0)
+    assert manager.add(b, T0 + 100)
+    assert not manager.add(a, T0 + 1000)
+    assert [e.addr for e in manager.freshest(2)] == [a, b]
+
+    assert manager.remove(a)
+    assert not manager.remove(a)
+    assert [e.addr for e in manager.freshest(2)] == [b]
+
+def test_capacity_and_expire():
+    manager = AddrManager(capacity=10, granularity=60, horizon=3600)
+    for i in range(20):
+        manager.add(Netaddr('10.0.0.{}'.format(i), 8333, 0), T0 + i * 600)
+
+    assert len(manager) == 10
+    assert Netaddr('10.0.0.9', 8333, 0) not in manager
+    assert Netaddr('10.0.0.10', 8333, 0) in manager
+
+    assert manager.expire(T0 + 19 * 600 + 1800) == 6
+    assert [e.addr.ip for e in manager.freshest(10)] == \
+           ['10.0.0.19', '10.0.0.18', '10.0.0.17', '10.0.0.16']
+
+def test_getaddr():
+    async def main():
+        manager = AddrManager()
+        server = Node(magic=0xdeadbeaf, addrman=manager)
+        client = Node(magic=0xdeadbeaf)
+        received = list()
+        client.on('addr', lambda peer, msg: received.append(msg))
+
+        srv = await server.serve('127.0.0.1', 0)
+        peer = await client.connect('127.0.0.1',
+                                    srv.sockets[0].getsockname()[1])
+        entries = [AddrEntry(Timestamp(2017, 1, 1) + timedelta(seconds=i),
+                             Netaddr('10.0.0.{}'.format(i), 8333, 1))
+                   for i in range(10)]
+        peer.send(Addr(entries, magic=0xdeadbeaf))
+        peer.send(GetAddr(magic=0xdeadbeaf))
+        other = Node(magic=0xdeadbeaf)
+        relayed = list()
+        other.on('addr', lambda peer, msg: relayed.append(msg))
+        (await other.connect('127.0.0.1', srv.sockets[0].getsockname()[1])
+         ).send(GetAddr(magic=0xdeadbeaf))
+        for _ in range(100):
+            if received and relayed:
+                break
+            await asyncio.sleep(0.01)
+
+        assert len(manager) == 10
+        # Addresses are not sent back to peer which announced them
+        assert received[0].payload['addr_list'] == []
+        assert relayed[0].payload['addr_list'] == entries[::-1]
+
+        client.close()
+        other.close()
+        server.close()
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    loop.close()
@@ -0,0 +1,96 @@
+import pytest
+import math
+import random
+
+from coinflow.analysis import OriginEstimator
+from coinflow.analysis.OriginEstimator import EARTH_RADIUS
+from coinflow.geo import GeoDatabase
+from coinflow.tables import FirstSeen
+
+# Warsaw, Sydney, Paris, New York and unknown peer
+LATS = [52.25, -33.5, 48.75, 40.75, math.nan]
+LONS = [21.0, 151.0, 2.25, -74.0, math.nan]
+
+def distance(a, b):
+    (la, lb) = (math.radians(LATS[a]), math.radians(LATS[b]))
+    d = math.radians(LONS[a] - LONS[b])
+    cos = (math.sin(la) * math.sin(lb) +
+           math.cos(la) * math.cos(lb) * math.cos(d))
+    return EARTH_RADIUS * math.acos(min(1.0, cos))
+
+def announce(index, origin, key):
+    for peer in sorted(range(5), key=lambda p: p != origin):
+        delay = 0 if peer == 4 else distance(origin, peer)
+        index.observe(key, peer, 10 ** 9 + int(delay / 40000 * 1e9))
+
+@pytest.fixture(params=[False, True], ids=['array', 'numpy'])
+def vectorized(request):
+    if request.param:
+        pytest.importorskip('numpy')
+    return request.param
+
+def test_origin_estimator(vectorized):
+    index = FirstSeen(depth=8)
+    for (i, origin) in enumerate((0, 1, 3, 2)):
+        announce(index, origin, bytes([i]) * 32)
+    announcements = index.drain()
+
+    assert len(announcements.ranks) == 20
+    assert not index.drain().ranks
+
+    delay = OriginEstimator(LATS, LONS, 'delay',
+                            vectorized=vectorized).estimate(announcements)
+    assert list(delay.ranks) == [0, 1, 2, 3]
+    assert list(delay.announcers) == [4] * 4
+    assert [(round(lat, 2), round(lon, 2)) for (lat, lon) in
+            zip(delay.latitudes, delay.longitudes)] == \
+        [(52.25, 21.0), (-33.5, 151.0), (40.75, -74.0), (48.75, 2.25)]
+    assert max(delay.error) < 1e-6
+
+    earliest = OriginEstimator(LATS, LONS, tau=0.01,
+                               vectorized=vectorized).estimate(announcements)
+    assert abs(earliest.latitudes[1] + 33.5) < 1
+    assert abs(earliest.longitudes[1] - 151.0) < 1
+    assert earliest.error[1] < 100
+
+    with pytest.raises(ValueError):
+        OriginEstimator(LATS, LONS, 'nearest')
+
+def test_vectorized():
+    pytest.importorskip('numpy')
+    random.seed(3)
+    (lats, lons) = ([random.uniform(-80, 80) for _ in range(50)],
+                    [random.uniform(-180, 180) for _ in range(50)])
+    lats[7] = math.nan
+    index = FirstSeen(depth=6)
+    for key in range(300):
+        for peer in random.sample(range(52), random.randint(1, 6)):
+            index.observe(key.to_bytes(32, 'big'), peer,
+                          random.randrange(10 ** 10))
+    announcements = index.drain()
+
+    for method in OriginEstimator.METHODS:
+        (plain, fast) = (OriginEstimator(lats, lons, method,
+                                         vectorized=v).estimate(announcements)
+                         for v in (False, True))
+        assert list(fast.ranks) == list(plain.ranks)
+        assert list(fast.announcers) == list(plain.announcers)
+        for column in ('latitudes', 'longitudes', 'error'):
+            assert getattr(fast, column) == pytest.approx(
+                getattr(plain, column), abs=1e-6)
+
+    empty = OriginEstimator(lats, lons, vectorized=True).estimate(
+                                                        FirstSeen().drain())
+    assert not empty.ranks
+
+def test_from_geo(tmpdir):
+    source = tmpdir.join('ranges.csv')
+    source.write('10.0.0.0,10.0.0.255,52.25,21.0,PL/Warsaw\n')
+    path = str(tmpdir.join('ranges.db'))
+    GeoDatabase.build(str(source), path)
+
+    with GeoDatabase(path) as geo:
+        estimator = OriginEstimator.from_geo(geo, [('10.0.0.1', 8333),
+                                                   ('1.1.1.1', 8333)])
+
+    assert list(estimator.located) == [1, 0]
@@ -0,0 +1,43 @@
+import pytest
+
+from benchmarks import Result, benchmarks, compare, generate, load, run, save
+from benchmarks.__main__ import main
+
+def test_corpus():
+    corpus = generate(50)
+    assert corpus == generate(50)
+    assert corpus != generate(50, seed=1)
+    assert all(v < 0xfd for v in corpus.small_varints)
+    assert all(v >= 0xfd for v in corpus.large_varints)
+    assert len(corpus.addr_list) == 50
+
+def test_run(tmpdir):
+    benches = benchmarks(generate(20))
+    assert len({b.name for b in benches}) == len(benches)
+    results = run(benches, min_time=0, repeat=1)
+    assert all(r.ops_per_sec > 0 and r.bytes_per_sec > 0
+               for r in results.values())
+
+    path = str(tmpdir.join('results.json'))
+    save(results, path, size=20)
+    assert load(path) == results
+
+def test_compare():
+    baseline = {'a': Result(100, 1000), 'b': Result(100, 1000),
+                'c': Result(100, 1000)}
+    results = {'a': Result(95, 950), 'b': Result(50, 500),
+               'c': Result(150, 1500), 'd': Result(1, 1)}
+    regressions = compare(results, baseline, tolerance=0.1)
+    assert [(r.name, r.ratio) for r in regressions] == [('b', 0.5)]
+    assert compare(results, baseline, tolerance=0.01)[1].name == 'a'
+
+def test_main(tmpdir, capsys):
+    path = str(tmpdir.join('results.json'))
+    argv = ['--size', '10', '--min-time', '0', '--repeat', '1',
+            '-k', 'varint.small']
+    assert main(argv + ['-o', path]) == 0
+    assert set(load(path)) == {'varint.small.encode', 'varint.small.decode',
+                               'varint.small.encode_many',
+                               'varint.small.decode_many'}
+    assert main(argv + ['-b', path, '-t', '1']) == 0
+    assert 'no regressions' in capsys.readouterr().out
@@ -0,0 +1,181 @@
+import pytest
+import struct
+from datetime import timedelta
+
+from coinflow.capture import Record, Recorder, Replay
+from coinflow.protocol.Framer import Framer
+from coinflow.protocol.messages import Addr, RawMessage, Verack, Version
+from coinflow.protocol.messages.Addr import AddrEntry
+from coinflow.protocol.structs import Netaddr, Timestamp, dsha256
+
+MAGIC = 0xd9b4bef9
+
+def messages():
+    ts = Timestamp(2017, 1, 1)
+    local = Netaddr('127.0.0.1', 8333, 0)
+    addr_list = [AddrEntry(ts + timedelta(seconds=i),
+                           Netaddr('10.0.0.{}'.format(i), 8333, 1))
+                 for i in range(10)]
+    return [Version(local, local, 70015, 1, ts, 7, 'replay', 1, True,
+                    magic=MAGIC),
+            Verack(magic=MAGIC),
+            Addr(addr_list=addr_list, magic=MAGIC),
+            RawMessage('ping', b'\x01' * 8, magic=MAGIC)]
+
+def test_replay_stream(tmpdir):
+    msgs = messages()
+    raw = [bytes(m) for m in msgs]
+    corrupt = bytearray(raw[2])
+    corrupt[-1] ^= 0xff
+    path = tmpdir.join('stream.cap')
+    path.write_binary(b'junk' + raw[0] + raw[1] + bytes(corrupt) +
+                      raw[2] + raw[3] + b'\xf9\xbe')
+
+    with Replay(str(path)) as replay:
+        assert not replay.records
+        replayed = list(replay)
+        assert replayed == [Record(None, None, m) for m in msgs]
+        assert replay.dropped == 4 + len(corrupt) + 2
+
+    with Replay(str(path), verify=False) as replay:
+        assert [r.message.COMMAND for r in replay] == \
+            ['version', 'verack', 'addr', 'addr', None]
+        assert replay.malformed == 0
+
+    with Replay(str(path)) as replay:
+        assert [r.message for r in replay.messages(['addr'])] == [msgs[2]]
+        lazy = next(replay.messages(['version'], lazy=True)).message
+        assert lazy.payload == msgs[0].payload
+
+def test_replay_records(tmpdir):
+    msgs = messages()
+    data = bytearray(Replay.SIGNATURE)
+    for (i, m) in enumerate(msgs):
+        peer = '10.0.0.{}:8333'.format(i % 2).encode()
+        raw = bytes(m)
+        data += Replay.RECORD.pack(1000.0 + i, len(peer), len(raw))
+        data += peer + raw
+    data += Replay.RECORD.pack(2000.0, 0, 10) + b'\x00' * 10
+    path = tmpdir.join('records.cap')
+    path.write_binary(bytes(data))
+
+    with Replay(str(path)) as replay:
+        assert replay.records
+        replayed = list(replay)
+        assert [(r.timestamp, r.peer) for r in replayed] == \
+            [(1000.0, '10.0.0.0:8333'), (1001.0, '10.0.0.1:8333'),
+             (1002.0, '10.0.0.0:8333'), (1003.0, '10.0.0.1:8333')]
+        assert [r.message for r in replayed] == msgs
+        assert replay.dropped == 10
+
+def test_replay_filter(tmpdir):
+    msgs = messages()
+    raw = [bytes(m) for m in msgs]
+    corrupt = bytearray(raw[3])
+    corrupt[-1] ^= 0xff
+    path = tmpdir.join('stream.cap')
+    path.write_binary(raw[0] + bytes(corrupt) + raw[2] + b'junk' + raw[3] +
+                      raw[1])
+
+    # Corrupt 'ping' is skipped by its header, as the next message starts
+    # right after it, while 'addr' followed by junk is verified
+    with Replay(str(path)) as replay:
+        assert [r.message for r in replay.messages(['verack'])] == [msgs[1]]
+        assert replay.dropped == 4
+    with Replay(str(path)) as replay:
+        assert [r.message for r in replay.messages(['ping'])] == [msgs[3]]
+        assert replay.dropped == len(corrupt) + 4
+
+    data = bytearray(Replay.SIGNATURE)
+    for (i, m) in enumerate(raw + [bytes(corrupt)]):
+        data += Replay.RECORD.pack(1000.0 + i, 4, len(m)) + b'peer' + m
+    path = tmpdir.join('records.cap')
+    path.write_binary(bytes(data))
+
+    with Replay(str(path)) as replay:
+        assert [r.timestamp for r in replay.messages(['ping'])] == [1003.0]
+        assert replay.dropped == len(corrupt)
+    with Replay(str(path)) as replay:
+        assert [r.timestamp for r in replay.messages(['addr'])] == [1002.0]
+        assert replay.dropped == 0
+
+def test_replay_malformed(tmpdir):
+    msgs = messages()
+    empty = struct.pack('<L12sL4s', MAGIC, b'addr', 0, dsha256(b'')[:4])
+    path = tmpdir.join('stream.cap')
+    path.write_binary(empty + bytes(msgs[1]))
+
+    with Replay(str(path)) as replay:
+        assert [r.message for r in replay] == [msgs[1]]
+        assert replay.malformed == 1 and replay.dropped == 0
+
+def test_replay_empty(tmpdir):
+    path = tmpdir.join('empty.cap')
+    path.write_binary(b'')
+    with Replay(str(path)) as replay:
+        assert list(replay) == []
+
+def frames_of(msgs):
+    framer = Framer(MAGIC)
+    return framer.feed(b''.join(bytes(m) for m in msgs))
+
+def test_recorder(tmpdir):
+    msgs = messages()
+    frames = frames_of(msgs)
+    directory = str(tmpdir.join('capture'))
+    with Recorder(directory, segment_size=2048, index_interval=10) as rec:
+        for i in range(40):
+            assert rec.record(('10.0.0.1', 8333), frames[i % 4],
+                              timestamp=1000.0 + i)
+        assert rec.record('late', frames[1], timestamp=900.0)
+        rec.flush()
+        assert rec.recorded == 41
+
+    segments = sorted(tmpdir.join('capture').listdir('*.cap'))
+    assert len(segments) > 1
+    replayed = list()
+    for path in segments:
+        with Replay(str(path)) as replay:
+            assert replay.records
+            replayed.extend(replay)
+            assert replay.dropped == 0
+    assert [r.message for r in replayed] == [msgs[i % 4] for i in range(40)] \
+        + [msgs[1]]
+    assert [r.timestamp for r in replayed] == \
+        [1000.0 + i for i in range(40)] + [1039.0]
+    assert replayed[0].peer == '10.0.0.1:8333'
+    assert replayed[-1].peer == 'late'
+
+    # Continues numbering of existing segments
+    with Recorder(directory) as rec:
+        rec.record('next', frames[0], timestamp=2000.0)
+        rec.flush(timeout=5.0)
+        assert rec.recorded == 1
+    assert len(tmpdir.join('capture').listdir('*.cap')) == len(segments) + 1
+    # Writer is gone, so flush does not wait for dropped frame
+    assert not rec.record('dropped', frames[0])
+    rec.flush()
+
+def test_replay_seek(tmpdir):
+    frames = frames_of(messages())
+    directory = tmpdir.join('capture')
+    with Recorder(str(directory), index_interval=10) as rec:
+        for i in range(100):
+            rec.record('peer', frames[i % 4], timestamp=1000.0 + i)
+
+    (path,) = directory.listdir('*.cap')
+    with Replay(str(path)) as replay:
+        # First record of every command in every 10 seconds is indexed
+        assert len(replay.index()) == 40
+        assert replay.seek(0) == len(Replay.SIGNATURE)
+        offset = replay.seek(1055.5)
+        records = list(replay.messages(offset=offset))
+        assert records[0].timestamp <= 1055.0
+        assert records[-1].timestamp == 1099.0
+        assert len(records) < 50
+
+        offset = replay.seek(1055.5, 'addr')
+        records = list(replay.messages(['addr'], offset=offset))
+        assert [r.timestamp for r in records] == \
+            [1050.0 + i for i in range(0, 50, 4)]
+        assert replay.seek(1055.5, 'getaddr') == path.size()
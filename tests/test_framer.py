@@ -0,0 +1,175 @@
+import pytest
+import asyncio
+import struct
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+
+from coinflow.protocol.Framer import Framer
+from coinflow.protocol.Verifier import Verifier
+from coinflow.protocol.structs import dsha256
+
+MAGIC = 0xd9b4bef9
+
+def frame(command, payload, checksum=None):
+    checksum = checksum or dsha256(payload)[:4]
+    return struct.pack('<L12sL4s', MAGIC, command, len(payload),
+                       checksum) + payload
+
+def test_framer_chunks():
+    stream = frame(b'verack', b'') + frame(b'ping', b'\x01' * 8) + \
+             frame(b'addr', b'\x02' * 301)
+    framer = Framer(MAGIC)
+
+    frames = list()
+    for i in range(len(stream)):
+        frames.extend(framer.feed(stream[i:i+1]))
+
+    assert [f.command.rstrip(b'\x00') for f in frames] == [b'verack', b'ping',
+                                                           b'addr']
+    assert frames[2].payload == b'\x02' * 301
+    assert frames[2].length == 301
+    assert len(framer) == 0
+    assert framer.dropped == 0
+
+def test_framer_resync():
+    garbage = b'\xf9\xbe\x00garbage\xf9'
+    bad = frame(b'ping', b'\x01' * 8, checksum=b'\x00\x00\x00\x00')
+    good = frame(b'pong', b'\x02' * 8)
+    framer = Framer(MAGIC)
+
+    frames = framer.feed(garbage + bad + good)
+
+    assert [f.command.rstrip(b'\x00') for f in frames] == [b'pong']
+    assert framer.dropped == len(garbage) + len(bad)
+
+def test_framer_max_length():
+    framer = Framer(MAGIC, max_length=16)
+
+    assert framer.feed(frame(b'big', b'\x00' * 17)) == []
+    assert framer.feed(frame(b'small', b'\x00' * 16))[0].length == 16
+
+def test_framer_no_verify():
+    framer = Framer(MAGIC, verify=False)
+    bad = frame(b'ping', b'\x01' * 8, checksum=b'\x00\x00\x00\x00')
+
+    assert framer.feed(bad)[0].checksum == b'\x00\x00\x00\x00'
+
+def test_verifier():
+    async def main():
+        delivered = list()
+        with ThreadPoolExecutor(2) as pool:
+            verifier = Verifier(delivered.append, pool, threshold=1024)
+            framer = Framer(MAGIC, verify=False)
+            block = frame(b'block', b'\x03' * 4096)
+            bad = frame(b'block', b'\x04' * 4096, b'\x00' * 4)
+
+            verifier.feed(framer.feed(frame(b'verack', b'')))
+            assert len(delivered) == 1
+            verifier.feed(framer.feed(block + frame(b'ping', b'\x01' * 8)))
+            verifier.feed(framer.feed(bad + frame(b'pong', b'\x01' * 8)))
+            verifier.feed(framer.feed(frame(b'inv', b'\x00')))
+            assert len(delivered) == 1 and len(verifier) == 5
+
+            for _ in range(100):
+                if len(delivered) == 5:
+                    break
+                await asyncio.sleep(0.01)
+
+        assert [f.command.rstrip(b'\x00') for f in delivered] == \
+            [b'verack', b'block', b'ping', b'pong', b'inv']
+        assert verifier.dropped == 1 and not len(verifier)
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    loop.close()
+
+class Flow(object):
+    def __init__(self):
+        self.paused = False
+
+    def pause_reading(self):
+        self.paused = True
+
+    def resume_reading(self):
+        self.paused = False
+
+class FailingExecutor(Executor):
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_exception(MemoryError())
+        return future
+
+def test_verifier_resync():
+    async def main():
+        delivered = list()
+        with ThreadPoolExecutor(2) as pool:
+            framer = Framer(MAGIC, verify=False)
+            verifier = Verifier(delivered.append, pool, threshold=16,
+                                framer=framer, max_pending=8192)
+            verifier.flow = flow = Flow()
+            swallowed = frame(b'ping', b'\x01' * 8) + \
+                frame(b'block', b'\x03' * 4096)
+            garbage = struct.pack('<L12sL4s', MAGIC, b'block',
+                                  len(swallowed), b'\x00' * 4)
+
+            verifier.feed(framer.feed(garbage + swallowed +
+                                      frame(b'block', b'\x05' * 4096)))
+            assert flow.paused and not delivered
+            verifier.feed(framer.feed(frame(b'inv', b'\x00')))
+
+            for _ in range(100):
+                if len(delivered) == 4:
+                    break
+                await asyncio.sleep(0.01)
+
+        assert [f.command.rstrip(b'\x00') for f in delivered] == \
+            [b'ping', b'block', b'block', b'inv']
+        assert verifier.dropped == 1 and framer.dropped == len(garbage)
+        assert not flow.paused and not verifier.pending
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    loop.close()
+
+def test_verifier_resync_many():
+    async def main():
+        marker = struct.pack('<L', MAGIC)
+        headers = b''.join(frame(b'inv', b'', checksum=c)
+                           for c in (b'\x00' * 4, marker) * 3000)
+        good = frame(b'block', b'\x03' * 64)
+        delivered = list()
+        with ThreadPoolExecutor(2) as pool:
+            stream = good + headers + good
+            for (threshold, chunk) in ((1024, 1 << 20), (16, 1 << 20),
+                                       (16, 1000)):
+                framer = Framer(MAGIC, verify=False)
+                verifier = Verifier(delivered.append, pool, threshold,
+                                    framer=framer)
+                for i in range(0, len(stream), chunk):
+                    verifier.feed(framer.feed(stream[i:i + chunk]))
+                for _ in range(100):
+                    if not len(verifier):
+                        break
+                    await asyncio.sleep(0.01)
+
+                assert verifier.dropped >= 1
+                assert framer.dropped == len(headers) and not len(framer)
+
+        assert [f.payload for f in delivered] == [b'\x03' * 64] * 6
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    loop.close()
+
+def test_verifier_error():
+    async def main():
+        errors = list()
+        verifier = Verifier(print, FailingExecutor(), threshold=16,
+                            error=errors.append)
+        verifier.feed(Framer(MAGIC).feed(frame(b'block', b'\x03' * 64)))
+        await asyncio.sleep(0.01)
+        assert isinstance(errors[0], MemoryError)
+        assert not len(verifier)
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    loop.close()
@@ -0,0 +1,81 @@
+import pytest
+import random
+from socket import inet_aton
+
+from coinflow.geo import GeoDatabase, Location
+
+_IPV4_PREFIX = b'\x00' * 10 + b'\xff\xff'
+
+CSV = '''# first,last,latitude,longitude,label
+10.0.0.0,10.0.0.255,52.25,21.0,PL/Warsaw
+1.0.0.0,1.0.0.255,-33.5,151.0,AU/Sydney
+10.0.1.0,10.0.1.255,52.25,21.0,PL/Warsaw
+2001:db8::,2001:db8::ffff,48.75,2.25,FR/Paris
+'''
+
+@pytest.fixture
+def db(tmpdir):
+    source = tmpdir.join('ranges.csv')
+    source.write(CSV)
+    path = str(tmpdir.join('ranges.db'))
+    assert GeoDatabase.build(str(source), path) == 4
+    with GeoDatabase(path) as db:
+        yield db
+
+def test_lookup(db):
+    warsaw = Location(52.25, 21.0, 'PL/Warsaw')
+    assert len(db) == 4
+    assert db.lookup('10.0.0.0') == warsaw
+    assert db.lookup('10.0.1.200') == warsaw
+    assert db.lookup('1.0.0.255') == Location(-33.5, 151.0, 'AU/Sydney')
+    assert db.lookup('2001:db8::1') == Location(48.75, 2.25, 'FR/Paris')
+    assert db.lookup('::ffff:10.0.0.1') == warsaw
+    for ip in ('0.0.0.0', '1.0.1.0', '10.0.2.0', '255.255.255.255',
+               '2001:db8::1:0', '::1'):
+        assert db.lookup(ip) is None
+    db.lookup('10.0.0.0')
+    assert db.lookup.cache_info().hits == 1
+
+@pytest.fixture(params=[False, True], ids=['array', 'numpy'])
+def vectorized(request):
+    if request.param:
+        pytest.importorskip('numpy')
+    return request.param
+
+def test_locate_many(db, vectorized):
+    ips = b''.join([_IPV4_PREFIX + inet_aton('10.0.0.7'),
+                    _IPV4_PREFIX + inet_aton('9.9.9.9'),
+                    b'\x20\x01\x0d\xb8' + b'\x00' * 11 + b'\x05',
+                    _IPV4_PREFIX + inet_aton('1.0.0.1')])
+    locs = db.locate_many(ips, vectorized)
+    assert locs[1] == -1
+    assert locs[0] == db.locate(ips[:16])
+    assert [db.location(l) for l in locs] == [db.lookup('10.0.0.7'), None,
+                                              db.lookup('2001:db8::5'),
+                                              db.lookup('1.0.0.1')]
+
+def test_locate_vectorized(db):
+    pytest.importorskip('numpy')
+    random.seed(5)
+    ips = b''.join(_IPV4_PREFIX + bytes([random.choice((1, 9, 10)), 0,
+                                         random.randrange(3),
+                                         random.randrange(256)])
+                   if random.random() < 0.9 else
+                   b'\x20\x01\x0d\xb8' + b'\x00' * 10 +
+                   bytes([random.randrange(2), random.randrange(256)])
+                   for _ in range(2000))
+
+    assert db.locate_many(ips, True) == db.locate_many(ips, False)
+    assert len(db.locate_many(b'', True)) == 0
+
+def test_build_errors(tmpdir):
+    source = tmpdir.join('ranges.csv')
+    path = str(tmpdir.join('ranges.db'))
+    source.write('10.0.0.0,10.0.1.0,0,0,a\n10.0.0.255,10.0.2.0,0,0,b\n')
+    with pytest.raises(ValueError):
+        GeoDatabase.build(str(source), path)
+    source.write('10.0.1.0,10.0.0.0,0,0,a\n')
+    with pytest.raises(ValueError):
+        GeoDatabase.build(str(source), path)
+    with pytest.raises(ValueError):
+        GeoDatabase(str(source))
@@ -0,0 +1,203 @@
+import pytest
+import struct
+from datetime import datetime, timezone, timedelta
+
+from coinflow.protocol.messages import Message, RawMessage, Version, Verack, Addr
+from coinflow.protocol.messages import Header
+from coinflow.protocol.messages import Inv, GetData
+from coinflow.protocol.messages.Addr import AddrBatch, AddrEntry
+from coinflow.protocol.messages.Inv import InvVector
+from coinflow.protocol.structs import Netaddr, Timestamp, dsha256
+from coinflow.protocol.magic import bitcoin
+
+def test_version():
+    addr_recv = Netaddr('8.8.8.8', 8333, 0)
+    addr_from = Netaddr('127.0.0.1', 8333, 0)
+    timestamp = datetime(2017, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
+
+    msg = Version(addr_recv, addr_from, 70002, 1, timestamp, 0xdeadbeaf,
+                  'coinflow test', 1337, False, magic=0xdeadbeaf)
+    parsed = msg.decode(msg.encode())
+
+    assert parsed['command'] == 'version'
+    assert parsed['magic'] == 0xdeadbeaf
+    assert parsed['length'] == 99
+    assert parsed['payload'] == {'version': 70002,
+                                 'services': 1,
+                                 'timestamp': Timestamp(timestamp),
+                                 'addr_recv': addr_recv,
+                                 'addr_from': addr_from,
+                                 'nonce': 0xdeadbeaf,
+                                 'user_agent': 'coinflow test',
+                                 'start_height': 1337,
+                                 'relay': False}
+    assert Message.parse(msg.encode()) == msg
+
+def test_verack():
+    msg = Verack(magic=0xdeadbeaf)
+
+    assert msg.decode(msg.encode()) == {'checksum': dsha256(b'')[:4],
+                                        'magic': 0xdeadbeaf,
+                                        'command': 'verack',
+                                        'payload': {},
+                                        'length': 0}
+
+def test_addr():
+    dt = Timestamp(2008, 10, 31)
+    addr_list = [AddrEntry(dt + timedelta(hours=i),
+                           Netaddr('192.168.0.{}'.format(i), 8333, i % 2))
+                 for i in range(1, 255)]
+
+    msg = Addr(addr_list=addr_list)
+    parsed = msg.decode(bytearray(msg.encode()))
+
+    assert parsed['length'] == 3 + 254 * 30
+    assert parsed['payload']['addr_list'] == addr_list
+
+    msg = Addr(addr_list=addr_list * 10)
+    parsed = msg.decode(msg.encode())
+
+    assert parsed['length'] == 3 + 2500 * 30
+    assert parsed['payload']['addr_list'][:10] == [addr_list[-1]] * 10
+
+def test_parse():
+    verack = Verack(magic=0xdeadbeaf)
+    ping = struct.pack('<L12sL4s', 0xdeadbeaf, b'ping', 8,
+                       dsha256(b'\x01' * 8)[:4]) + b'\x01' * 8
+
+    assert Message.REGISTRY[b'verack\x00\x00\x00\x00\x00\x00'] is Verack
+    assert Message.parse(verack.encode()) == verack
+    assert Verack.from_raw(verack.encode()) == verack
+
+    raw = Message.parse(memoryview(ping))
+
+    assert isinstance(raw, RawMessage)
+    assert raw.command == 'ping'
+    assert raw.payload == {'raw': b'\x01' * 8}
+    assert raw.encode() == ping
+
+def test_lazy():
+    entry = AddrEntry(Timestamp(2017, 1, 1), Netaddr('10.0.0.1', 8333, 1))
+    buf = Addr([entry], magic=0xdeadbeaf).encode()
+
+    msg = Message.parse(buf, lazy=True, verify=True)
+
+    assert msg._payload is None
+    assert msg.encode() == buf
+    assert msg.verify()
+    assert msg.payload == {'addr_list': [entry]}
+
+    with pytest.raises(ValueError):
+        Message.parse(buf[:-1] + b'\x00', verify=True)
+
+def test_buffers():
+    entry = AddrEntry(Timestamp(2017, 1, 1), Netaddr('10.0.0.1', 8333, 1))
+    msg = Addr([entry], magic=0xdeadbeaf)
+
+    (header, payload) = msg.buffers()
+
+    assert msg.buffers()[0] is header
+    assert msg.buffers()[1] is payload
+    assert header + payload == msg.encode()
+    assert len(msg) == len(payload) == 31
+
+    with pytest.raises(TypeError):
+        msg.payload['addr_list'] = []
+    with pytest.raises(TypeError):
+        Message.parse(bytes(msg)).payload['addr_list'] = []
+
+@pytest.fixture(params=[False, True], ids=['array', 'numpy'])
+def vectorized(request):
+    if request.param:
+        pytest.importorskip('numpy')
+    return request.param
+
+def addr_payload():
+    addr_list = [AddrEntry(Timestamp(2017, 1, 1) + timedelta(minutes=i),
+                           Netaddr('10.0.{}.{}'.format(i // 256, i % 256),
+                                   1024 + i, i))
+                 for i in range(1000)][::-1]
+    return Addr(addr_list).encode()[24:]
+
+def test_addr_batch(vectorized):
+    payload = addr_payload()
+
+    (batch, end) = AddrBatch.decode_from(b'\x00' + payload, 1, vectorized)
+
+    assert len(batch) == 1000 and end == len(payload) + 1
+    assert batch.ports[0] == 1024 + 999
+    assert batch.timestamps[-1] == Timestamp(2017, 1, 1).timestamp()
+    assert batch.entries() == Addr.decode_payload(payload)['addr_list']
+    assert batch.keys() == Addr.decode_batch(payload).keys()
+    assert len(AddrBatch.decode_from(b'\x00', 0, vectorized)[0]) == 0
+
+    with pytest.raises(ValueError):
+        AddrBatch.decode_from(payload[:-1], 0, vectorized)
+
+def test_addr_numpy():
+    numpy = pytest.importorskip('numpy')
+    payload = addr_payload()
+
+    (records, end) = AddrBatch.decode_numpy(bytearray(payload))
+    batch = Addr.decode_batch(payload)
+
+    assert records.dtype == AddrBatch.DTYPE and end == len(payload)
+    assert records[0]['port'] == 1024 + 999
+    assert list(records['services']) == list(batch.services)
+    assert records['ip'].tobytes() == batch.ips
+    assert numpy.array_equal(batch.to_numpy(), records)
+    assert len(AddrBatch.decode_numpy(b'\x00')[0]) == 0
+    with pytest.raises(ValueError):
+        records['port'] = 0
+    with pytest.raises(ValueError):
+        AddrBatch.decode_numpy(payload[:-1])
+
+def test_peek_header():
+    inv = bytes(Inv([InvVector(Inv.MSG_TX, b'\x01' * 32)], magic=0xdeadbeaf))
+    verack = bytes(Verack(magic=0xdeadbeaf))
+    buf = verack + inv + verack
+
+    header = Message.peek_header(buf, len(verack), 0xdeadbeaf)
+
+    assert isinstance(header, Header)
+    assert header.command == Inv.COMMAND_RAW and header.name == 'inv'
+    assert (header.length, header.offset) == (37, 24)
+    assert header.checksum == dsha256(inv[24:])[:4]
+    assert buf[header.offset:header.end] == inv
+    assert Message.parse(buf[header.offset:header.end]).payload == \
+        Message.parse(inv).payload
+    assert Message.peek_header(buf, header.end, None).name == 'verack'
+    assert Message.peek_header(buf).magic == 0xdeadbeaf
+    testnet = bytes(Verack(magic=bitcoin['testnet3']))
+    assert Message.peek_header(testnet).magic == bitcoin['testnet3']
+
+    with pytest.raises(ValueError, match='magic'):
+        Message.peek_header(buf, 0, bitcoin['mainnet'])
+    with pytest.raises(ValueError, match='too long'):
+        Message.peek_header(inv, 0, 0xdeadbeaf, max_length=36)
+    with pytest.raises(ValueError, match='truncated payload'):
+        Message.peek_header(inv[:-1], 0, 0xdeadbeaf)
+    with pytest.raises(ValueError, match='truncated header'):
+        Message.peek_header(buf, len(buf) - 23, 0xdeadbeaf)
+
+def test_inv():
+    inventory = [InvVector(Inv.MSG_TX if i % 3 else Inv.MSG_BLOCK,
+                           dsha256(bytes([i]))) for i in range(100)]
+    msg = Inv(inventory, magic=0xdeadbeaf)
+    payload = msg.buffers()[1]
+
+    assert len(payload) == 1 + 100 * 36
+    assert Message.parse(bytes(msg)) == msg
+    assert isinstance(Message.parse(bytes(GetData(inventory))), GetData)
+
+    batch = Inv.decode_batch(payload)
+
+    assert batch.vectors() == inventory
+    assert batch.keys(Inv.MSG_BLOCK) == [v.hash for v in inventory[::3]]
+    assert batch.keys() == [v.hash for v in inventory]
+    assert len(Inv.decode_batch(b'\x00')) == 0
+
+    with pytest.raises(ValueError):
+        Inv.decode_batch(payload[:-1])
+    with pytest.raises(ValueError):
+        Inv.decode_batch(b'\xfe\x51\xc3\x00\x00')
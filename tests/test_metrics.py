@@ -0,0 +1,153 @@
+import pytest
+import asyncio
+
+from coinflow.metrics import Counter, Histogram, Metrics
+from coinflow.network import Node
+from coinflow.protocol.messages import Message, Verack
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+def test_histogram():
+    hist = Histogram('h', 'help', 'command', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        hist.observe(b'addr\x00\x00\x00\x00\x00\x00\x00\x00', value)
+    assert list(hist.samples()) == [
+        ('_bucket', b'addr' + b'\x00' * 8, {'le': '0.1'}, 2),
+        ('_bucket', b'addr' + b'\x00' * 8, {'le': '1.0'}, 3),
+        ('_bucket', b'addr' + b'\x00' * 8, {'le': '+Inf'}, 4),
+        ('_sum', b'addr' + b'\x00' * 8, {}, 2.65),
+        ('_count', b'addr' + b'\x00' * 8, {}, 4)]
+
+def test_render():
+    metrics = Metrics(buckets=(0.5,))
+    metrics.received(('10.0.0.1', 8333), Verack.COMMAND_RAW, 24)
+    metrics.received(('10.0.0.1', 8333), Verack.COMMAND_RAW, 24)
+    metrics.dispatched('inv', 0.25)
+    metrics.dropped(('10.0.0.1', 8333), 'inv')
+    metrics.dropped('a"b', 'inv')
+    text = metrics.render()
+
+    assert '# TYPE coinflow_messages_received_total counter' in text
+    assert 'coinflow_messages_received_total{command="verack"} 2' in text
+    assert 'coinflow_received_bytes_total{command="verack"} 48' in text
+    assert 'coinflow_peer_received_bytes_total{peer="10.0.0.1:8333"} 48' \
+        in text
+    assert 'coinflow_dispatch_seconds_bucket{command="inv",le="0.5"} 1' \
+        in text
+    assert 'coinflow_dispatch_seconds_sum{command="inv"} 0.25' in text
+    assert 'coinflow_peer_messages_dropped_total{peer="a\\"b"} 1' in text
+    assert 'coinflow_peer_messages_dropped_total{peer="10.0.0.1:8333"} 1' \
+        in text
+
+    metrics.forget(('10.0.0.1', 8333))
+    metrics.forget('a"b')
+    text = metrics.render()
+    assert '10.0.0.1' not in text and 'a\\"b' not in text
+    assert 'coinflow_messages_received_total{command="verack"} 2' in text
+
+def test_unknown_commands():
+    metrics = Metrics(buckets=(0.5,))
+    peers = [('10.0.0.{}'.format(i), 8333) for i in range(100)]
+    for (i, peer) in enumerate(peers):
+        for command in (bytes([0xff, i]) + b'\x00' * 10, b'\xfe' * 12,
+                        'garbage{}'.format(i), Verack.COMMAND_RAW):
+            metrics.received(peer, command, 24)
+            metrics.sent(peer, command, 24)
+            metrics.dispatched(command, 0.1)
+    for peer in peers:
+        metrics.forget(peer)
+
+    assert set(metrics.messages_received.values) == \
+        {Metrics.UNKNOWN, Verack.COMMAND_RAW}
+    assert metrics.messages_received.values[Metrics.UNKNOWN] == 300
+    assert sum(len(list(f.samples())) for f in metrics.families) == 16
+    text = metrics.render()
+    assert 'coinflow_messages_sent_total{command="unknown"} 300' in text
+    assert '\ufffd' not in text and 'garbage' not in text
+
+def test_message_hooks():
+    metrics = Metrics()
+    assert Message.set_metrics(metrics) is metrics
+    try:
+        raw = Verack(magic=0xdeadbeaf).encode()
+        Message.parse(raw)
+        Message.parse(raw, lazy=True).payload
+    finally:
+        Message.set_metrics(None)
+    Message.parse(raw)
+
+    assert metrics.encode_seconds.series['verack'][-2] == 0
+    assert sum(metrics.encode_seconds.series['verack'][:-1]) == 1
+    assert sum(metrics.decode_seconds.series['verack'][:-1]) == 2
+
+def test_node_metrics():
+    async def main():
+        metrics = Metrics()
+        server = Node(magic=0xdeadbeaf, metrics=metrics)
+        client = Node(magic=0xdeadbeaf)
+        srv = await server.serve('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        await client.connect('127.0.0.1', port)
+        for _ in range(100):
+            if metrics.messages_received.values.get(Verack.COMMAND_RAW):
+                break
+            await asyncio.sleep(0.01)
+
+        http = await metrics.serve('127.0.0.1', 0)
+        (reader, writer) = await asyncio.open_connection(
+                            '127.0.0.1', http.sockets[0].getsockname()[1])
+        writer.write(b'GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        response = await reader.read()
+        writer.close()
+
+        client.close()
+        server.close()
+        http.close()
+        await http.wait_closed()
+        return response
+
+    try:
+        response = run(main())
+    finally:
+        Message.set_metrics(None)
+    (head, body) = response.split(b'\r\n\r\n', 1)
+    assert head.startswith(b'HTTP/1.0 200 OK')
+    assert b'Content-Type: text/plain; version=0.0.4' in head
+    assert b'coinflow_messages_received_total{command="version"} 1' in body
+    assert b'coinflow_messages_sent_total{command="verack"} 1' in body
+    assert b'coinflow_dispatch_seconds_count{command="verack"} 1' in body
+
+def test_node_metrics_restored():
+    async def main():
+        (first, second) = (Metrics(), Metrics())
+        a = Node(metrics=first)
+        b = Node(metrics=second)
+        assert Message.METRICS is second
+        a.close()
+        assert Message.METRICS is second
+        b.close()
+        assert Message.METRICS is None
+        b.close()
+        assert Message.METRICS is None
+
+    run(main())
+
+def test_serve_long_line(caplog):
+    async def main():
+        http = await Metrics().serve('127.0.0.1', 0)
+        (reader, writer) = await asyncio.open_connection(
+                            '127.0.0.1', http.sockets[0].getsockname()[1])
+        writer.write(b'GET /' + b'a' * 100000 + b'\r\n\r\n')
+        response = await reader.read()
+        writer.close()
+        http.close()
+        await http.wait_closed()
+        return response
+
+    assert run(main()) == b''
+    assert not [r for r in caplog.records if r.levelname == 'ERROR']
@@ -0,0 +1,412 @@
+import pytest
+import asyncio
+import os
+import socket
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from coinflow.network import Channel, Cluster, Node, Peer
+from coinflow.protocol.messages import Addr, Inv, RawMessage, Verack
+from coinflow.protocol.messages.Addr import AddrEntry
+from coinflow.protocol.messages.Inv import InvVector
+from coinflow.protocol.structs import Netaddr, Timestamp, dsha256
+from coinflow.tables import FirstSeen
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+def test_handshake():
+    async def main():
+        server = Node(magic=0xdeadbeaf, user_agent='server')
+        client = Node(magic=0xdeadbeaf, user_agent='client')
+        received = list()
+        server.on('addr', lambda peer, msg: received.append(msg))
+
+        srv = await server.serve('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        peer = await client.connect('127.0.0.1', port)
+
+        assert peer.established
+        assert peer.version['user_agent'] == 'server'
+
+        entry = AddrEntry(Timestamp(2017, 1, 1), Netaddr('10.0.0.1', 8333, 1))
+        assert client.broadcast(Addr([entry], magic=0xdeadbeaf)) == 1
+        for _ in range(100):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+
+        assert received[0].payload == {'addr_list': [entry]}
+        assert len(server.peers) == 1
+        assert list(server.peers)[0].version['user_agent'] == 'client'
+
+        client.close()
+        server.close()
+
+    run(main())
+
+def test_handshake_timeout():
+    async def main():
+        loop = asyncio.get_event_loop()
+        srv = await loop.create_server(asyncio.Protocol, '127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        client = Node(handshake_timeout=0.1, sweep_interval=0.05)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await client.connect('127.0.0.1', port)
+        await asyncio.sleep(0)
+
+        assert not client.peers
+        client.close()
+        srv.close()
+
+    run(main())
+
+def test_self_connection():
+    async def main():
+        node = Node()
+        srv = await node.serve('127.0.0.1', 0)
+
+        with pytest.raises(ConnectionError):
+            await node.connect('127.0.0.1', srv.sockets[0].getsockname()[1])
+        node.close()
+
+    run(main())
+
+def test_malformed_payload():
+    async def main():
+        server = Node(magic=0xdeadbeaf)
+        client = Node(magic=0xdeadbeaf)
+        received = list()
+        server.on('addr', lambda peer, msg: msg.payload)
+        server.on('addr', lambda peer, msg: received.append(msg))
+        srv = await server.serve('127.0.0.1', 0)
+        peer = await client.connect('127.0.0.1',
+                                    srv.sockets[0].getsockname()[1])
+        entry = AddrEntry(Timestamp(2017, 1, 1), Netaddr('10.0.0.1', 8333, 1))
+        payload = bytes(Addr([entry], magic=0xdeadbeaf))[24:-1]
+        peer.transport.write(struct.pack('<L12sL4s', 0xdeadbeaf, b'addr',
+                                         len(payload),
+                                         dsha256(payload)[:4]) + payload)
+        for _ in range(100):
+            if not client.peers:
+                break
+            await asyncio.sleep(0.01)
+
+        assert not client.peers and not server.peers and not received
+        client.close()
+        server.close()
+
+    run(main())
+
+def test_first_seen():
+    async def main():
+        server = Node(magic=0xdeadbeaf, first_seen=FirstSeen())
+        client = Node(magic=0xdeadbeaf)
+        srv = await server.serve('127.0.0.1', 0)
+        peer = await client.connect('127.0.0.1',
+                                    srv.sockets[0].getsockname()[1])
+        hashes = [bytes([i]) * 32 for i in range(3)]
+        peer.send(Inv([InvVector(Inv.MSG_TX, h) for h in hashes] +
+                      [InvVector(Inv.MSG_BLOCK, bytes(32))], magic=0xdeadbeaf))
+        for _ in range(100):
+            if len(server.first_seen):
+                break
+            await asyncio.sleep(0.01)
+
+        assert len(server.first_seen) == 3
+        sighting = server.first_seen.get(hashes[1])
+        assert sighting.rank == 1
+        assert server.addresses[sighting.peer][0] == '127.0.0.1'
+        (remote,) = server.peers
+        assert all(h in remote.known for h in hashes + [bytes(32)])
+
+        client.close()
+        server.close()
+
+    run(main())
+
+def test_peer_id():
+    async def main():
+        node = Node(max_peer_ids=2)
+        peers = list()
+        for (outbound, address) in ((True, ('10.0.0.1', 8333)),
+                                    (False, ('10.0.0.2', 50001)),
+                                    (False, ('10.0.0.2', 50002)),
+                                    (True, ('10.0.0.3', 8333))):
+            peer = Peer(node, outbound)
+            peer.address = address
+            peers.append(peer)
+
+        assert [node.peer_id(p) for p in peers[:3]] == [0, 1, 1]
+        assert node.addresses == [('10.0.0.1', 8333), ('10.0.0.2', 0)]
+        # Id of least recently seen node is recycled
+        assert node.peer_id(peers[3]) == 0
+        assert node.addresses == [('10.0.0.3', 8333), ('10.0.0.2', 0)]
+        assert node.peer_id(peers[0]) == 1
+
+    run(main())
+
+class Transport(object):
+    def __init__(self, sock=None):
+        self.writes = list()
+        self.closed = False
+        self.sock = sock
+
+    def is_closing(self):
+        return self.closed
+
+    def get_extra_info(self, name, default=None):
+        return self.sock if name == 'socket' else default
+
+    def get_write_buffer_size(self):
+        return sum(len(w) for w in self.writes)
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+
+    def writelines(self, buffers):
+        self.writes.append(b''.join(buffers))
+
+    def close(self):
+        self.closed = True
+
+def test_checksum_pool():
+    async def main():
+        with ThreadPoolExecutor(2) as pool:
+            server = Node(magic=0xdeadbeaf, checksum_pool=pool,
+                          checksum_threshold=1)
+            client = Node(magic=0xdeadbeaf, user_agent='client')
+            received = list()
+            server.on('addr', lambda peer, msg: received.append(msg))
+
+            srv = await server.serve('127.0.0.1', 0)
+            port = srv.sockets[0].getsockname()[1]
+            peer = await client.connect('127.0.0.1', port)
+            assert peer.established
+
+            entries = [AddrEntry(Timestamp(2017, 1, 1),
+                                 Netaddr('10.0.0.{0}'.format(i), 8333, 1))
+                       for i in range(1, 4)]
+            for entry in entries:
+                client.broadcast(Addr([entry], magic=0xdeadbeaf))
+            for _ in range(100):
+                if len(received) == 3:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert [m.payload['addr_list'][0] for m in received] == entries
+            assert list(server.peers)[0].version['user_agent'] == 'client'
+
+            client.close()
+            server.close()
+
+    run(main())
+
+def test_send_queue():
+    async def main():
+        node = Node(magic=0xdeadbeaf, max_pending=1000)
+        peer = Peer(node, True)
+        peer.transport = transport = Transport()
+        entry = AddrEntry(Timestamp(2017, 1, 1), Netaddr('10.0.0.1', 8333, 1))
+        (verack, addr) = (Verack(magic=0xdeadbeaf),
+                          Addr([entry], magic=0xdeadbeaf))
+
+        assert peer.send(verack) and peer.send(addr)
+        assert len(peer.queue) == 2 and not transport.writes
+        await asyncio.sleep(0)
+        assert transport.writes == [bytes(verack) + bytes(addr)]
+
+        peer.send(addr)
+        peer.pause_writing()
+        assert not peer.send(addr)
+        assert peer.send(verack)
+        assert peer.queue.dropped == 2 and len(peer.queue) == 1
+        await asyncio.sleep(0)
+        assert len(transport.writes) == 1
+        peer.resume_writing()
+        assert transport.writes[1] == bytes(verack)
+
+        peer.pause_writing()
+        for _ in range(1000 // len(bytes(verack)) + 1):
+            peer.send(verack)
+        assert transport.closed and not peer.queue.pending
+        assert not peer.send(verack)
+
+    run(main())
+
+def test_send_queue_writev():
+    async def main():
+        node = Node(magic=0xdeadbeaf)
+        peer = Peer(node, True)
+        (local, remote) = socket.socketpair()
+        local.setblocking(False)
+        peer.transport = transport = Transport(local)
+        messages = [RawMessage('block', bytes([i]) * 300000, magic=0xdeadbeaf)
+                    for i in range(8)]
+
+        for msg in messages:
+            assert peer.send(msg)
+        await asyncio.sleep(0)
+
+        # Socket took what fits in its buffer, transport got only the rest
+        expected = b''.join(bytes(m) for m in messages)
+        written = len(expected) - len(b''.join(transport.writes))
+        assert 0 < written < len(expected)
+        received = bytearray()
+        while len(received) < written:
+            received += remote.recv(written - len(received))
+        assert bytes(received) + b''.join(transport.writes) == expected
+
+        # Transport has data buffered, so messages must queue behind it
+        peer.send(messages[0])
+        await asyncio.sleep(0)
+        assert transport.writes[-1] == bytes(messages[0])
+
+        local.close()
+        remote.close()
+
+    run(main())
+
+def test_cluster():
+    async def main():
+        remote = Node(magic=0xdeadbeaf, user_agent='remote')
+        srv = await remote.serve('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+
+        cluster = Cluster(workers=2, flush_interval=0.01, magic=0xdeadbeaf,
+                          user_agent='shard')
+        events = list()
+        cluster.on('established', lambda *args: events.append(args))
+        cluster.start()
+        try:
+            assert [cluster.connect('127.0.0.1', port)
+                    for _ in range(3)] == [0, 1, 0]
+            sock = cluster.serve('127.0.0.1', 0)
+            client = Node(magic=0xdeadbeaf, user_agent='client')
+            peer = await asyncio.wait_for(
+                client.connect('127.0.0.1', sock.getsockname()[1]), 30)
+            assert peer.version['user_agent'] == 'shard'
+
+            for _ in range(3000):
+                if len(cluster) == 4:
+                    break
+                await asyncio.sleep(0.01)
+            assert cluster.established == [2, 2]
+            assert sorted(e[:1] + e[2:] for e in events) == \
+                [(0, 'remote', 0), (0, 'remote', 0), (1, 'client', 0),
+                 (1, 'remote', 0)]
+
+            entries = [AddrEntry(Timestamp(2017, 1, 1),
+                                 Netaddr('10.0.0.{}'.format(i), 8333, 1))
+                       for i in range(10)]
+            remote.broadcast(Addr(entries, magic=0xdeadbeaf))
+            for _ in range(300):
+                if len(cluster.addrman) == 10:
+                    break
+                await asyncio.sleep(0.01)
+            assert len(cluster.addrman) == 10
+
+            client.close()
+            for _ in range(300):
+                if cluster.load == [2, 1]:
+                    break
+                await asyncio.sleep(0.01)
+            assert cluster.load == [2, 1]
+            assert cluster.established == [2, 1]
+        finally:
+            cluster.close()
+            remote.close()
+
+    run(main())
+
+def test_channel():
+    async def main():
+        loop = asyncio.get_event_loop()
+        (a, b) = socket.socketpair()
+        received = {'a': list(), 'b': list()}
+        channels = [Channel(sock, lambda obj, fd, name=name:
+                            received[name].append((obj, fd)),
+                            lambda: None, loop)
+                    for (name, sock) in (('a', a), ('b', b))]
+        chunk = b'\x01' * 65536
+        # Both ends send far more than socket buffers hold before reading
+        for i in range(200):
+            channels[0].send((i, chunk))
+            channels[1].send((i, chunk))
+        assert channels[0].pending and channels[1].pending
+        (r, w) = os.pipe()
+        channels[0].send(('fd',), r)
+        os.close(r)
+
+        for _ in range(500):
+            if len(received['b']) == 201 and len(received['a']) == 200:
+                break
+            await asyncio.sleep(0.01)
+
+        assert [obj[0] for (obj, _) in received['a']] == list(range(200))
+        assert [obj for (obj, _) in received['b'][:2]] == [(0, chunk),
+                                                            (1, chunk)]
+        ((obj, fd),) = received['b'][200:]
+        assert obj == ('fd',) and fd is not None
+        os.write(w, b'x')
+        assert os.read(fd, 1) == b'x'
+        os.close(fd)
+        os.close(w)
+        assert not channels[0].pending and not channels[1].pending
+
+        channels[0].close()
+        for _ in range(100):
+            if channels[1].closed:
+                break
+            await asyncio.sleep(0.01)
+        assert channels[1].closed
+        with pytest.raises(ConnectionError):
+            channels[1].send(('late',))
+
+    run(main())
+
+def test_cluster_stress():
+    async def main():
+        remote = Node(magic=0xdeadbeaf)
+        srv = await remote.serve('127.0.0.1', 0)
+        cluster = Cluster(workers=1, flush_interval=0.001, magic=0xdeadbeaf)
+        learnt = list()
+        cluster.on('addr', lambda index, batch: learnt.append(len(batch)))
+        cluster.start()
+        try:
+            cluster.connect('127.0.0.1', srv.sockets[0].getsockname()[1])
+            for _ in range(3000):
+                if len(cluster):
+                    break
+                await asyncio.sleep(0.01)
+            assert cluster.established == [1]
+
+            addr = Addr([AddrEntry(Timestamp(2017, 1, 1),
+                                   Netaddr('10.{}.{}.1'.format(i // 256,
+                                                               i % 256),
+                                           8333, 1))
+                         for i in range(1000)], magic=0xdeadbeaf)
+            block = RawMessage('block', b'\x02' * (1 << 20),
+                               magic=0xdeadbeaf)
+            # Worker emits addr batches while coordinator broadcasts blocks
+            for _ in range(50):
+                remote.broadcast(addr)
+                cluster.broadcast(block)
+                await asyncio.sleep(0)
+            for _ in range(3000):
+                if sum(learnt) == 50 * 1000:
+                    break
+                await asyncio.sleep(0.01)
+            assert sum(learnt) == 50 * 1000
+            assert cluster.established == [1]
+        finally:
+            cluster.close()
+            remote.close()
+
+    run(main())
@@ -0,0 +1,37 @@
+import pytest
+from collections import namedtuple
+
+from coinflow.protocol.messages.Schema import Schema, Array
+from coinflow.protocol.structs import Varint, Varstr, Netaddr
+
+def test_schema():
+    Point = namedtuple('Point', ('x', 'y'))
+    schema = Schema(('kind', 'B'),
+                    ('flag', '?'),
+                    ('name', Varstr, str),
+                    ('addr', Netaddr),
+                    ('points', Array(Schema(('x', 'h'), ('y', 'h'),
+                                            record=Point))),
+                    ('hashes', Array('32s', limit=2)),
+                    ('counts', Array(Varint)),
+                    ('names', Array(Varstr)),
+                    ('height', 'L', lambda h: h * 2, lambda h: h // 2))
+    payload = {'kind': 7, 'flag': True, 'name': 'coinflow',
+               'addr': Netaddr('10.0.0.1', 8333, 1),
+               'points': [Point(1, -1), Point(300, 2)],
+               'hashes': [b'\x01' * 32],
+               'counts': [1, 300],
+               'names': ['a', 'b'],
+               'height': 20}
+
+    enc = schema.encode(payload)
+
+    assert len(enc) == 2 + 9 + 26 + 9 + 33 + 5 + 5 + 4
+    assert schema.decode_from(b'\x00' + enc, 1) == (payload, len(enc) + 1)
+
+    with pytest.raises(ValueError):
+        schema.decode(enc[:-47] + Varint(3).encode() + b'\x00' * 100)
+
+def test_schema_kind():
+    with pytest.raises(TypeError):
+        Schema(('bad', object))
@@ -1,4 +1,5 @@
 import pytest
+import pickle
 import time
 from datetime import datetime, timezone
 
@@ -34,6 +35,33 @@ def test_varstr():
     assert Varstr.decode(short_enc.encode()) == (short, Varint(len(short_enc)))
     assert Varstr.decode(rlong_enc.encode()) == (rlong, Varint(len(rlong_enc)))
 
+def test_varstr_interning():
+    buf = Varstr('/Satoshi:0.15.1/').encode() + Varstr('a' * 300).encode()
+
+    (first, offset) = Varstr.decode_from(buf)
+    assert Varstr.decode_from(bytearray(buf))[0] is first
+    assert first.encode() is Varstr.decode_from(buf)[0].encode()
+    assert len(first) == offset == 17
+
+    (long, end) = Varstr.decode_from(buf, offset)
+    assert long is not Varstr.decode_from(buf, offset)[0]
+    assert long == 'a' * 300 and end == len(buf)
+
+    with pytest.raises(UnicodeDecodeError):
+        Varstr.decode_from(b'\x01\xff')
+
+    assert not hasattr(first, '__dict__')
+    with pytest.raises(TypeError):
+        first.encoded = b''
+    assert pickle.loads(pickle.dumps(first)).encode() == first.encode()
+
+    try:
+        assert Varstr.set_intern_size(0) == 0
+        assert Varstr.decode_from(buf)[0] is not Varstr.decode_from(buf)[0]
+    finally:
+        Varstr.set_intern_size(1024)
+    assert Varstr.decode_from(buf)[0] is Varstr.decode_from(buf)[0]
+
 def test_netaddr():
     na = Netaddr('127.0.0.1', 8333, 0)
 
@@ -51,3 +79,95 @@ def test_netaddr():
 def test_timestamp():
     enc_ts = Timestamp(2017, 1, 1, 10, 0, 0)
     assert Timestamp.from_raw(enc_ts.encode()) == enc_ts
+
+    dt = datetime(2017, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
+    assert enc_ts == dt.timestamp() == Timestamp(dt)
+    assert enc_ts.todatetime() == dt
+    assert enc_ts != dt and dt != enc_ts
+    assert {enc_ts, int(enc_ts)} == {enc_ts} and hash(enc_ts) == enc_ts
+    assert enc_ts.todatetime() < datetime(2018, 1, 1, tzinfo=timezone.utc)
+    with pytest.raises(TypeError):
+        enc_ts < dt
+    assert Timestamp(datetime(2017, 1, 1, 10)) == enc_ts
+    assert enc_ts - Timestamp(2017, 1, 1) == dt - datetime(2017, 1, 1,
+                                                           tzinfo=timezone.utc)
+
+def test_timestamp_many():
+    epochs = [0, 1483264800, 0xffffffff]
+    enc = Timestamp.encode_many(epochs)
+
+    assert enc == b''.join(Timestamp(e).encode() for e in epochs)
+    (decoded, offset) = Timestamp.decode_many(b'\x00' + enc, 1)
+    assert (list(decoded), offset) == (epochs, len(enc) + 1)
+    assert list(Timestamp.decode_many(enc, 4, 1)[0]) == epochs[1:2]
+    assert Timestamp.todatetimes(decoded)[1] == \
+        Timestamp(2017, 1, 1, 10).todatetime()
+
+    with pytest.raises(ValueError):
+        Timestamp.decode_many(enc, 4, 3)
+
+def test_timestamp_datetime64():
+    numpy = pytest.importorskip('numpy')
+    epochs = [0, 1483264800, 0xffffffff]
+    (decoded, _) = Timestamp.decode_many(Timestamp.encode_many(epochs))
+
+    converted = Timestamp.todatetime64(decoded)
+
+    assert converted.dtype == numpy.dtype('datetime64[s]')
+    assert list(converted.astype(numpy.int64)) == epochs
+    assert converted[1] == numpy.datetime64('2017-01-01T10:00:00')
+    assert list(Timestamp.todatetime64(epochs[1:])) == list(converted[1:])
+    assert len(Timestamp.todatetime64(decoded[:0])) == 0
+
+def test_decode_from():
+    na = Netaddr('10.0.0.1', 8333, 1)
+    ts = Timestamp(2017, 1, 1, 10, 0, 0)
+    buf = b'\x00' + Varint(0x10000).encode() + Varstr('coinflow').encode() + \
+          na.encode() + ts.encode()
+
+    for view in (buf, bytearray(buf), memoryview(buf)):
+        (vi, offset) = Varint.decode_from(view, 1)
+        (vs, offset) = Varstr.decode_from(view, offset)
+        (n, offset) = Netaddr.decode_from(view, offset)
+        (t, offset) = Timestamp.decode_from(view, offset)
+
+        assert (vi, vs, n, t) == (0x10000, 'coinflow', na, ts)
+        assert offset == len(buf)
+
+    with pytest.raises(ValueError):
+        Varstr.decode_from(b'\x05abc')
+
+def test_bulk():
+    ints = [0, 0xfc, 0xfd, 0x1000, 0x10000000, 0x1000000000000000]
+    strs = ['', 'coinflow', 'żółw', 'x' * 300]
+
+    enc = Varint.encode_many(ints)
+
+    assert enc == b''.join(Varint(i).encode() for i in ints)
+    assert Varint.decode_many(enc) == (ints, len(enc))
+    assert Varint.decode_many(memoryview(enc), 1, 2) == (ints[1:3], 5)
+
+    enc = Varstr.encode_many(strs)
+
+    assert enc == b''.join(Varstr(s).encode() for s in strs)
+    assert Varstr.decode_many(enc) == (strs, len(enc))
+    assert Varstr.decode_many(bytearray(enc), 1, 1) == (strs[1:2], 10)
+    assert len(Varstr('żółw')) == 8
+
+    with pytest.raises(ValueError):
+        Varstr.decode_many(enc[:-1])
+
+def test_struct_eq():
+    class Pair(Struct):
+        __slots__ = ('a', 'b')
+
+        def __init__(self, a, b):
+            object.__setattr__(self, 'a', a)
+            object.__setattr__(self, 'b', b)
+
+        __str__ = __repr__ = encode = lambda self: ''
+        decode = decode_from = classmethod(lambda cls, buf: None)
+
+    assert Pair(1, 2) == Pair(1, 2) and hash(Pair(1, 2)) == hash(Pair(1, 2))
+    assert Pair(1, 2) != Pair(1, 3)
+    assert Pair(1, 2) != (1, 2)
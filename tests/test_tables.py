@@ -0,0 +1,117 @@
+import pytest
+import random
+from datetime import timedelta
+
+from coinflow.protocol.messages import Addr
+from coinflow.protocol.messages.Addr import AddrEntry
+from coinflow.protocol.structs import Netaddr, Timestamp
+from coinflow.tables import (FirstSeen, HashIndex, NetaddrTable, RollingBloom,
+                             Sighting)
+
+def test_hash_index():
+    keys = ['k{}'.format(i) for i in range(1000)]
+    rows = dict()
+    index = HashIndex(lambda row: rows[row])
+
+    for (row, key) in enumerate(keys):
+        rows[row] = key
+        index.add(key, row)
+
+    random.seed(1)
+    removed = set(random.sample(range(1000), 500))
+    for row in removed:
+        assert index.remove(keys[row]) == row
+
+    assert len(index) == 500
+    for (row, key) in enumerate(keys):
+        assert index.get(key) == (HashIndex.EMPTY if row in removed else row)
+    assert index.remove('missing') == HashIndex.EMPTY
+
+def test_netaddr_table():
+    ts = Timestamp(2017, 1, 1)
+    addr_list = [AddrEntry(ts + timedelta(seconds=i),
+                           Netaddr('10.0.0.{}'.format(i % 100), 8333, i))
+                 for i in range(150)]
+    table = NetaddrTable()
+
+    assert table.extend(Addr.decode_batch(Addr(addr_list).encode()[24:])) == 100
+    assert len(table) == 100
+    assert Netaddr('10.0.0.1', 8333, 0) in table
+    assert Netaddr('10.0.0.1', 8334, 0) not in table
+
+    row = table.find(Netaddr('10.0.0.1', 8333, 0))
+    assert table[row] == addr_list[101]
+
+    assert table.add(Netaddr('10.0.0.1', 8333, 7), 0) == row
+    assert table[row] == addr_list[101]
+
+    table.remove(row)
+    assert len(table) == 99
+    assert Netaddr('10.0.0.1', 8333, 0) not in table
+    assert sorted(e.addr.ip for e in table) == \
+           sorted('10.0.0.{}'.format(i) for i in range(100) if i != 1)
+    for (row, entry) in enumerate(table):
+        assert table.find(entry.addr) == row
+
+def test_rolling_bloom():
+    now = [0.0]
+    bloom = RollingBloom(100, 1e-6, interval=60, generations=2,
+                         clock=lambda: now[0])
+    keys = [random.getrandbits(256).to_bytes(32, 'little')
+            for _ in range(400)]
+
+    assert bloom.add(keys[0]) and not bloom.add(keys[0])
+    assert bloom.add_many(keys[:150]) == 149
+    assert all(k in bloom for k in keys[50:150])
+    assert sum(k in bloom for k in keys[150:]) < 10
+
+    bloom.add_many(keys[150:201])
+    assert sum(k in bloom for k in keys[:50]) < 10
+    assert all(k in bloom for k in keys[100:201])
+
+    now[0] = 60
+    assert keys[200] in bloom
+    assert sum(k in bloom for k in keys[100:200]) < 5
+    now[0] = 180
+    assert keys[200] not in bloom
+
+    with pytest.raises(ValueError):
+        RollingBloom(fp_rate=1)
+
+    batch = Addr.decode_batch(Addr([AddrEntry(Timestamp(2017, 1, 1),
+                                              Netaddr('10.0.0.1', 8333, 1))
+                                    ]).buffers()[1])
+    assert batch.keys() == [Netaddr('10.0.0.1', 8333, 1).encode()[8:]]
+
+def test_first_seen():
+    now = [0]
+    index = FirstSeen(window=1, capacity=4, clock=lambda: now[0])
+    keys = [random.getrandbits(256).to_bytes(32, 'little')
+            for _ in range(100)]
+
+    assert index.observe_many(keys, 7, 10) == [0] * 100
+    assert index.observe(keys[5], 8, 20) == 1
+    assert len(index) == 100 and keys[99] in index
+    assert index.get(keys[5]) == Sighting(7, 10, 5, 2)
+    assert index.get(bytes(32)) is None
+
+    now[0] = 10 ** 9
+    assert index.observe(keys[0], 9) == 1
+    assert index.observe(bytes(32), 9) == 0
+    assert index.get(bytes(32)) == Sighting(9, 10 ** 9, 100, 1)
+    assert len(index) == 101
+
+    now[0] = 2 * 10 ** 9
+    index.observe(keys[1], 9)
+    assert keys[0] not in index and len(index) == 2
+    assert index.get(bytes(32)).rank == 100
+
+def test_first_seen_limit():
+    index = FirstSeen(window=3600, limit=64, clock=lambda: 0)
+    # Keys sharing low bits must not degrade to linear probing
+    keys = [i.to_bytes(32, 'big') for i in range(1000)]
+
+    assert index.observe_many(keys, 1) == [0] * 1000
+    assert len(index) <= 2 * 64
+    assert keys[-1] in index and keys[0] not in index
+    assert index.get(keys[-1]).rank == 999